@@ -0,0 +1,32 @@
+"""Compare the node walking and QModelIndex based model serializers.
+
+Run with ``python benchmarks/bench_convert_model.py``.
+"""
+
+import argparse
+import io
+import timeit
+
+from gce import models
+from bench_toml_model import generate_config
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mappings", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    model = models.load_toml_fp(io.StringIO(generate_config(args.mappings)))
+    for name, convert in [
+        ("model indexes", models._convert_using_model_indexes),
+        ("toml nodes", models.convert_toml_model_to_dictionary),
+    ]:
+        timings = timeit.repeat(
+            lambda: convert(model), number=1, repeat=args.repeat
+        )
+        print(f"{name}: best {min(timings):.4f}s of {args.repeat}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+"""Compare saving one edited value with and without the source document.
+
+Run with ``python benchmarks/bench_export_toml.py``.
+"""
+
+import argparse
+import io
+import timeit
+
+import tomli_w
+
+from gce import models
+from bench_toml_model import generate_config
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mappings", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    model = models.load_toml_fp(io.StringIO(generate_config(args.mappings)))
+    model.setData(model.index(0, 1), "Edited identifier")
+    for name, export in [
+        (
+            "full tomli_w dump",
+            lambda: tomli_w.dumps(
+                models.convert_item_model_to_dictionary(model)
+            ),
+        ),
+        ("incremental", lambda: models.export_toml(model)),
+    ]:
+        timings = timeit.repeat(export, number=1, repeat=args.repeat)
+        print(f"{name}: best {min(timings):.4f}s of {args.repeat}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""Time how long it takes before a loaded config can be painted.
+
+Parsing the TOML text is reported separately from building the model,
+because only the model building is affected by lazy loading. Run with
+``python benchmarks/bench_load_model.py``.
+"""
+
+import argparse
+import io
+import time
+import tomllib
+
+from gce import models
+from bench_toml_model import generate_config
+
+
+def first_paint(toml_text: str) -> models.TomlModel:
+    model = models.load_toml_fp(io.StringIO(toml_text))
+    mapping_values = model.index(model.rowCount() - 1, 0)
+    for row in range(min(50, model.rowCount(mapping_values))):
+        model.data(model.index(row, 0, parent=mapping_values))
+    return model
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--mappings", type=int, nargs="+", default=[1_000, 5_000, 20_000]
+    )
+    args = parser.parse_args()
+    for number_of_mappings in args.mappings:
+        toml_text = generate_config(number_of_mappings)
+
+        start = time.perf_counter()
+        tomllib.loads(toml_text)
+        parsed = time.perf_counter()
+        first_paint(toml_text)
+        painted = time.perf_counter()
+
+        parse_time = parsed - start
+        model_time = (painted - parsed) - parse_time
+        print(
+            f"{number_of_mappings} mappings: parse {parse_time:.4f}s, "
+            f"model and first paint {model_time:.4f}s"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Compare the streaming XML reflow with the minidom one.
+
+Each reflow is timed on a generated MARC XML collection. Peak memory is the
+maximum resident size of a fresh process doing one reflow, minus a process
+that only reads the file. "streaming-file" reflows from one file to another
+without holding either in memory. Run with
+``python benchmarks/bench_reflow.py``.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import timeit
+from xml.dom import minidom
+
+from bench_xml_backend import generate_collection
+
+from gce import reflow
+
+REFLOWS = {
+    "minidom": lambda text: minidom.parseString(text).toprettyxml(
+        indent=" " * 4
+    ),
+    "streaming": reflow.reflow_xml,
+}
+
+MEMORY_SCRIPT = """\
+import resource, sys
+from xml.dom import minidom
+from gce import reflow
+kind, source = sys.argv[1], sys.argv[2]
+if kind == "streaming-file":
+    with open(source, "rb") as f, open(os.devnull, "w") as output:
+        reflow.reflow_stream(f, output)
+else:
+    with open(source, encoding="utf-8") as f:
+        text = f.read()
+    if kind == "minidom":
+        minidom.parseString(text).toprettyxml(indent=" " * 4)
+    elif kind == "streaming":
+        reflow.reflow_xml(text)
+print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+"""
+
+
+def peak_memory(kind: str, collection_file: str) -> float:
+    # Passing "none" only reads the file, which gives the baseline
+    output = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import os\n" + MEMORY_SCRIPT,
+            kind,
+            collection_file,
+        ],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    # ru_maxrss is in kilobytes on Linux
+    return int(output) / 1024
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=float, default=20, help="size in MB")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--output",
+        default="bench_collection.xml",
+        help="where to write the generated collection",
+    )
+    args = parser.parse_args()
+
+    collection = generate_collection(args.size)
+    with open(args.output, "w", encoding="utf-8") as f:
+        f.write(collection)
+    print(f"collection: {len(collection) / 1024 / 1024:.1f} MB")
+
+    # Measured before any timing, a child process starts out with the
+    # peak resident size of this one
+    baseline = peak_memory("none", args.output)
+    memory = {
+        name: peak_memory(name, args.output) - baseline
+        for name in [*REFLOWS, "streaming-file"]
+    }
+
+    def reflow_file() -> None:
+        with open(args.output, "rb") as f, open(os.devnull, "w") as output:
+            reflow.reflow_stream(f, output)
+
+    reflows = {**REFLOWS, "streaming-file": lambda _: reflow_file()}
+    for name, reflow_strategy in reflows.items():
+        times = timeit.repeat(
+            lambda: reflow_strategy(collection),
+            number=1,
+            repeat=args.repeat,
+        )
+        print(
+            f"{name}: best {min(times):.3f}s, "
+            f"peak memory +{memory[name]:.0f} MB"
+        )
+
+
+if __name__ == "__main__":
+    main()
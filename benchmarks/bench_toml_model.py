@@ -0,0 +1,53 @@
+"""Benchmarks for navigating a TomlModel built from a large config.
+
+Run with ``python benchmarks/bench_toml_model.py``.
+"""
+
+import argparse
+import io
+import timeit
+
+from gce import models
+
+
+def generate_config(number_of_mappings: int) -> str:
+    lines = ["[mappings]", 'identifier_key = "Bibliographic Identifier"', ""]
+    for i in range(number_of_mappings):
+        lines.extend([
+            "[[mapping]]",
+            f'key = "Mapping {i}"',
+            'matching_marc_fields = ["240$a"]',
+            'delimiter = "||"',
+            'existing_data = "keep"',
+            "",
+        ])
+    return "\n".join(lines)
+
+
+def walk_parents(model: models.TomlModel) -> None:
+    mapping_values = model.index(model.rowCount() - 1, 0)
+    for row in range(model.rowCount(mapping_values)):
+        mapping_index = model.index(row, 0, parent=mapping_values)
+        model.parent(mapping_index)
+        for data_row in range(model.rowCount(mapping_index)):
+            model.parent(model.index(data_row, 1, parent=mapping_index))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mappings", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    model = models.load_toml_fp(io.StringIO(generate_config(args.mappings)))
+    timings = timeit.repeat(
+        lambda: walk_parents(model), number=1, repeat=args.repeat
+    )
+    print(
+        f"parent() over {args.mappings} mappings: "
+        f"best {min(timings):.4f}s of {args.repeat}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Compare memory used per mapping by TomlNode trees.
+
+The "before" figures come from a node with the same fields stored in an
+instance ``__dict__``, which is how TomlNode was laid out before it used
+``__slots__``. Run with ``python benchmarks/bench_toml_model_memory.py``.
+"""
+
+import argparse
+import tracemalloc
+from typing import Callable, Dict
+
+from gce import models
+
+MAPPING: Dict[str, models.TOML_SPEC] = {
+    "key": "Uniform Title",
+    "matching_marc_fields": ["240$a"],
+    "delimiter": "||",
+    "existing_data": "keep",
+}
+
+
+class DictTomlNode:
+    def __init__(self, key=None, parent=None):
+        self._parent = parent
+        self._key = key
+        self._value = None
+        self._row = 0
+        self.children = []
+        self.is_editable = True
+        self.is_selectable = True
+
+
+def build_dict_nodes(number_of_mappings: int) -> DictTomlNode:
+    root = DictTomlNode("Mapping values")
+    for _ in range(number_of_mappings):
+        mapping = DictTomlNode("mapping", parent=root)
+        for key, value in MAPPING.items():
+            item = DictTomlNode(key, parent=mapping)
+            item._value = value
+            mapping.children.append(item)
+        root.children.append(mapping)
+    return root
+
+
+def build_slot_nodes(number_of_mappings: int) -> models.TomlNode:
+    root = models.TomlNode[models.TOML_SPEC]("Mapping values")
+    for _ in range(number_of_mappings):
+        mapping = models.MappingNode("mapping")
+        for key, value in MAPPING.items():
+            item = models.TomlNode[models.TOML_SPEC](key)
+            item.value = value
+            mapping.append_child(item)
+        root.append_child(mapping)
+    return root
+
+
+def bytes_per_mapping(
+    builder: Callable[[int], object], number_of_mappings: int
+) -> float:
+    tracemalloc.start()
+    try:
+        tree = builder(number_of_mappings)
+        current, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del tree
+    return current / number_of_mappings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mappings", type=int, default=10_000)
+    args = parser.parse_args()
+    before = bytes_per_mapping(build_dict_nodes, args.mappings)
+    after = bytes_per_mapping(build_slot_nodes, args.mappings)
+    print(f"__dict__ nodes: {before:.0f} bytes per mapping")
+    print(f"__slots__ nodes: {after:.0f} bytes per mapping")
+    print(f"saved: {1 - after / before:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Compare the stdlib and lxml XML backends on a large MARC XML collection.
+
+Parsing is timed on the whole collection. Peak memory is the maximum
+resident size of a fresh process doing one parse, since tracemalloc does
+not see what lxml allocates. Run with
+``python benchmarks/bench_xml_backend.py``.
+"""
+
+import argparse
+import subprocess
+import sys
+import timeit
+
+from gce import xml_backend
+
+RECORD = """  <record>
+    <leader>01700cam a2200421 a 4500</leader>
+    <controlfield tag="001">{number}</controlfield>
+    <controlfield tag="008">780930s1973 mx 000 0 spa d</controlfield>
+    <datafield tag="245" ind1="1" ind2="0">
+      <subfield code="a">Title number {number}</subfield>
+      <subfield code="c">by Someone</subfield>
+    </datafield>
+{added_entries}  </record>
+"""
+
+ADDED_ENTRY = """    <datafield tag="700" ind1="1" ind2=" ">
+      <subfield code="a">Contributor {number}, {entry}</subfield>
+      <subfield code="d">1900-1980</subfield>
+    </datafield>
+"""
+
+
+def generate_collection(size_in_mb: float) -> str:
+    added_entries = "".join(
+        ADDED_ENTRY.format(number="{number}", entry=entry)
+        for entry in range(20)
+    )
+    record = RECORD.replace("{added_entries}", added_entries)
+    records = []
+    size = 0
+    number = 0
+    while size < size_in_mb * 1024 * 1024:
+        text = record.format(number=number)
+        records.append(text)
+        size += len(text)
+        number += 1
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<collection xmlns="http://www.loc.gov/MARC21/slim">\n'
+        + "".join(records)
+        + "</collection>\n"
+    )
+
+
+def peak_memory(backend: str, collection_file: str) -> float:
+    # Run in a child process so each backend starts from a clean slate.
+    # Passing "none" only reads the file, which gives the baseline.
+    script = (
+        "import resource, sys\n"
+        "from gce import xml_backend\n"
+        "with open(sys.argv[2], encoding='utf-8') as f:\n"
+        "    text = f.read()\n"
+        "if sys.argv[1] != 'none':\n"
+        "    xml_backend.get_backend(sys.argv[1]).fromstring(text)\n"
+        "print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)\n"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", script, backend, collection_file],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    # ru_maxrss is in kilobytes on Linux
+    return int(output) / 1024
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=float, default=50, help="size in MB")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--output",
+        default="bench_collection.xml",
+        help="where to write the generated collection",
+    )
+    args = parser.parse_args()
+
+    collection = generate_collection(args.size)
+    with open(args.output, "w", encoding="utf-8") as f:
+        f.write(collection)
+    print(f"collection: {len(collection) / 1024 / 1024:.1f} MB")
+    baseline = peak_memory("none", args.output)
+
+    for name in xml_backend.available_backends():
+        backend = xml_backend.get_backend(name)
+        parse = timeit.repeat(
+            lambda: backend.fromstring(collection),
+            number=1,
+            repeat=args.repeat,
+        )
+        print(
+            f"{name}: parse best {min(parse):.3f}s, "
+            "parse peak memory "
+            f"+{peak_memory(name, args.output) - baseline:.0f} MB"
+        )
+
+
+if __name__ == "__main__":
+    main()
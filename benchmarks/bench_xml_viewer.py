@@ -0,0 +1,130 @@
+"""Compare load and scroll latency of the XML viewer's text engines.
+
+The viewer, built on QPlainTextEdit, is measured against a QTextEdit set
+up the way the viewer used to be, each with and without the Pygments
+highlighting. Load is the time from setting the text until the first
+screen is painted. Scroll is the time to jump to a random position and
+repaint. Every engine runs in a fresh process on a reflowed MARC XML
+collection. Run with ``python benchmarks/bench_xml_viewer.py``.
+"""
+
+import argparse
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from bench_xml_backend import generate_collection  # noqa: E402
+from PySide6 import QtWidgets  # noqa: E402
+
+from gce import gui, reflow  # noqa: E402
+
+
+def create_text_edit(highlight: bool) -> QtWidgets.QTextEdit:
+    widget = QtWidgets.QTextEdit()
+    widget.setAcceptRichText(False)
+    if highlight:
+        highlighter = gui.PygmentsHighlighter(parent=widget.document())
+        highlighter.lexer = gui.pygments.lexers.get_lexer_by_name("xml")
+        highlighter.style = gui.pygments.styles.get_style_by_name("default")
+    return widget
+
+
+def create_xml_viewer(highlight: bool) -> gui.XMLViewer:
+    widget = gui.XMLViewer()
+    if highlight:
+        widget.pygments_style = "default"
+    else:
+        widget._highlighter.setDocument(None)
+    return widget
+
+
+ENGINES = {
+    "QTextEdit": lambda: create_text_edit(highlight=False),
+    "QTextEdit, highlighted": lambda: create_text_edit(highlight=True),
+    "XMLViewer": lambda: create_xml_viewer(highlight=False),
+    "XMLViewer, highlighted": lambda: create_xml_viewer(highlight=True),
+}
+
+
+def measure_load(widget, text: str) -> float:
+    app = QtWidgets.QApplication.instance()
+    start = time.perf_counter()
+    widget.setPlainText(text)
+    app.processEvents()
+    widget.viewport().repaint()
+    return time.perf_counter() - start
+
+
+def measure_scroll(widget, jumps: int, seed: int = 0) -> list:
+    app = QtWidgets.QApplication.instance()
+    scroll_bar = widget.verticalScrollBar()
+    positions = random.Random(seed).choices(
+        range(scroll_bar.maximum() + 1), k=jumps
+    )
+    times = []
+    for position in positions:
+        start = time.perf_counter()
+        scroll_bar.setValue(position)
+        widget.viewport().repaint()
+        app.processEvents()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def run_engine(name: str, size: float, jumps: int) -> None:
+    app = QtWidgets.QApplication([])
+    text = reflow.reflow_xml(generate_collection(size))
+    widget = ENGINES[name]()
+    widget.resize(1000, 800)
+    widget.show()
+    app.processEvents()
+    load = measure_load(widget, text)
+    scroll = measure_scroll(widget, jumps)
+    print(
+        f"{name}: load {load:.2f}s, "
+        f"scroll median {statistics.median(scroll) * 1000:.1f} ms, "
+        f"max {max(scroll) * 1000:.1f} ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=float, default=10, help="size in MB")
+    parser.add_argument("--jumps", type=int, default=50)
+    parser.add_argument("--engine", choices=ENGINES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.engine:
+        run_engine(args.engine, args.size, args.jumps)
+        return
+
+    text = reflow.reflow_xml(generate_collection(args.size))
+    print(
+        f"document: {len(text) / 1024 / 1024:.1f} MB, "
+        f"{text.count(chr(10)) + 1} lines"
+    )
+    # A widget left over from one engine slows down the next one, so
+    # each gets a process of its own
+    for name in ENGINES:
+        subprocess.run(
+            [
+                sys.executable,
+                __file__,
+                "--engine",
+                name,
+                "--size",
+                str(args.size),
+                "--jumps",
+                str(args.jumps),
+            ],
+            check=True,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,17 @@
-from gce.main import main
+import sys
+
+
+def main() -> None:
+    # "gce render ..." runs headless. Anything else opens the editor.
+    if sys.argv[1:2] == ["render"]:
+        from gce import cli
+
+        sys.exit(cli.main(sys.argv[2:], prog="gce render"))
+
+    from gce.main import main as run_editor
+
+    run_editor()
+
 
 if __name__ == "__main__":
     main()
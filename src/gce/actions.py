@@ -54,4 +54,3 @@ def save_toml(parent: gui.MainWindow, file_path: QtCore.QUrl) -> None:
         parent.status_message_updated.emit("Saving", logging.INFO)
         file = pathlib.Path(file_path.toLocalFile())
         parent.write_to_file(file, model)
-        parent.status_message_updated.emit(f"Saved {file.name}", logging.INFO)
@@ -0,0 +1,64 @@
+from typing import Callable, Optional
+
+from PySide6 import QtCore
+
+from gce.tasks import BackgroundTask, TaskRunner
+
+__all__ = ["BackgroundReflow"]
+
+
+class _ReflowTask(BackgroundTask):
+    def __init__(
+        self, xml_text: str, reflow_strategy: Callable[[str], str]
+    ) -> None:
+        super().__init__()
+        self.xml_text = xml_text
+        self.reflow_strategy = reflow_strategy
+
+    def work(self) -> str:
+        try:
+            return self.reflow_strategy(self.xml_text)
+        finally:
+            # Only the result is needed from here on
+            self.xml_text = ""
+
+
+class BackgroundReflow(QtCore.QObject):
+    reflowed = QtCore.Signal(str)
+    failed = QtCore.Signal(object)
+    finished = QtCore.Signal()
+
+    def __init__(self, parent: Optional[QtCore.QObject] = None) -> None:
+        super().__init__(parent)
+        self._runner = TaskRunner(self)
+        self._runner.finished.connect(self._task_reflowed)
+        self._runner.failed.connect(self._task_failed)
+        self._current: Optional[_ReflowTask] = None
+
+    @property
+    def is_busy(self) -> bool:
+        return self._current is not None
+
+    def reflow(
+        self, xml_text: str, reflow_strategy: Callable[[str], str]
+    ) -> None:
+        # A reflow still running is superseded and its result dropped
+        if self._current is not None:
+            self._current.cancelled.set()
+        self._current = _ReflowTask(xml_text, reflow_strategy)
+        self._runner.start(self._current)
+
+    def wait_for_done(self, msecs: int = -1) -> bool:
+        return self._runner.wait_for_done(msecs)
+
+    def _task_reflowed(self, task: _ReflowTask, xml_text: str) -> None:
+        self._current = None
+        self.reflowed.emit(xml_text)
+        self.finished.emit()
+
+    def _task_failed(self, task: _ReflowTask, error: Exception) -> None:
+        # Not only parse errors, anything else left unreported would keep
+        # the reflow busy for good
+        self._current = None
+        self.failed.emit(error)
+        self.finished.emit()
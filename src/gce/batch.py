@@ -0,0 +1,228 @@
+import concurrent.futures
+import itertools
+import multiprocessing
+import os
+import threading
+import typing
+import xml.etree.ElementTree as ET
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from gce.rendering import (
+    ProcessRenderer,
+    RenderResult,
+    RenderStrategy,
+    render_jinja_template,
+)
+
+__all__ = [
+    "BatchResult",
+    "MarcRecord",
+    "create_executor",
+    "iter_marc_records",
+    "render_records",
+]
+
+MARC_NAMESPACE = "http://www.loc.gov/MARC21/slim"
+
+XmlSource = Union[str, os.PathLike, typing.BinaryIO]
+
+
+class MarcRecord(typing.NamedTuple):
+    position: int
+    record_id: str
+    xml: str
+
+
+class BatchResult(typing.NamedTuple):
+    position: int
+    record_id: str
+    output: str
+    error: str
+
+
+def _local_name(tag: str) -> str:
+    return tag.rpartition("}")[2]
+
+
+def _record_id(record: ET.Element, position: int) -> str:
+    for field in record:
+        if (
+            _local_name(field.tag) == "controlfield"
+            and field.get("tag") == "001"
+        ):
+            return (field.text or "").strip()
+    return f"record {position + 1}"
+
+
+def iter_marc_records(source: XmlSource) -> Iterator[MarcRecord]:
+    # Works on both a single <record> and a <collection> of them. Each record
+    # is dropped from the tree once it has been serialized so memory use does
+    # not grow with the size of the file.
+
+    # Keeps records written back out as <record xmlns="..."> instead of
+    # using a generated ns0: prefix
+    ET.register_namespace("", MARC_NAMESPACE)
+    parents: List[ET.Element] = []
+    position = 0
+    for event, element in ET.iterparse(source, events=("start", "end")):
+        if event == "start":
+            parents.append(element)
+            continue
+        parents.pop()
+        if _local_name(element.tag) != "record":
+            continue
+        yield MarcRecord(
+            position,
+            _record_id(element, position),
+            ET.tostring(element, encoding="unicode"),
+        )
+        position += 1
+        element.clear()
+        if parents:
+            parents[-1].remove(element)
+
+
+# Each worker process keeps its render process between chunks
+_renderers: Dict[Tuple[RenderStrategy, int], ProcessRenderer] = {}
+
+
+def _timed_render_strategy(
+    render_strategy: RenderStrategy, timeout: Optional[int]
+) -> RenderStrategy:
+    if timeout is None:
+        return render_strategy
+    renderer = _renderers.get((render_strategy, timeout))
+    if renderer is None:
+        renderer = _renderers[(render_strategy, timeout)] = ProcessRenderer(
+            timeout=timeout, render_strategy=render_strategy
+        )
+    return renderer.render
+
+
+def _render_chunk(
+    jinja_text: str,
+    records: List[MarcRecord],
+    render_strategy: RenderStrategy,
+    timeout: Optional[int] = None,
+) -> List[BatchResult]:
+    # A record that hangs or fails to render is reported as failed and the
+    # rest of the chunk still gets rendered
+    render = _timed_render_strategy(render_strategy, timeout)
+    results = []
+    for record in records:
+        try:
+            result = render(jinja_text, record.xml)
+        except Exception as error:
+            result = RenderResult(f"Unable to render: {error}", False)
+        results.append(
+            BatchResult(
+                record.position,
+                record.record_id,
+                result.text if result.is_valid else "",
+                "" if result.is_valid else result.text,
+            )
+        )
+    return results
+
+
+def _failed_chunk(
+    records: List[MarcRecord], error: BaseException
+) -> List[BatchResult]:
+    return [
+        BatchResult(
+            record.position, record.record_id, "", f"Unable to render: {error}"
+        )
+        for record in records
+    ]
+
+
+def create_executor(
+    max_workers: Optional[int] = None,
+) -> concurrent.futures.ProcessPoolExecutor:
+    # The workers are spawned rather than forked since this may be called
+    # from the editor, which is running Qt threads.
+    return concurrent.futures.ProcessPoolExecutor(
+        max_workers or os.cpu_count() or 1,
+        mp_context=multiprocessing.get_context("spawn"),
+    )
+
+
+def render_records(
+    jinja_text: str,
+    records: Iterable[MarcRecord],
+    max_workers: Optional[int] = None,
+    chunk_size: int = 64,
+    ordered: bool = False,
+    cancelled: Optional[threading.Event] = None,
+    render_strategy: RenderStrategy = render_jinja_template,
+    executor: Optional[concurrent.futures.ProcessPoolExecutor] = None,
+    timeout: Optional[int] = 2000,
+) -> Iterator[List[BatchResult]]:
+    # Records are sent to the worker processes in chunks to keep the cost of
+    # pickling them down. Only a few chunks per worker are in flight at any
+    # time so a large collection is never read into memory all at once.
+    #
+    # An executor passed in is left running so that it can be reused for
+    # more records. Otherwise one is created for this call.
+    #
+    # Each record gets timeout milliseconds to render in a separate process
+    # with the same memory limit as the editor's previews. None renders in
+    # the worker itself without a limit.
+    owns_executor = executor is None
+    pool = executor if executor is not None else create_executor(max_workers)
+    in_flight = 2 * (max_workers or os.cpu_count() or 1)
+    chunks = _chunked(iter(records), chunk_size)
+    pending: List[Tuple[concurrent.futures.Future, List[MarcRecord]]] = []
+
+    def submit(count: int) -> Iterator[List[BatchResult]]:
+        # A pool that has stopped takes no more work. The records that
+        # would have gone to it are reported as failed instead.
+        while count > 0 and (chunk := next(chunks, None)) is not None:
+            try:
+                future = pool.submit(
+                    _render_chunk, jinja_text, chunk, render_strategy, timeout
+                )
+            except RuntimeError as error:
+                yield _failed_chunk(chunk, error)
+            else:
+                pending.append((future, chunk))
+                count -= 1
+
+    try:
+        yield from submit(in_flight)
+        while pending:
+            if cancelled is not None and cancelled.is_set():
+                return
+
+            # Waits with a timeout so cancelling is noticed promptly
+            done = concurrent.futures.wait(
+                [
+                    future
+                    for future, _ in (pending[:1] if ordered else pending)
+                ],
+                timeout=0.1,
+                return_when=concurrent.futures.FIRST_COMPLETED,
+            ).done
+            finished = [item for item in pending if item[0] in done]
+            for item in finished:
+                pending.remove(item)
+                future, chunk = item
+                try:
+                    results = future.result()
+                except Exception as error:
+                    # Such as BrokenProcessPool when a worker was killed
+                    results = _failed_chunk(chunk, error)
+                yield results
+            yield from submit(len(finished))
+    finally:
+        for future, _ in pending:
+            future.cancel()
+        if owns_executor:
+            pool.shutdown(cancel_futures=True)
+
+
+def _chunked(
+    records: Iterator[MarcRecord], size: int
+) -> Iterator[List[MarcRecord]]:
+    while chunk := list(itertools.islice(records, size)):
+        yield chunk
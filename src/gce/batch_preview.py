@@ -0,0 +1,247 @@
+import functools
+import pathlib
+import typing
+import xml.etree.ElementTree as ET
+from typing import Callable, Optional
+
+from PySide6 import QtCore, QtWidgets
+
+from gce import batch
+from gce.rendering import RenderStrategy, render_jinja_template
+from gce.tasks import BackgroundTask, TaskRunner
+
+__all__ = ["BatchPreviewDialog", "BatchPreviewModel", "BatchPreviewRunner"]
+
+
+class BatchPreviewModel(QtCore.QAbstractTableModel):
+    headers = ["Record ID", "Output", "Error"]
+
+    def __init__(self, parent: Optional[QtCore.QObject] = None) -> None:
+        super().__init__(parent)
+        self.results: typing.List[batch.BatchResult] = []
+
+    def rowCount(self, parent=QtCore.QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.results)
+
+    def columnCount(self, parent=QtCore.QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.headers)
+
+    def data(self, index, role=QtCore.Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or role not in [
+            QtCore.Qt.ItemDataRole.DisplayRole,
+            QtCore.Qt.ItemDataRole.ToolTipRole,
+        ]:
+            return None
+        result = self.results[index.row()]
+        return [result.record_id, result.output, result.error][index.column()]
+
+    def headerData(
+        self,
+        section,
+        orientation,
+        role=QtCore.Qt.ItemDataRole.DisplayRole,
+    ):
+        if role != QtCore.Qt.ItemDataRole.DisplayRole:
+            return None
+        if orientation == QtCore.Qt.Orientation.Horizontal:
+            return self.headers[section]
+
+        # Results arrive in the order they finish, so rows are labeled with
+        # the position of the record in the file
+        return str(self.results[section].position + 1)
+
+    def add_results(self, results: typing.List[batch.BatchResult]) -> None:
+        if not results:
+            return
+        start = len(self.results)
+        self.beginInsertRows(
+            QtCore.QModelIndex(), start, start + len(results) - 1
+        )
+        self.results.extend(results)
+        self.endInsertRows()
+
+    def clear(self) -> None:
+        self.beginResetModel()
+        self.results = []
+        self.endResetModel()
+
+
+class _BatchPreviewTask(BackgroundTask):
+    # Reports a list of BatchResult for every batch of records rendered
+    def __init__(
+        self,
+        jinja_text: str,
+        collection_file: pathlib.Path,
+        render_strategy: RenderStrategy,
+    ) -> None:
+        super().__init__()
+        self.jinja_text = jinja_text
+        self.collection_file = collection_file
+        self.render_strategy = render_strategy
+
+    def work(self) -> None:
+        for results in batch.render_records(
+            self.jinja_text,
+            batch.iter_marc_records(self.collection_file),
+            cancelled=self.cancelled,
+            render_strategy=self.render_strategy,
+        ):
+            self.report(results)
+
+
+class BatchPreviewRunner(QtCore.QObject):
+    results_ready = QtCore.Signal(object)
+    failed = QtCore.Signal(str)
+    finished = QtCore.Signal()
+
+    def __init__(
+        self,
+        parent: Optional[QtCore.QObject] = None,
+        render_strategy: RenderStrategy = render_jinja_template,
+    ) -> None:
+        super().__init__(parent)
+        self.render_strategy = render_strategy
+
+        # A stopped run may still be finishing a record when the next starts
+        self._runner = TaskRunner(
+            self, max_thread_count=QtCore.QThread.idealThreadCount()
+        )
+        self._runner.reported.connect(self._task_results_ready)
+        self._runner.finished.connect(self._task_finished)
+        self._runner.failed.connect(self._task_failed)
+        self._current: Optional[_BatchPreviewTask] = None
+
+    @property
+    def is_running(self) -> bool:
+        return self._current is not None
+
+    def start(self, jinja_text: str, collection_file: pathlib.Path) -> None:
+        self.cancel()
+        self._current = _BatchPreviewTask(
+            jinja_text, collection_file, self.render_strategy
+        )
+        self._runner.start(self._current)
+
+    def cancel(self) -> None:
+        task = self._current
+        if task is None:
+            return
+        task.cancelled.set()
+        self._current = None
+        self.finished.emit()
+
+    def wait_for_done(self, msecs: int = -1) -> bool:
+        return self._runner.wait_for_done(msecs)
+
+    def _task_results_ready(
+        self, task: _BatchPreviewTask, results: typing.List[batch.BatchResult]
+    ) -> None:
+        self.results_ready.emit(results)
+
+    def _task_failed(self, task: _BatchPreviewTask, error: Exception) -> None:
+        name = task.collection_file.name
+        if isinstance(error, (OSError, ET.ParseError)):
+            self.failed.emit(f"Unable to read {name}. {error}")
+        else:
+            self.failed.emit(f"Unable to render {name}. {error}")
+        self._task_finished(task, None)
+
+    def _task_finished(self, task: _BatchPreviewTask, _) -> None:
+        self._current = None
+        self.finished.emit()
+
+
+class BatchPreviewDialog(QtWidgets.QDialog):
+    def __init__(self, jinja_text: str = "", *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.setWindowTitle("Batch Preview")
+        self.jinja_text = jinja_text
+        self.file_dialog_strategy: Callable[
+            [QtWidgets.QWidget], typing.Tuple[str, str]
+        ] = functools.partial(
+            QtWidgets.QFileDialog.getOpenFileName,
+            caption="Open MARC XML Collection",
+            dir="",
+            filter="Xml Files (*.xml);;All Files (*)",
+        )
+        self._layout = QtWidgets.QVBoxLayout(self)
+
+        file_row = QtWidgets.QHBoxLayout()
+        self.file_label = QtWidgets.QLabel("No collection opened")
+        file_row.addWidget(self.file_label, stretch=1)
+        self.open_button = QtWidgets.QPushButton("Open Collection…")
+        self.open_button.clicked.connect(self.open_collection)
+        file_row.addWidget(self.open_button)
+        self._layout.addLayout(file_row)
+
+        self.results_model = BatchPreviewModel(self)
+        self.results_view = QtWidgets.QTableView(self)
+        self.results_view.setModel(self.results_model)
+        self.results_view.setWordWrap(False)
+
+        # Fixed row heights let the view lay out only the visible rows
+        # instead of measuring every result in the table
+        vertical_header = self.results_view.verticalHeader()
+        vertical_header.setSectionResizeMode(
+            QtWidgets.QHeaderView.ResizeMode.Fixed
+        )
+        self.results_view.horizontalHeader().setStretchLastSection(True)
+        self.results_view.setColumnWidth(0, 160)
+        self.results_view.setColumnWidth(1, 240)
+        self._layout.addWidget(self.results_view)
+
+        self.status_label = QtWidgets.QLabel()
+        self._layout.addWidget(self.status_label)
+        self._failure: Optional[str] = None
+
+        self.button_box = QtWidgets.QDialogButtonBox(
+            QtWidgets.QDialogButtonBox.StandardButton.Close
+        )
+        self.cancel_button = self.button_box.addButton(
+            "Stop", QtWidgets.QDialogButtonBox.ButtonRole.ActionRole
+        )
+        self.cancel_button.setEnabled(False)
+        self.button_box.rejected.connect(self.reject)
+        self._layout.addWidget(self.button_box)
+
+        self.runner = BatchPreviewRunner(self)
+        self.runner.results_ready.connect(self._add_results)
+        self.runner.failed.connect(self._run_failed)
+        self.runner.finished.connect(self._run_finished)
+        self.cancel_button.clicked.connect(self.runner.cancel)
+        self.rejected.connect(self.runner.cancel)
+
+    def open_collection(self) -> None:
+        file_name, _ = self.file_dialog_strategy(self)
+        if file_name:
+            self.run(pathlib.Path(file_name))
+
+    def run(self, collection_file: pathlib.Path) -> None:
+        self._failure = None
+        self.results_model.clear()
+        self.file_label.setText(collection_file.name)
+        self.status_label.setText("Rendering…")
+        self.cancel_button.setEnabled(True)
+        self.runner.start(self.jinja_text, collection_file)
+
+    def _add_results(self, results: typing.List[batch.BatchResult]) -> None:
+        self.results_model.add_results(results)
+        self.status_label.setText(
+            f"Rendered {self.results_model.rowCount()} records…"
+        )
+
+    def _run_failed(self, message: str) -> None:
+        self._failure = message
+        self.status_label.setText(message)
+
+    def _run_finished(self) -> None:
+        self.cancel_button.setEnabled(False)
+        if self._failure is not None:
+            return
+        errors = sum(
+            1 for result in self.results_model.results if result.error
+        )
+        self.status_label.setText(
+            f"Rendered {self.results_model.rowCount()} records, "
+            f"{errors} with errors"
+        )
@@ -0,0 +1,190 @@
+import argparse
+import csv
+import json
+import os
+import pathlib
+import sys
+import tomllib
+import typing
+import xml.etree.ElementTree as ET
+from typing import List, Optional, Sequence
+
+from gce import batch
+from gce.rendering import RenderStrategy, render_jinja_template
+
+__all__ = ["main"]
+
+# Kept free of Qt so this can run on machines without a display
+
+
+class Writer(typing.Protocol):
+    def write(
+        self, xml_file: pathlib.Path, result: batch.BatchResult
+    ) -> None: ...
+
+
+class JsonLinesWriter:
+    def __init__(self, stream: typing.TextIO) -> None:
+        self.stream = stream
+
+    def write(self, xml_file: pathlib.Path, result: batch.BatchResult) -> None:
+        self.stream.write(
+            json.dumps({"file": str(xml_file), **result._asdict()}) + "\n"
+        )
+
+
+class CsvWriter:
+    def __init__(self, stream: typing.TextIO) -> None:
+        self._writer = csv.writer(stream)
+        self._writer.writerow(["file", *batch.BatchResult._fields])
+
+    def write(self, xml_file: pathlib.Path, result: batch.BatchResult) -> None:
+        self._writer.writerow([str(xml_file), *result])
+
+
+WRITERS: typing.Dict[str, typing.Callable[[typing.TextIO], Writer]] = {
+    "jsonl": JsonLinesWriter,
+    "csv": CsvWriter,
+}
+
+
+class MappingNotFoundError(Exception):
+    pass
+
+
+def read_mapping_template(config_file: pathlib.Path, key: str) -> str:
+    with config_file.open("rb") as fp:
+        data = tomllib.load(fp)
+    for mapping in data.get("mapping", []):
+        if mapping.get("key") == key and "jinja_template" in mapping:
+            return mapping["jinja_template"]
+    raise MappingNotFoundError(
+        f'No mapping with key "{key}" and a jinja_template in '
+        f"{config_file.name}"
+    )
+
+
+def get_arg_parser(prog: str = "gce-cli") -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog=prog,
+        description=(
+            "Render a Jinja expression against every record in MARC XML "
+            "files and write the results to stdout."
+        ),
+    )
+    template = parser.add_mutually_exclusive_group(required=True)
+    template.add_argument(
+        "-e", "--expression", help="Jinja expression to render"
+    )
+    template.add_argument(
+        "--config",
+        type=pathlib.Path,
+        help="TOML mapping file to take the jinja_template from",
+    )
+    parser.add_argument(
+        "--mapping",
+        help="key of the mapping in --config to use",
+    )
+    parser.add_argument(
+        "xml_files",
+        nargs="+",
+        type=pathlib.Path,
+        help="MARC XML records or collections",
+    )
+    parser.add_argument("--format", choices=sorted(WRITERS), default="jsonl")
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=None,
+        help="number of worker processes. Defaults to the number of CPUs.",
+    )
+    parser.add_argument("--chunk-size", type=int, default=64)
+    parser.add_argument(
+        "--timeout",
+        type=int,
+        default=2000,
+        help="milliseconds each record may take to render",
+    )
+    parser.add_argument(
+        "--unordered",
+        action="store_true",
+        help="write results as soon as they finish instead of in file order",
+    )
+    return parser
+
+
+def render_files(
+    jinja_text: str,
+    xml_files: List[pathlib.Path],
+    writer: Writer,
+    jobs: Optional[int] = None,
+    chunk_size: int = 64,
+    ordered: bool = True,
+    render_strategy: RenderStrategy = render_jinja_template,
+    timeout: Optional[int] = 2000,
+) -> int:
+    # Returns the number of records that could not be rendered. One pool of
+    # workers is shared by all the files.
+    errors = 0
+    with batch.create_executor(jobs) as executor:
+        for xml_file in xml_files:
+            for results in batch.render_records(
+                jinja_text,
+                batch.iter_marc_records(xml_file),
+                max_workers=jobs,
+                chunk_size=chunk_size,
+                ordered=ordered,
+                executor=executor,
+                render_strategy=render_strategy,
+                timeout=timeout,
+            ):
+                for result in results:
+                    writer.write(xml_file, result)
+                    if result.error:
+                        errors += 1
+    return errors
+
+
+def main(argv: Optional[Sequence[str]] = None, prog: str = "gce-cli") -> int:
+    # Installed as the gce-cli console script and run by "gce render"
+    parser = get_arg_parser(prog)
+    args = parser.parse_args(argv)
+    if args.config is not None and args.mapping is None:
+        parser.error("--mapping is required with --config")
+
+    try:
+        jinja_text = (
+            args.expression
+            if args.expression is not None
+            else read_mapping_template(args.config, args.mapping)
+        )
+    except (OSError, tomllib.TOMLDecodeError, MappingNotFoundError) as e:
+        print(e, file=sys.stderr)
+        return 2
+
+    try:
+        errors = render_files(
+            jinja_text,
+            args.xml_files,
+            WRITERS[args.format](sys.stdout),
+            jobs=args.jobs,
+            chunk_size=args.chunk_size,
+            ordered=not args.unordered,
+            timeout=args.timeout,
+        )
+        sys.stdout.flush()
+    except BrokenPipeError:
+        # The reader went away, for example when piped into head. Point
+        # stdout somewhere harmless so flushing it at exit does not fail.
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+        return 0
+    except (OSError, ET.ParseError) as e:
+        print(e, file=sys.stderr)
+        return 2
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
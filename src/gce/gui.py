@@ -2,6 +2,7 @@ from __future__ import annotations
 
 import abc
 import functools
+import os
 import pathlib
 import xml.etree.ElementTree as ET
 import logging
@@ -10,13 +11,25 @@ from typing import Type, Optional, Union, Callable
 from xml.dom import minidom
 from xml.parsers.expat import ExpatError
 
-import jinja2
 from PySide6 import QtWidgets, QtCore, QtGui
 import pygments.styles
-import pygments.lexers
 import galatea
-from galatea.merge_data import serialize_with_jinja_template, MappingConfig
-from gce import models
+from gce import lexing, models, record_file, reflow
+from gce.background_reflow import BackgroundReflow
+from gce.batch_preview import BatchPreviewDialog
+from gce.mapping_preview import MappingPreviewPane
+from gce.render_scheduler import RenderScheduler
+from gce.rendering import (
+    JinjaRenderer,  # noqa: F401 still used as gce.gui.JinjaRenderer
+    ProcessRenderer,
+    RenderResult,
+)
+from gce.toml_files import (
+    BackgroundTomlLoader,
+    BackgroundTomlWriter,
+    write_text_atomically,
+)
+from gce.xml_loading import XmlFileLoader
 
 if typing.TYPE_CHECKING:
     from pygments.style import Style as PygmentsStyle
@@ -25,6 +38,91 @@ __all__ = ["JinjaEditorDialog"]
 
 logger = logging.getLogger(__name__)
 
+# Files at least this big open in collection mode
+COLLECTION_MODE_FILE_SIZE = 20 * 1024 * 1024
+
+
+class LargeDocumentThresholds(typing.NamedTuple):
+    # A document over either limit is edited in large-document mode
+    characters: int = 2_000_000
+    lines: int = 50_000
+
+    def exceeded(self, characters: int, lines: int) -> bool:
+        return characters > self.characters or lines > self.lines
+
+    def exceeded_by(self, document: QtGui.QTextDocument) -> bool:
+        return self.exceeded(document.characterCount(), document.blockCount())
+
+
+LARGE_DOCUMENT_THRESHOLDS = LargeDocumentThresholds()
+
+
+class LargeDocumentTextEdit(QtWidgets.QPlainTextEdit):
+    # A document over large_document_thresholds is edited in large-document
+    # mode, without undo or highlighting of the whole document. Subclasses
+    # add to what the mode turns off in _apply_document_features.
+    large_document_mode_changed = QtCore.Signal(bool)
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.large_document_thresholds = LARGE_DOCUMENT_THRESHOLDS
+        self._large_document_mode = False
+        self._ignoring_text_changes = False
+        self.textChanged.connect(self._update_large_document_mode)
+
+    def setPlainText(self, text: str) -> None:
+        # Decided before the text goes in, otherwise all of it would be
+        # highlighted first
+        self._set_large_document_mode(
+            self.large_document_thresholds.exceeded(
+                len(text), text.count("\n") + 1
+            )
+        )
+        # Replacing the text clears the document first, which must not
+        # switch the mode back and forth while the text goes in
+        self._ignoring_text_changes = True
+        try:
+            super().setPlainText(text)
+        finally:
+            self._ignoring_text_changes = False
+
+    @property
+    def large_document_mode(self) -> bool:
+        return self._large_document_mode
+
+    @QtCore.Slot()
+    def _update_large_document_mode(self) -> None:
+        if self._ignoring_text_changes:
+            return
+        self._set_large_document_mode(
+            self.large_document_thresholds.exceeded_by(self.document())
+        )
+
+    def _set_large_document_mode(self, value: bool) -> None:
+        if value == self._large_document_mode:
+            return
+        self._large_document_mode = value
+        self._apply_document_features()
+        self.large_document_mode_changed.emit(value)
+
+    def _apply_document_features(self) -> None:
+        self.document().setUndoRedoEnabled(not self._large_document_mode)
+
+    def _highlight_document(
+        self,
+        highlighter: QtGui.QSyntaxHighlighter,
+        document: Optional[QtGui.QTextDocument],
+    ) -> None:
+        if highlighter.document() is document:
+            return
+        # Detaching clears the formats, which counts as a text change and
+        # would otherwise re-enter here half way through
+        self._ignoring_text_changes = True
+        try:
+            highlighter.setDocument(document)
+        finally:
+            self._ignoring_text_changes = False
+
 
 class JinjaEditorDialog(QtWidgets.QDialog):
     def __init__(self, *args, **kwargs):
@@ -36,9 +134,20 @@ class JinjaEditorDialog(QtWidgets.QDialog):
         self.button_box = QtWidgets.QDialogButtonBox(
             QtWidgets.QDialogButtonBox.StandardButton.Close
         )
+        self.batch_preview_button = self.button_box.addButton(
+            "Batch Preview…", QtWidgets.QDialogButtonBox.ButtonRole.ActionRole
+        )
+        self.batch_preview_button.clicked.connect(self.show_batch_preview)
         self.button_box.rejected.connect(self.reject)
         self._layout.addWidget(self.button_box)
 
+    def show_batch_preview(self) -> BatchPreviewDialog:
+        dialog = BatchPreviewDialog(self.jina_text, parent=self)
+        dialog.setAttribute(QtCore.Qt.WidgetAttribute.WA_DeleteOnClose)
+        dialog.resize(720, 480)
+        dialog.show()
+        return dialog
+
     @property
     def xml_text(self):
         return self._jinja_editor.xml_text
@@ -64,14 +173,17 @@ class JinjaEditorDialog(QtWidgets.QDialog):
         self._jinja_editor.pygments_style = value
 
 
-class XMLViewer(QtWidgets.QTextEdit):
+class XMLViewer(LargeDocumentTextEdit):
     style_colors_changed = QtCore.Signal()
 
+    # position and number of records, position is -1 outside of collection
+    # mode
+    record_changed = QtCore.Signal(int, int)
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.setAcceptRichText(False)
         self._highlighter = PygmentsHighlighter(parent=self.document())
-        self._highlighter.lexer = pygments.lexers.get_lexer_by_name("xml")
+        self._highlighter.lexer = lexing.get_lexer_by_name("xml")
         self.setFont(
             QtGui.QFontDatabase.systemFont(
                 QtGui.QFontDatabase.SystemFont.FixedFont
@@ -84,10 +196,30 @@ class XMLViewer(QtWidgets.QTextEdit):
             lambda pos: xml_text_box_context_menu(self, pos)
         )
         self.load_file_strategy = load_xml_view_file_data
+        self.load_collection_strategy = load_xml_view_collection
+        self.reflow_worker = BackgroundReflow(self)
+        self.reflow_worker.reflowed.connect(self._reflowed)
+        self.reflow_worker.failed.connect(self._reflow_failed)
+        self._reflow_revision = -1
         self.reflow_data_strategy = functools.partial(
-            reflow_xml_data, reflow_strategy=reflow_xml_using_minidom
+            reflow_xml_data_in_background, reflow_strategy=reflow.reflow_xml
         )
 
+        # Collection mode. Only the current record is in the document, the
+        # rest stays in the memory mapped file.
+        self.record_file: Optional[record_file.RecordFile] = None
+        self.record_position = -1
+        self.destroyed.connect(self.close_collection)
+
+        self.file_loader = XmlFileLoader(self)
+
+        # Large-document mode also turns off editing. Only the blocks on
+        # screen get highlighted.
+        self._loading = False
+        self._highlighted_blocks: typing.Set[int] = set()
+        self.document().contentsChange.connect(self._contents_changed)
+        self.updateRequest.connect(self._highlight_visible_blocks)
+
     @property
     def pygments_style(self) -> str:
         return self._highlighter.style.name
@@ -99,15 +231,168 @@ class XMLViewer(QtWidgets.QTextEdit):
             or value != self._highlighter.style.name
         ):
             self._highlighter.style = pygments.styles.get_style_by_name(value)
+            self._highlighted_blocks.clear()
+            self.viewport().update()
             self.style_colors_changed.emit()
 
+    def setText(self, text: str) -> None:
+        # Kept from when the viewer was a QTextEdit. The text is always
+        # plain, never guessed to be HTML.
+        self.setPlainText(text)
+
+    def _apply_document_features(self) -> None:
+        restricted = self._loading or self._large_document_mode
+        self.setReadOnly(restricted)
+        self.document().setUndoRedoEnabled(not restricted)
+        self._highlight_document(
+            self._highlighter, None if restricted else self.document()
+        )
+        self._highlighted_blocks.clear()
+
+    @QtCore.Slot(int, int, int)
+    def _contents_changed(self, position: int, removed: int, added: int):
+        if not self._highlighted_blocks:
+            return
+        first_changed = self.document().findBlock(position).blockNumber()
+        self._highlighted_blocks = {
+            number
+            for number in self._highlighted_blocks
+            if number < first_changed
+        }
+
+    @QtCore.Slot()
+    def _highlight_visible_blocks(self) -> None:
+        if not self._large_document_mode:
+            return
+        block = self.firstVisibleBlock()
+        offset = self.contentOffset()
+        bottom = self.viewport().rect().bottom()
+        highlighted_any = False
+        while block.isValid():
+            if self.blockBoundingGeometry(block).translated(offset).top() > (
+                bottom
+            ):
+                break
+            number = block.blockNumber()
+            if number not in self._highlighted_blocks:
+                # Lines above the ones ever shown have no state and count
+                # as starting from the top level
+                ranges, state = self._highlighter.format_ranges(
+                    block.text(), block.previous().userState()
+                )
+                block.layout().setFormats(ranges)
+                if state != block.userState():
+                    # The lines after this one started from another state
+                    block.setUserState(state)
+                    self._highlighted_blocks = {
+                        highlighted
+                        for highlighted in self._highlighted_blocks
+                        if highlighted < number
+                    }
+                self._highlighted_blocks.add(number)
+                highlighted_any = True
+            block = block.next()
+        if highlighted_any:
+            self.viewport().update()
+
+    def start_reflow(
+        self, xml_text: str, reflow_strategy: Callable[[str], str]
+    ) -> None:
+        self._reflow_revision = self.document().revision()
+        self.reflow_worker.reflow(xml_text, reflow_strategy)
+
+    @QtCore.Slot(str)
+    def _reflowed(self, xml_text: str) -> None:
+        # Drop the result if the text was edited or replaced in the meantime
+        if self.document().revision() != self._reflow_revision:
+            return
+        self.setPlainText(xml_text)
+
+    @QtCore.Slot(object)
+    def _reflow_failed(self, error: Exception) -> None:
+        logger.error("XML parser error: %s", error)
+
+    def load_file(self, file_name: str) -> None:
+        self.close_collection()
+        self.file_loader.load(file_name)
+
+    def begin_load(self) -> None:
+        # Undo history and highlighting for text that arrives in many
+        # pieces is wasted work, both come back once the load is done
+        self._loading = True
+        self.setPlainText("")
+        self._apply_document_features()
+
+    def append_loaded_text(self, text: str) -> None:
+        cursor = QtGui.QTextCursor(self.document())
+        cursor.movePosition(QtGui.QTextCursor.MoveOperation.End)
+        cursor.insertText(text)
+
+    def end_load(self) -> None:
+        self._loading = False
+        self._apply_document_features()
+
+    @property
+    def in_collection_mode(self) -> bool:
+        return self.record_file is not None
+
+    def open_collection(
+        self, file_name: str, fall_back_to_text: bool = False
+    ) -> None:
+        # The record scan runs in the background, the records show up once
+        # it is done
+        self.close_collection()
+        self.file_loader.open_collection(file_name, fall_back_to_text)
+
+    def show_collection(self, records: record_file.RecordFile) -> None:
+        self.close_collection()
+        self.record_file = records
+        if len(records) == 0:
+            self.record_position = -1
+            self.setPlainText("")
+            self.record_changed.emit(-1, 0)
+            return
+        self.show_record(0)
+
+    def close_collection(self) -> None:
+        if self.record_file is None:
+            return
+        self.record_file.close()
+        self.record_file = None
+        self.record_position = -1
+        self.record_changed.emit(-1, 0)
+
+    def show_record(self, position: int) -> None:
+        if self.record_file is None:
+            return
+        if not 0 <= position < len(self.record_file):
+            return
+        self.record_position = position
+        self.setPlainText(self.record_file.record_xml(position))
+        self.record_changed.emit(position, len(self.record_file))
+
+    def next_record(self) -> None:
+        self.show_record(self.record_position + 1)
+
+    def previous_record(self) -> None:
+        self.show_record(self.record_position - 1)
+
+    def show_control_number(self, control_number: str) -> bool:
+        if self.record_file is None:
+            return False
+        position = self.record_file.find(control_number)
+        if position is None:
+            return False
+        self.show_record(position)
+        return True
+
 
 def xml_text_box_context_menu(
     parent: XMLViewer,
     pos: QtCore.QPoint,
     starting_menu_factory: Callable[
-        [QtWidgets.QTextEdit], QtWidgets.QMenu
-    ] = QtWidgets.QTextEdit.createStandardContextMenu,
+        [QtWidgets.QPlainTextEdit], QtWidgets.QMenu
+    ] = QtWidgets.QPlainTextEdit.createStandardContextMenu,
     action_build_factory: Callable[
         [str, QtWidgets.QWidget], QtGui.QAction
     ] = QtGui.QAction,
@@ -124,11 +409,23 @@ def xml_text_box_context_menu(
     )
     menu.addAction(load_from_file_action)
 
+    load_collection_action = action_build_factory(
+        "Open Collection from File", parent
+    )
+    load_collection_action.triggered.connect(
+        lambda: parent.load_collection_strategy(parent)
+    )
+    menu.addAction(load_collection_action)
+
     reflow_xml_file_action = action_build_factory("Reflow XML Data", parent)
     reflow_xml_file_action.triggered.connect(
         lambda: parent.reflow_data_strategy(parent)
     )
-    reflow_xml_file_action.setEnabled(parent.toPlainText().strip() != "")
+    reflow_xml_file_action.setEnabled(
+        parent.toPlainText().strip() != ""
+        and not parent.reflow_worker.is_busy
+        and not parent.file_loader.is_loading
+    )
     menu.addAction(reflow_xml_file_action)
     menu.exec(parent.mapToGlobal(pos))
 
@@ -143,11 +440,42 @@ def load_xml_view_file_data(
         dir="",
         filter="Xml Files (*.xml);;All Files (*)",
     ),
+) -> None:
+    file_name, _ = file_dialog_strategy(viewer)
+    if not file_name:
+        return
+
+    # Reading a whole collection export into the document can take
+    # gigabytes, so large files are opened one record at a time instead
+    if (
+        os.path.isfile(file_name)
+        and os.path.getsize(file_name) >= COLLECTION_MODE_FILE_SIZE
+    ):
+        viewer.open_collection(file_name, fall_back_to_text=True)
+        return
+    viewer.load_file(file_name)
+
+
+def load_xml_view_collection(
+    viewer: XMLViewer,
+    file_dialog_strategy: Callable[
+        [XMLViewer], typing.Tuple[str, str]
+    ] = functools.partial(
+        QtWidgets.QFileDialog.getOpenFileName,
+        caption="Open MARC XML Collection",
+        dir="",
+        filter="Xml Files (*.xml);;All Files (*)",
+    ),
 ) -> None:
     file_name, _ = file_dialog_strategy(viewer)
     if file_name:
-        with open(file_name, "r") as f:
-            viewer.setText(f.read())
+        open_collection(viewer, file_name)
+
+
+def open_collection(viewer: XMLViewer, file_name: str) -> None:
+    # Scanning is only slow the first time, after that the sidecar index is
+    # used. Errors are reported by the viewer's file loader.
+    viewer.open_collection(file_name)
 
 
 def reflow_xml_using_minidom(xml_data: str) -> str:
@@ -164,11 +492,117 @@ def reflow_xml_data(
     if not xml_string:
         return
     try:
-        viewer.setText(reflow_strategy(xml_string))
-    except ExpatError as e:
+        viewer.setPlainText(reflow_strategy(xml_string))
+    except (ExpatError, ET.ParseError) as e:
         logger.error("XML parser error: %s", e)
 
 
+def reflow_xml_data_in_background(
+    viewer: XMLViewer, reflow_strategy: Callable[[str], str]
+) -> None:
+    xml_string = viewer.toPlainText()
+    if not xml_string:
+        return
+    viewer.start_reflow(xml_string, reflow_strategy)
+
+
+class FileLoadProgress(QtWidgets.QWidget):
+    def __init__(
+        self,
+        loader: XmlFileLoader,
+        parent: Optional[QtWidgets.QWidget] = None,
+    ) -> None:
+        super().__init__(parent)
+        layout = QtWidgets.QHBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        self.label = QtWidgets.QLabel(self)
+        layout.addWidget(self.label)
+        self.progress_bar = QtWidgets.QProgressBar(self)
+        self.progress_bar.setRange(0, 1000)
+        self.progress_bar.setTextVisible(False)
+        layout.addWidget(self.progress_bar, stretch=1)
+        self.cancel_button = QtWidgets.QToolButton(self)
+        self.cancel_button.setText("Cancel")
+        self.cancel_button.clicked.connect(loader.cancel)
+        layout.addWidget(self.cancel_button)
+
+        loader.loading_started.connect(self._loading_started)
+        loader.progress.connect(self._progress)
+        loader.finished.connect(self.hide)
+        self.hide()
+
+    @QtCore.Slot(str)
+    def _loading_started(self, file_name: str) -> None:
+        self.label.setText(f"Loading {os.path.basename(file_name)}")
+        self.progress_bar.setValue(0)
+        self.show()
+
+    @QtCore.Slot(object, object)
+    def _progress(self, bytes_read: int, total: int) -> None:
+        if total:
+            self.progress_bar.setValue(int(1000 * bytes_read / total))
+
+
+class RecordNavigator(QtWidgets.QWidget):
+    def __init__(
+        self,
+        viewer: XMLViewer,
+        parent: Optional[QtWidgets.QWidget] = None,
+    ) -> None:
+        super().__init__(parent)
+        self.viewer = viewer
+        layout = QtWidgets.QHBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+
+        self.previous_button = QtWidgets.QToolButton(self)
+        self.previous_button.setText("Previous")
+        self.previous_button.clicked.connect(viewer.previous_record)
+        layout.addWidget(self.previous_button)
+
+        self.next_button = QtWidgets.QToolButton(self)
+        self.next_button.setText("Next")
+        self.next_button.clicked.connect(viewer.next_record)
+        layout.addWidget(self.next_button)
+
+        self.position_label = QtWidgets.QLabel(self)
+        layout.addWidget(self.position_label, stretch=1)
+
+        self.control_number = QtWidgets.QLineEdit(self)
+        self.control_number.setPlaceholderText("Control number (001)")
+        self.control_number.returnPressed.connect(self.jump)
+        layout.addWidget(self.control_number)
+
+        self.jump_button = QtWidgets.QToolButton(self)
+        self.jump_button.setText("Go")
+        self.jump_button.clicked.connect(self.jump)
+        layout.addWidget(self.jump_button)
+
+        viewer.record_changed.connect(self.update_position)
+        self.update_position(viewer.record_position, 0)
+
+    @QtCore.Slot(int, int)
+    def update_position(self, position: int, count: int) -> None:
+        self.setVisible(self.viewer.in_collection_mode)
+        if position < 0:
+            self.position_label.setText(f"No records ({count})")
+        else:
+            assert self.viewer.record_file is not None
+            control_number = self.viewer.record_file.control_number(position)
+            self.position_label.setText(
+                f"Record {position + 1} of {count}"
+                + (f" ({control_number})" if control_number else "")
+            )
+        self.previous_button.setEnabled(position > 0)
+        self.next_button.setEnabled(0 <= position < count - 1)
+
+    def jump(self) -> None:
+        control_number = self.control_number.text().strip()
+        if not control_number:
+            return
+        if not self.viewer.show_control_number(control_number):
+            self.position_label.setText(f"No record with 001 {control_number}")
+
+
 class _JinjaEditor(QtWidgets.QWidget):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -186,15 +620,21 @@ class _JinjaEditor(QtWidgets.QWidget):
 
         self.xml_text_edit_widget = XMLViewer(self)
         self.xml_text_edit_widget.setTabChangesFocus(True)
-        self._widget_layout.addWidget(self.xml_text_edit_widget, 0, 1, 1, 1)
+        self.record_navigator = RecordNavigator(self.xml_text_edit_widget)
+        xml_column = QtWidgets.QVBoxLayout()
+        xml_column.addWidget(self.record_navigator)
+        self.file_load_progress = FileLoadProgress(
+            self.xml_text_edit_widget.file_loader
+        )
+        xml_column.addWidget(self.file_load_progress)
+        xml_column.addWidget(self.xml_text_edit_widget)
+        self._widget_layout.addLayout(xml_column, 0, 1, 1, 1)
 
         self.jinja_expression_label = QtWidgets.QLabel("Jinja Expression")
         self._widget_layout.addWidget(self.jinja_expression_label, 1, 0, 1, 1)
 
         self.jinja_expression = LineEditSyntaxHighlighting(self)
-        self.jinja_expression.lexer = pygments.lexers.get_lexer_by_name(
-            "jinja"
-        )
+        self.jinja_expression.lexer = lexing.get_lexer_by_name("jinja")
         self._widget_layout.addWidget(self.jinja_expression, 1, 1, 1, 1)
 
         self._spacer = QtWidgets.QSpacerItem(
@@ -224,56 +664,15 @@ class _JinjaEditor(QtWidgets.QWidget):
         self.output.setReadOnly(True)
         self._widget_layout.addWidget(self.output, 4, 0, 1, 2)
 
-
-class JinjaRenderer:
-    def __init__(self):
-        super().__init__()
-        self.jinja_text = ""
-        self.xml = ""
-        self.output = ""
-        self.is_valid = True
-        self.error_message = None
-
-    def render(self):
-        config = MappingConfig(
-            key="",
-            matching_keys=[],
-            delimiter="||",
-            existing_data="keep",
-            serialize_method="jinja2",
-            experimental={"jinja2": {"template": self.jinja_text}},
+        self.status_bar = QtWidgets.QStatusBar(self)
+        self.status_bar.setSizeGripEnabled(False)
+        self.render_button = QtWidgets.QPushButton("Render", self)
+        self.render_button.setToolTip(
+            "Render the expression against the current document"
         )
-        try:
-            self.error_message = None
-            res = serialize_with_jinja_template(
-                ET.fromstring(self.xml),
-                config,
-                enable_experimental_features=True,
-            )
-            self.is_valid = True
-            self.output = res
-            return res
-        except jinja2.exceptions.UndefinedError as e:
-            self.error_message = f"jinja2 exception Undefined Error : {e}"
-            self.output = ""
-            self.is_valid = False
-            return self.error_message
-
-        except jinja2.exceptions.TemplateSyntaxError as e:
-            self.error_message = (
-                f"Jinja expression Template Syntax Error : {e}"
-            )
-            self.output = ""
-            self.is_valid = False
-            return self.error_message
-        except ET.ParseError as e:
-            if self.xml == "":
-                self.is_valid = True
-                return self.output
-            self.error_message = f"Unable to parse xml data: {e}"
-            self.output = ""
-            self.is_valid = False
-            return self.error_message
+        self.render_button.hide()
+        self.status_bar.addPermanentWidget(self.render_button)
+        self._widget_layout.addWidget(self.status_bar, 5, 0, 1, 2)
 
 
 class JinjaEditor(QtWidgets.QWidget):
@@ -291,17 +690,92 @@ class JinjaEditor(QtWidgets.QWidget):
         )
         self._widget_layout = QtWidgets.QVBoxLayout(self)
         self._widget_layout.addWidget(self._widgets)
+        # Templates are rendered in a child process so that a runaway
+        # template cannot hang or exhaust the memory of the editor
+        self.process_renderer = ProcessRenderer()
+        self.render_scheduler = RenderScheduler(
+            self, render_strategy=self.process_renderer.render
+        )
+        self.destroyed.connect(self.process_renderer.close)
+        self.render_scheduler.rendered.connect(self._show_render_result)
         self.xml_data_changed.connect(self.update_output)
         self.jinja_expression_changed.connect(self.update_output)
+        self._widgets.render_button.clicked.connect(self.render_output)
+        for widget in (
+            self._widgets.xml_text_edit_widget,
+            self._widgets.jinja_expression,
+        ):
+            widget.large_document_mode_changed.connect(
+                self._large_document_mode_changed
+            )
+        file_loader = self._widgets.xml_text_edit_widget.file_loader
+        file_loader.decode_failed.connect(self._xml_decode_failed)
+        file_loader.failed.connect(self._xml_load_failed)
+
+    @property
+    def live_rendering_paused(self) -> bool:
+        return (
+            self._widgets.xml_text_edit_widget.large_document_mode
+            or self._widgets.jinja_expression.large_document_mode
+        )
 
     def update_output(self):
-        renderer = JinjaRenderer()
-        renderer.jinja_text = self._widgets.jinja_expression.text
-        renderer.xml = self._widgets.xml_text_edit_widget.toPlainText()
-        self._widgets.output.setText(renderer.render())
+        # Rendering a huge document on every change would keep the render
+        # process busy all the time, so it waits for the Render button
+        if self.live_rendering_paused:
+            return
+        self._schedule_render()
+
+    def render_output(self) -> None:
+        self._schedule_render()
+        self.render_scheduler.flush()
+
+    def _schedule_render(self) -> None:
+        self.render_scheduler.schedule(
+            self._widgets.jinja_expression.text,
+            self._widgets.xml_text_edit_widget.toPlainText(),
+        )
+
+    @QtCore.Slot(bool)
+    def _large_document_mode_changed(self, _: bool) -> None:
+        suspended = []
+        if self._widgets.xml_text_edit_widget.large_document_mode:
+            suspended += [
+                "undo",
+                "editing",
+                "highlighting outside the visible lines",
+            ]
+        if self._widgets.jinja_expression.large_document_mode:
+            suspended += ["expression highlighting", "expression undo"]
+        paused = self.live_rendering_paused
+        self._widgets.render_button.setVisible(paused)
+        if not paused:
+            self._widgets.status_bar.clearMessage()
+            self.update_output()
+            return
+        suspended.append("live rendering")
+        self._widgets.status_bar.showMessage(
+            f"Large document mode. Suspended: {', '.join(suspended)}."
+        )
+
+    @QtCore.Slot(str, object)
+    def _xml_decode_failed(self, file_name: str, offset: int) -> None:
+        self._widgets.status_bar.showMessage(
+            f"Some bytes in {os.path.basename(file_name)} could not be"
+            f" decoded and were replaced, the first at byte {offset}."
+        )
+
+    @QtCore.Slot(str, object)
+    def _xml_load_failed(self, file_name: str, error: Exception) -> None:
+        self._widgets.status_bar.showMessage(
+            f"Unable to read {os.path.basename(file_name)}. {error}"
+        )
+
+    def _show_render_result(self, result: RenderResult) -> None:
+        self._widgets.output.setText(result.text)
 
         palette = self.palette()
-        if renderer.is_valid:
+        if result.is_valid:
             default_text_color = palette.text()
             self._widgets.output.setStyleSheet(
                 f"color: {default_text_color.color().value()};"
@@ -343,7 +817,7 @@ class JinjaEditor(QtWidgets.QWidget):
         return self._widgets.output.text()
 
 
-class LineEditSyntaxHighlighting(QtWidgets.QPlainTextEdit):
+class LineEditSyntaxHighlighting(LargeDocumentTextEdit):
     editingFinished = QtCore.Signal()
     style_colors_changed = QtCore.Signal()
 
@@ -368,7 +842,7 @@ class LineEditSyntaxHighlighting(QtWidgets.QPlainTextEdit):
             "default"
         )
         self._highlighter = PygmentsHighlighter(parent=self.document())
-        self._highlighter.lexer = pygments.lexers.get_lexer_by_name("jinja")
+        self._highlighter.lexer = lexing.get_lexer_by_name("jinja")
         self.setFont(
             QtGui.QFontDatabase.systemFont(
                 QtGui.QFontDatabase.SystemFont.FixedFont
@@ -401,6 +875,15 @@ class LineEditSyntaxHighlighting(QtWidgets.QPlainTextEdit):
     def text(self, value: str) -> None:
         self.setPlainText(value)
 
+    def _apply_document_features(self) -> None:
+        # An expression pasted over the thresholds stays editable
+        super()._apply_document_features()
+        if self._highlighter is not None:
+            self._highlight_document(
+                self._highlighter,
+                None if self._large_document_mode else self.document(),
+            )
+
     def sizeHint(self, /):
         font_metrics = self.fontMetrics()
         line_height = font_metrics.height() + self.padding  # Add some padding
@@ -415,6 +898,8 @@ class PygmentsHighlighter(QtGui.QSyntaxHighlighter):
         super().__init__(parent)
         self._lexer = None
         self._style: Optional[Type[PygmentsStyle]] = None
+        self._states = lexing.LexerStates()
+        self.token_cache = lexing.TokenCache()
 
     @property
     def lexer(self):
@@ -424,6 +909,7 @@ class PygmentsHighlighter(QtGui.QSyntaxHighlighter):
     def lexer(self, value) -> None:
         if value != self._lexer:
             self._lexer = value
+            self._states = lexing.LexerStates()
             self.lexer_changed.emit()
             self.rehighlight()
 
@@ -438,6 +924,7 @@ class PygmentsHighlighter(QtGui.QSyntaxHighlighter):
             self.style_changed.emit()
             self._formats = self._get_pygments_formats()
             self.rehighlight()
+            logger.debug("Token cache: %s", self.token_cache.cache_info())
 
     def _get_pygments_formats(self):
         formats = {}
@@ -465,17 +952,48 @@ class PygmentsHighlighter(QtGui.QSyntaxHighlighter):
         fmt.setForeground(color)
         return fmt
 
-    def highlightBlock(self, text: str) -> None:
+    def _token_formats(
+        self, text: str, previous_state: int
+    ) -> typing.Tuple[
+        typing.List[typing.Tuple[int, int, QtGui.QTextCharFormat]], int
+    ]:
         if not self._lexer or not self._style:
-            return
-        for start, token_type, value in self._lexer.get_tokens_unprocessed(
-            text
-        ):
-            length = len(value)
+            return [], -1
+        tokens, stack = self.token_cache.lex_line(
+            self._lexer, text, self._states.stack(previous_state)
+        )
+        formats = []
+        for start, token_type, value in tokens:
             if token_type in self._formats:
-                self.setFormat(start, length, self._formats[token_type])
+                formats.append((start, len(value), self._formats[token_type]))
             else:
                 logger.warning("%s was called but not implemented", token_type)
+        return formats, self._states.number(stack)
+
+    def highlightBlock(self, text: str) -> None:
+        # Each block is lexed from the state the one before it ended in.
+        # Qt only goes on to the next block while the state a block ends
+        # in changes, so an edit re-lexes no further than it has to.
+        formats, state = self._token_formats(text, self.previousBlockState())
+        for start, length, text_format in formats:
+            self.setFormat(start, length, text_format)
+        self.setCurrentBlockState(state)
+
+    def format_ranges(
+        self, text: str, previous_state: int = -1
+    ) -> typing.Tuple[typing.List[QtGui.QTextLayout.FormatRange], int]:
+        # The same formats as highlightBlock and the state the text ends
+        # in, for applying to a block's layout directly without the
+        # highlighter attached to the document
+        formats, state = self._token_formats(text, previous_state)
+        ranges = []
+        for start, length, text_format in formats:
+            format_range = QtGui.QTextLayout.FormatRange()
+            format_range.start = start
+            format_range.length = length
+            format_range.format = text_format
+            ranges.append(format_range)
+        return ranges, state
 
 
 class TomlView(QtWidgets.QTreeView):
@@ -508,23 +1026,21 @@ class MainWindow(QtWidgets.QMainWindow):
     open_file_requested = QtCore.Signal()
     status_message_updated = QtCore.Signal(str, int)
 
-    @classmethod
-    def is_model_data_different_than_file(
-        cls,
-        toml_file: pathlib.Path,
-        toml_model: models.TomlModel,
-        comparison_strategy=models.data_has_changed,
-    ) -> bool:
-        with toml_file.open() as f:
-            og_text = f.read()
-        return comparison_strategy(og_text, toml_model)
-
     def __init__(self, *args, **kwargs) -> None:
         super().__init__(*args, **kwargs)
         self.toml_view = TomlView(parent=self)
         self.toml_view.setAlternatingRowColors(True)
         self._current_file: Optional[str] = None
         self.setCentralWidget(self.toml_view)
+        self.mapping_preview = MappingPreviewPane(self)
+        self.mapping_preview_dock = QtWidgets.QDockWidget(
+            "Mapping Preview", self
+        )
+        self.mapping_preview_dock.setWidget(self.mapping_preview)
+        self.addDockWidget(
+            QtCore.Qt.DockWidgetArea.RightDockWidgetArea,
+            self.mapping_preview_dock,
+        )
         # self.setWindowTitle("TOML Editor")
         toolbar = QtWidgets.QToolBar("File Toolbar")
         self.addToolBar(QtCore.Qt.ToolBarArea.LeftToolBarArea, toolbar)
@@ -551,7 +1067,50 @@ class MainWindow(QtWidgets.QMainWindow):
         )
         self.toml_view.setFocus()
         self.load_toml_strategy = load_toml
-        self.write_toml_strategy = write_toml
+        self._loading_file: Optional[str] = None
+        self.toml_loader = BackgroundTomlLoader(self)
+        self.toml_loader.loaded.connect(self._toml_file_loaded)
+        self.toml_loader.failed.connect(self._toml_file_load_failed)
+        self.toml_loader.cancelled.connect(self._toml_file_load_cancelled)
+        self._add_loading_indicator()
+        self.toml_writer = BackgroundTomlWriter(self)
+        self.toml_writer.saved.connect(self._toml_file_saved)
+        self.toml_writer.save_failed.connect(self._toml_file_save_failed)
+        self.write_toml_strategy = self.toml_writer.save
+        self.confirm_strategy: Callable[[QtWidgets.QWidget, str], bool] = (
+            confirm_with_user
+        )
+
+    def closeEvent(self, event: QtGui.QCloseEvent) -> None:
+        if self.toml_writer.is_saving and not self._finish_saving():
+            event.ignore()
+            return
+        super().closeEvent(event)
+
+    def _finish_saving(self) -> bool:
+        # Quitting while a save is being written would lose it, so the
+        # window waits for it. If it fails, the user gets to stay and
+        # try again.
+        failures: typing.List[str] = []
+
+        def save_failed(file: pathlib.Path, message: str) -> None:
+            failures.append(f"{file.name}: {message}")
+
+        self.toml_writer.save_failed.connect(save_failed)
+        QtGui.QGuiApplication.setOverrideCursor(
+            QtCore.Qt.CursorShape.WaitCursor
+        )
+        try:
+            self.toml_writer.finish_pending_saves()
+        finally:
+            QtGui.QGuiApplication.restoreOverrideCursor()
+            self.toml_writer.save_failed.disconnect(save_failed)
+        if not failures:
+            return True
+        return self.confirm_strategy(
+            self,
+            "Unable to save {}. Close anyway?".format("\n".join(failures)),
+        )
 
     @property
     def unsaved_changes(self) -> bool:
@@ -562,9 +1121,7 @@ class MainWindow(QtWidgets.QMainWindow):
             raise ValueError(
                 f"toml model not loaded in viewer. toml_file = {self.toml_file}"
             )
-        return self.is_model_data_different_than_file(
-            pathlib.Path(self.toml_file), model
-        )
+        return model.is_modified
 
     def _connect_toolbar(self, toolbar):
         self.load_action.triggered.connect(self.open_file_requested)
@@ -584,25 +1141,110 @@ class MainWindow(QtWidgets.QMainWindow):
 
     @toml_file.setter
     def toml_file(self, value: Union[str, None]) -> None:
-        self._current_file = value
-        self.state.set_toml_file(
-            pathlib.Path(value) if value is not None else None
-        )
+        # The current file stays the one of the document on screen until
+        # the new one has loaded, so saving in the meantime writes the
+        # document being shown back to its own file
+        if value is None:
+            self._current_file = None
+            self._loading_file = None
+            self.state.set_toml_file(None)
+            return
+        self._loading_file = value
+        self.state.set_toml_file(pathlib.Path(value))
 
     def write_to_file(
         self, file: pathlib.Path, model: models.TomlModel
     ) -> None:
         self.state.write_toml_file(file, model)
 
+    def _add_loading_indicator(self) -> None:
+        self.loading_label = QtWidgets.QLabel(self)
+        self.loading_progress = QtWidgets.QProgressBar(self)
+
+        # There is no way to tell how far along tomllib is, so show a busy
+        # indicator rather than a percentage
+        self.loading_progress.setRange(0, 0)
+        self.loading_progress.setMaximumWidth(120)
+        self.cancel_loading_button = QtWidgets.QToolButton(self)
+        self.cancel_loading_button.setText("Cancel")
+        self.cancel_loading_button.clicked.connect(self.toml_loader.cancel)
+        for widget in [
+            self.loading_label,
+            self.loading_progress,
+            self.cancel_loading_button,
+        ]:
+            widget.setVisible(False)
+            self.status_bar.addPermanentWidget(widget)
+        self.toml_loader.loading_started.connect(
+            lambda toml_file: self._set_loading_indicator(
+                f"Loading {toml_file.name}"
+            )
+        )
+        self.toml_loader.finished.connect(
+            lambda: self._set_loading_indicator(None)
+        )
+
+    def _set_loading_indicator(self, message: Optional[str]) -> None:
+        self.loading_label.setText(message or "")
+        for widget in [
+            self.loading_label,
+            self.loading_progress,
+            self.cancel_loading_button,
+        ]:
+            widget.setVisible(message is not None)
+
+    def _toml_file_loaded(
+        self, toml_file: pathlib.Path, model: models.TomlModel
+    ) -> None:
+        self._current_file = self._loading_file or str(toml_file)
+        self._loading_file = None
+        StateUtility.toml_file_loaded(self, toml_file, model)
+
+    def _toml_file_load_failed(
+        self, toml_file: pathlib.Path, error: Exception
+    ) -> None:
+        self._loading_file = None
+        StateUtility.toml_file_load_failed(
+            self, toml_file, typing.cast(typing.Any, error)
+        )
+
+    def _toml_file_load_cancelled(self, toml_file: pathlib.Path) -> None:
+        self._loading_file = None
+        StateUtility.toml_file_load_cancelled(self, toml_file)
+
+    def _toml_file_saved(
+        self, file: pathlib.Path, model: models.TomlModel
+    ) -> None:
+        self.status_message_updated.emit(f"Saved {file.name}", logging.INFO)
+        if model is self.toml_view.model():
+            StateUtility.update_window(self, model)
+
+    def _toml_file_save_failed(self, file: pathlib.Path, message: str) -> None:
+        self.status_message_updated.emit(
+            f"Unable to save {file.name}. {message}", logging.ERROR
+        )
+
+
+def confirm_with_user(parent: QtWidgets.QWidget, message: str) -> bool:
+    reply = QtWidgets.QMessageBox.question(
+        parent,
+        "TOML Editor",
+        message,
+        QtWidgets.QMessageBox.StandardButton.Yes
+        | QtWidgets.QMessageBox.StandardButton.No,
+        QtWidgets.QMessageBox.StandardButton.No,
+    )
+    return reply == QtWidgets.QMessageBox.StandardButton.Yes
+
 
 def write_toml(
     toml_file: pathlib.Path,
     model: models.TomlModel,
     serialization_strategy=models.export_toml,
 ) -> None:
-    data = serialization_strategy(model)
-    with toml_file.open("w", encoding="utf-8") as f:
-        f.write(data)
+    snapshot = models.create_snapshot(model, serialization_strategy)
+    write_text_atomically(toml_file, typing.cast(str, snapshot.text))
+    model.mark_saved(snapshot)
 
 
 def load_toml(
@@ -641,42 +1283,76 @@ class StateUtility:
         if toml_file is None:
             context.save_action.setEnabled(False)
             context.toml_view.setModel(None)
+            context.mapping_preview.preview_model.set_source_model(None)
             if context.toml_file is not None:
                 context.toml_file = None
             return
-        try:
-            model = context.load_toml_strategy(pathlib.Path(toml_file))
-            model.dataChanged.connect(
-                lambda *_: context.state.data_modified(model)
-            )
+        context.toml_loader.load(
+            pathlib.Path(toml_file), context.load_toml_strategy
+        )
 
-        except (
-            galatea.merge_data.BadMappingFileError,
-            galatea.merge_data.BadMappingDataError,
-        ) as e:
-            cls.reset_workspace(context)
-            if context.toml_file is not None:
-                context.toml_file = None
-            context.status_message_updated.emit(e.details, logging.ERROR)
-            context.status_message_updated.emit(
-                f"Unable to open {pathlib.Path(toml_file).name}", logging.INFO
-            )
-            context.state = NoDocumentLoadedState(context)
-            return
+    @classmethod
+    def toml_file_loaded(
+        cls,
+        context: MainWindow,
+        toml_file: pathlib.Path,
+        model: models.TomlModel,
+    ) -> None:
+        model.dataChanged.connect(
+            lambda *_: context.state.data_modified(model)
+        )
         model.setParent(context.toml_view)
         context.toml_view.setModel(model)
         context.toml_view.setColumnWidth(0, 300)
+        context.mapping_preview.preview_model.set_source_model(model)
         context.status_message_updated.emit(
             f"Opened {pathlib.Path(toml_file).name}", logging.INFO
         )
         context.setWindowTitle(f"TOML Editor: {pathlib.Path(toml_file).name}")
         context.state = FileLoadedUnmodifiedState(context)
 
+    @classmethod
+    def toml_file_load_failed(
+        cls,
+        context: MainWindow,
+        toml_file: pathlib.Path,
+        error: Union[
+            galatea.merge_data.BadMappingFileError,
+            galatea.merge_data.BadMappingDataError,
+        ],
+    ) -> None:
+        cls.reset_workspace(context)
+        if context.toml_file is not None:
+            context.toml_file = None
+        context.status_message_updated.emit(error.details, logging.ERROR)
+        context.status_message_updated.emit(
+            f"Unable to open {pathlib.Path(toml_file).name}", logging.INFO
+        )
+        context.state = NoDocumentLoadedState(context)
+
+    @classmethod
+    def toml_file_load_cancelled(
+        cls, context: MainWindow, toml_file: pathlib.Path
+    ) -> None:
+        context.status_message_updated.emit(
+            f"Cancelled opening {pathlib.Path(toml_file).name}", logging.INFO
+        )
+        if context.toml_view.model() is None:
+            cls.reset_workspace(context)
+            if context.toml_file is not None:
+                context.toml_file = None
+            return
+        cls.update_window(
+            context,
+            typing.cast(models.TomlModel, context.toml_view.model()),
+        )
+
     @staticmethod
     def reset_workspace(context: MainWindow) -> None:
         context.setWindowTitle("TOML Editor")
         context.save_action.setEnabled(False)
         context.toml_view.setModel(None)
+        context.mapping_preview.preview_model.set_source_model(None)
         context.state = NoDocumentLoadedState(context)
 
     @classmethod
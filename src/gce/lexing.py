@@ -0,0 +1,346 @@
+import collections
+import functools
+import typing
+from typing import Callable, Dict, List, Optional, Tuple
+
+import pygments.lexers
+from pygments.lexer import Lexer, RegexLexer, bygroups, inherit
+from pygments.lexers.html import XmlLexer as PygmentsXmlLexer
+from pygments.lexers.templates import DjangoLexer
+from pygments.token import (
+    Comment,
+    Error,
+    Keyword,
+    String,
+    Text,
+    Whitespace,
+    _TokenType,
+)
+
+__all__ = [
+    "CacheInfo",
+    "JinjaLexer",
+    "LexerStates",
+    "TokenCache",
+    "XmlLexer",
+    "get_lexer_by_name",
+    "lex_line",
+]
+
+# Where a regex lexer starts and where it resets to after an unmatched newline
+ROOT_STACK: Tuple[str, ...] = ("root",)
+
+# Lines kept by a TokenCache. Documents longer than the large-document line
+# threshold are not highlighted in full, so this holds every line of any
+# document that is.
+TOKEN_CACHE_SIZE = 50_000
+
+Token = Tuple[int, _TokenType, str]
+LexedLine = Tuple[List[Token], Tuple[str, ...]]
+
+
+TokenTable = Dict[str, List[Tuple[Callable, typing.Any, typing.Any]]]
+
+
+@functools.cache
+def _token_table(lexer_class: typing.Type[RegexLexer]) -> Optional[TokenTable]:
+    # The compiled rules are private to Pygments. If a Pygments version
+    # lays them out differently, lexing falls back to the public API
+    # rather than depending on one version range.
+    tokendefs = getattr(lexer_class, "_tokens", None)
+    if not isinstance(tokendefs, dict) or "root" not in tokendefs:
+        return None
+    for rules in tokendefs.values():
+        for rule in rules:
+            if not (
+                isinstance(rule, tuple)
+                and len(rule) == 3
+                and callable(rule[0])
+                and (
+                    rule[1] is None
+                    or isinstance(rule[1], _TokenType)
+                    or callable(rule[1])
+                )
+                and (
+                    rule[2] is None
+                    or isinstance(rule[2], (tuple, int))
+                    or rule[2] == "#push"
+                )
+            ):
+                return None
+    return tokendefs
+
+
+def _regex_tokens(
+    lexer: RegexLexer,
+    text: str,
+    stack: typing.Sequence[str],
+    tokendefs: TokenTable,
+) -> Tuple[List[Token], Tuple[str, ...]]:
+    # RegexLexer.get_tokens_unprocessed keeps its state stack to itself, so
+    # this is the same loop with the stack handed back at the end
+    tokens: List[Token] = []
+    statestack = list(stack)
+    statetokens = tokendefs[statestack[-1]]
+    position = 0
+    while True:
+        for rexmatch, action, new_state in statetokens:
+            m = rexmatch(text, position)
+            if not m:
+                continue
+            if action is not None:
+                if type(action) is _TokenType:
+                    tokens.append((position, action, m.group()))
+                else:
+                    tokens.extend(action(lexer, m))
+            position = m.end()
+            if new_state is not None:
+                if isinstance(new_state, tuple):
+                    for state in new_state:
+                        if state == "#pop":
+                            if len(statestack) > 1:
+                                statestack.pop()
+                        elif state == "#push":
+                            statestack.append(statestack[-1])
+                        else:
+                            statestack.append(state)
+                elif isinstance(new_state, int):
+                    if abs(new_state) >= len(statestack):
+                        del statestack[1:]
+                    else:
+                        del statestack[new_state:]
+                elif new_state == "#push":
+                    statestack.append(statestack[-1])
+                statetokens = tokendefs[statestack[-1]]
+            break
+        else:
+            if position >= len(text):
+                break
+            if text[position] == "\n":
+                statestack = list(ROOT_STACK)
+                statetokens = tokendefs[statestack[-1]]
+                tokens.append((position, Whitespace, "\n"))
+            else:
+                tokens.append((position, Error, text[position]))
+            position += 1
+    return tokens, tuple(statestack)
+
+
+def lex_line(
+    lexer: Lexer, text: str, stack: typing.Sequence[str] = ROOT_STACK
+) -> LexedLine:
+    # Lexes one line starting from the state the previous line ended in and
+    # returns its tokens with the state it ends in. The newline is lexed as
+    # well, rules that look for it behave as they do over a whole document,
+    # but no token reaches past the line itself.
+    if not isinstance(lexer, RegexLexer):
+        # No state to carry, every line starts over
+        tokens = list(lexer.get_tokens_unprocessed(f"{text}\n"))
+        end_stack = ROOT_STACK
+    elif (tokendefs := _token_table(lexer.__class__)) is None:
+        # Without the rules the state a line ends in is unknown, so like
+        # the lexers above every line starts over
+        tokens = list(lexer.get_tokens_unprocessed(f"{text}\n"))
+        end_stack = ROOT_STACK
+    else:
+        # A state left from a different lexer starts the line over
+        if not all(state in tokendefs for state in stack):
+            stack = ROOT_STACK
+        tokens, end_stack = _regex_tokens(lexer, f"{text}\n", stack, tokendefs)
+    line: List[Token] = []
+    for start, token_type, value in tokens:
+        if start >= len(text):
+            break
+        line.append((start, token_type, value[: len(text) - start]))
+    return line, end_stack
+
+
+class LexerStates:
+    # QSyntaxHighlighter keeps a single int per block, so each distinct
+    # state stack gets a number. -1, a block that was never highlighted,
+    # is the root state.
+
+    def __init__(self) -> None:
+        self._stacks: List[Tuple[str, ...]] = [ROOT_STACK]
+        self._numbers: Dict[Tuple[str, ...], int] = {ROOT_STACK: 0}
+
+    def __len__(self) -> int:
+        return len(self._stacks)
+
+    def number(self, stack: typing.Sequence[str]) -> int:
+        stack = tuple(stack)
+        number = self._numbers.get(stack)
+        if number is None:
+            number = self._numbers[stack] = len(self._stacks)
+            self._stacks.append(stack)
+        return number
+
+    def stack(self, number: int) -> Tuple[str, ...]:
+        if 0 <= number < len(self._stacks):
+            return self._stacks[number]
+        return ROOT_STACK
+
+
+class CacheInfo(typing.NamedTuple):
+    hits: int
+    misses: int
+    maxsize: int
+    currsize: int
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class TokenCache:
+    # The tokens of recently lexed lines, keyed by lexer, the state the line
+    # starts in and its text. A rehighlight after a style change finds every
+    # line here and only the formats are looked up again. The cached lists
+    # are shared, callers must not change them.
+
+    def __init__(self, maxsize: int = TOKEN_CACHE_SIZE) -> None:
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._lines: collections.OrderedDict[
+            Tuple[Lexer, Tuple[str, ...], str], LexedLine
+        ] = collections.OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._lines)
+
+    def lex_line(
+        self, lexer: Lexer, text: str, stack: typing.Sequence[str] = ROOT_STACK
+    ) -> LexedLine:
+        key = (lexer, tuple(stack), text)
+        lexed = self._lines.get(key)
+        if lexed is not None:
+            self.hits += 1
+            self._lines.move_to_end(key)
+            return lexed
+        self.misses += 1
+        lexed = lex_line(lexer, text, stack)
+        if self.maxsize > 0:
+            self._lines[key] = lexed
+            if len(self._lines) > self.maxsize:
+                self._lines.popitem(last=False)
+        return lexed
+
+    def cache_info(self) -> CacheInfo:
+        return CacheInfo(self.hits, self.misses, self.maxsize, len(self))
+
+    def clear(self) -> None:
+        self._lines.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+# Pygments matches comments, CDATA sections and the like with a single
+# expression, which cannot carry over from one line to the next. These
+# lexers enter a state for them instead, so lex_line can pick them up
+# again on the following line.
+
+
+class XmlLexer(PygmentsXmlLexer):
+    tokens = {
+        "root": [
+            (r"<!\[CDATA\[", Comment.Preproc, "cdata"),
+            (r"<!--", Comment.Multiline, "comment"),
+            (r"<\?", Comment.Preproc, "processing-instruction"),
+            inherit,
+        ],
+        "cdata": [
+            (r"[^\]]+", Comment.Preproc),
+            (r"\]\]>", Comment.Preproc, "#pop"),
+            (r"\]", Comment.Preproc),
+        ],
+        "comment": [
+            (r"[^-]+", Comment.Multiline),
+            (r"-->", Comment.Multiline, "#pop"),
+            (r"-", Comment.Multiline),
+        ],
+        "processing-instruction": [
+            (r"[^?]+", Comment.Preproc),
+            (r"\?>", Comment.Preproc, "#pop"),
+            (r"\?", Comment.Preproc),
+        ],
+        "attr": [
+            ('"', String, ("#pop", "double-quoted")),
+            ("'", String, ("#pop", "single-quoted")),
+            inherit,
+        ],
+        "double-quoted": [
+            ('[^"]+', String),
+            ('"', String, "#pop"),
+        ],
+        "single-quoted": [
+            ("[^']+", String),
+            ("'", String, "#pop"),
+        ],
+    }
+
+
+class JinjaLexer(DjangoLexer):
+    tokens = {
+        "root": [
+            (r"\{#", Comment, "comment"),
+            (
+                r"(\{%)(-?\s*)(comment)(\s*-?)(%\})",
+                bygroups(
+                    Comment.Preproc, Text, Keyword, Text, Comment.Preproc
+                ),
+                "comment-block",
+            ),
+            (
+                r"(\{%)(-?\s*)(raw)(\s*-?)(%\})",
+                bygroups(
+                    Comment.Preproc, Text, Keyword, Text, Comment.Preproc
+                ),
+                "raw-block",
+            ),
+            inherit,
+        ],
+        "comment": [
+            (r"[^#]+", Comment),
+            (r"#\}", Comment, "#pop"),
+            (r"#", Comment),
+        ],
+        "comment-block": [
+            (
+                r"(\{%)(-?\s*)(endcomment)(\s*-?)(%\})",
+                bygroups(
+                    Comment.Preproc, Text, Keyword, Text, Comment.Preproc
+                ),
+                "#pop",
+            ),
+            (r"[^{]+", Comment),
+            (r"\{", Comment),
+        ],
+        "raw-block": [
+            (
+                r"(\{%)(-?\s*)(endraw)(\s*-?)(%\})",
+                bygroups(
+                    Comment.Preproc, Text, Keyword, Text, Comment.Preproc
+                ),
+                "#pop",
+            ),
+            (r"[^{]+", Text),
+            (r"\{", Text),
+        ],
+    }
+
+
+_LINE_LEXERS: Dict[str, typing.Type[RegexLexer]] = {
+    "xml": XmlLexer,
+    "jinja": JinjaLexer,
+    "django": JinjaLexer,
+}
+
+
+def get_lexer_by_name(name: str, **options) -> Lexer:
+    # The lexers above where there is one, Pygments' own otherwise
+    lexer_class = _LINE_LEXERS.get(name.lower())
+    if lexer_class is None:
+        return pygments.lexers.get_lexer_by_name(name, **options)
+    return lexer_class(**options)
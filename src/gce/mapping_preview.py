@@ -0,0 +1,329 @@
+import functools
+import pathlib
+import typing
+import xml.etree.ElementTree as ET
+from typing import Callable, Optional
+
+from PySide6 import QtCore, QtWidgets
+
+from gce import models, preview
+from gce.rendering import ProcessRenderer, RenderResult, render_jinja_template
+from gce.tasks import BackgroundTask, TaskRunner
+
+__all__ = [
+    "MappingPreviewEvaluator",
+    "MappingPreviewModel",
+    "MappingPreviewPane",
+]
+
+
+class _MappingPreviewTask(BackgroundTask):
+    def __init__(
+        self,
+        mapping: typing.Dict[str, typing.Any],
+        xml_text: str,
+        render_strategy: Callable[[str, str], RenderResult],
+    ) -> None:
+        super().__init__()
+        self.mapping = mapping
+        self.key = preview.freeze_mapping(mapping)
+        self.xml_text = xml_text
+        self.render_strategy = render_strategy
+
+    def work(self) -> preview.MappingPreview:
+        return preview.evaluate_mapping(
+            self.mapping, self.xml_text, self.render_strategy
+        )
+
+
+class MappingPreviewEvaluator(QtCore.QObject):
+    # The mapping, the rows that asked for it and the MappingPreview
+    evaluated = QtCore.Signal(object, object, object)
+
+    def __init__(
+        self,
+        parent: Optional[QtCore.QObject] = None,
+        render_strategy: Callable[
+            [str, str], RenderResult
+        ] = render_jinja_template,
+    ) -> None:
+        super().__init__(parent)
+        self.render_strategy = render_strategy
+
+        # Mappings are evaluated one at a time in the order they were asked
+        # for, which is the order their rows were shown in
+        self._runner = TaskRunner(self)
+        self._runner.finished.connect(self._task_finished)
+        self._runner.failed.connect(self._task_failed)
+
+        # A mapping that appears in several rows is evaluated once
+        self._queued: typing.Dict[typing.Any, typing.Set[int]] = {}
+
+    @property
+    def is_busy(self) -> bool:
+        return len(self._queued) > 0
+
+    def evaluate(
+        self,
+        row: int,
+        mapping: typing.Mapping[str, typing.Any],
+        xml_text: str,
+    ) -> None:
+        rows = self._queued.get(preview.freeze_mapping(mapping))
+        if rows is not None:
+            rows.add(row)
+            return
+        task = _MappingPreviewTask(
+            dict(mapping), xml_text, self.render_strategy
+        )
+        self._queued[task.key] = {row}
+        self._runner.start(task)
+
+    def cancel(self) -> None:
+        self._runner.cancel_all()
+        self._queued.clear()
+
+    def wait_for_done(self, msecs: int = -1) -> bool:
+        return self._runner.wait_for_done(msecs)
+
+    def _task_finished(
+        self, task: _MappingPreviewTask, result: preview.MappingPreview
+    ) -> None:
+        rows = self._queued.pop(task.key, set())
+        self.evaluated.emit(task.mapping, rows, result)
+
+    def _task_failed(
+        self, task: _MappingPreviewTask, error: Exception
+    ) -> None:
+        self._task_finished(task, preview.MappingPreview("", str(error)))
+
+
+class MappingPreviewModel(QtCore.QAbstractTableModel):
+    headers = ["Mapping", "Preview", "Error"]
+
+    def __init__(
+        self,
+        parent: Optional[QtCore.QObject] = None,
+        preview_cache: Optional[preview.MappingPreviewCache] = None,
+        render_strategy: Callable[
+            [str, str], RenderResult
+        ] = render_jinja_template,
+    ) -> None:
+        super().__init__(parent)
+        self.preview_cache = (
+            preview_cache
+            if preview_cache is not None
+            else preview.MappingPreviewCache()
+        )
+
+        # Templates are rendered off the GUI thread. Rows show nothing until
+        # their result comes back.
+        self.evaluator = MappingPreviewEvaluator(self, render_strategy)
+        self.evaluator.evaluated.connect(self._mapping_evaluated)
+        self.source_model: Optional[models.TomlModel] = None
+        self._row_count = 0
+        self._connections: typing.List[QtCore.QMetaObject.Connection] = []
+
+    def set_source_model(self, model: Optional[models.TomlModel]) -> None:
+        for connection in self._connections:
+            QtCore.QObject.disconnect(connection)
+        self._connections = []
+        self.source_model = model
+        if model is not None:
+            self._connections = [
+                model.dataChanged.connect(self._source_data_changed),
+                model.modelReset.connect(self._source_reset),
+                model.rowsInserted.connect(self._source_rows_inserted),
+                model.rowsRemoved.connect(self._source_rows_removed),
+                model.rowsMoved.connect(self.reset),
+            ]
+        self._source_reset()
+
+    def set_sample_record(self, xml_text: str) -> None:
+        # Raises ET.ParseError if the text is not XML
+        self.preview_cache.set_record(xml_text)
+        self.evaluator.cancel()
+        self._emit_changed(0, self._row_count - 1)
+
+    def reset(self) -> None:
+        # Cached results are looked up by the content of the mapping so they
+        # stay valid when rows are only fetched or shifted
+        self.beginResetModel()
+        self._row_count = (
+            0
+            if self.source_model is None
+            else self.source_model.mapping_count()
+        )
+        self.endResetModel()
+
+    def _source_reset(self) -> None:
+        self.preview_cache.clear()
+        self.evaluator.cancel()
+        self.reset()
+
+    def rowCount(self, parent=QtCore.QModelIndex()) -> int:
+        return 0 if parent.isValid() else self._row_count
+
+    def columnCount(self, parent=QtCore.QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.headers)
+
+    def data(self, index, role=QtCore.Qt.ItemDataRole.DisplayRole):
+        if (
+            not index.isValid()
+            or self.source_model is None
+            or role
+            not in [
+                QtCore.Qt.ItemDataRole.DisplayRole,
+                QtCore.Qt.ItemDataRole.ToolTipRole,
+            ]
+        ):
+            return None
+        mapping = self.source_model.mapping_values(index.row())
+        if index.column() == 0:
+            return str(mapping.get("key", ""))
+
+        # Mappings are only evaluated once they are shown
+        result = self.preview_cache.get(mapping)
+        if result is None:
+            self.evaluator.evaluate(
+                index.row(), mapping, self.preview_cache.xml_text
+            )
+            return ""
+        return result.output if index.column() == 1 else result.error
+
+    def headerData(
+        self,
+        section,
+        orientation,
+        role=QtCore.Qt.ItemDataRole.DisplayRole,
+    ):
+        if (
+            role == QtCore.Qt.ItemDataRole.DisplayRole
+            and orientation == QtCore.Qt.Orientation.Horizontal
+        ):
+            return self.headers[section]
+        return None
+
+    def _mapping_evaluated(
+        self,
+        mapping: typing.Dict[str, typing.Any],
+        rows: typing.Set[int],
+        result: preview.MappingPreview,
+    ) -> None:
+        self.preview_cache.put(mapping, result)
+        for row in sorted(rows):
+            if row < self._row_count:
+                self._emit_changed(row, row)
+
+    def _source_data_changed(
+        self, top_left: QtCore.QModelIndex, bottom_right: QtCore.QModelIndex
+    ) -> None:
+        if self.source_model is None:
+            return
+        rows = {
+            self.source_model.mapping_row(top_left),
+            self.source_model.mapping_row(bottom_right),
+        }
+        rows.discard(None)
+        for row in typing.cast(typing.Set[int], rows):
+            self._emit_changed(row, row)
+
+    def _source_rows_inserted(
+        self, parent: QtCore.QModelIndex, first: int, last: int
+    ) -> None:
+        if self.source_model is None:
+            return
+        row = self.source_model.mapping_row(parent)
+        if row is not None:
+            # A value added to a mapping
+            self._emit_changed(row, row)
+            return
+
+        # Fetching [[mapping]] tables into the tree inserts rows that were
+        # already counted. Added tables go at the end.
+        added = self.source_model.mapping_count() - self._row_count
+        if added <= 0:
+            return
+        self.beginInsertRows(
+            QtCore.QModelIndex(), self._row_count, self._row_count + added - 1
+        )
+        self._row_count += added
+        self.endInsertRows()
+
+    def _source_rows_removed(
+        self, parent: QtCore.QModelIndex, first: int, last: int
+    ) -> None:
+        if self.source_model is None:
+            return
+        row = self.source_model.mapping_row(parent)
+        if row is not None:
+            self._emit_changed(row, row)
+            return
+        removed = self._row_count - self.source_model.mapping_count()
+        if removed <= 0:
+            return
+        if removed != last - first + 1:
+            self.reset()
+            return
+        self.beginRemoveRows(QtCore.QModelIndex(), first, last)
+        self._row_count -= removed
+        self.endRemoveRows()
+
+    def _emit_changed(self, first_row: int, last_row: int) -> None:
+        if last_row < first_row:
+            return
+        self.dataChanged.emit(
+            self.index(first_row, 0),
+            self.index(last_row, len(self.headers) - 1),
+        )
+
+
+class MappingPreviewPane(QtWidgets.QWidget):
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.file_dialog_strategy: Callable[
+            [QtWidgets.QWidget], typing.Tuple[str, str]
+        ] = functools.partial(
+            QtWidgets.QFileDialog.getOpenFileName,
+            caption="Open Sample MARC Record",
+            dir="",
+            filter="Xml Files (*.xml);;All Files (*)",
+        )
+        self._layout = QtWidgets.QVBoxLayout(self)
+        record_row = QtWidgets.QHBoxLayout()
+        self.record_label = QtWidgets.QLabel("No sample record")
+        record_row.addWidget(self.record_label, stretch=1)
+        self.load_record_button = QtWidgets.QPushButton("Load Sample Record…")
+        self.load_record_button.clicked.connect(self.open_sample_record)
+        record_row.addWidget(self.load_record_button)
+        self._layout.addLayout(record_row)
+
+        # Like the Jinja editor, templates run in a child process that can
+        # be stopped if one of them hangs or uses too much memory
+        self.process_renderer = ProcessRenderer()
+        self.destroyed.connect(self.process_renderer.close)
+        self.preview_model = MappingPreviewModel(
+            self, render_strategy=self.process_renderer.render
+        )
+        self.preview_view = QtWidgets.QTableView(self)
+        self.preview_view.setModel(self.preview_model)
+        self.preview_view.setWordWrap(False)
+        self.preview_view.verticalHeader().setSectionResizeMode(
+            QtWidgets.QHeaderView.ResizeMode.Fixed
+        )
+        self.preview_view.horizontalHeader().setStretchLastSection(True)
+        self._layout.addWidget(self.preview_view)
+
+    def open_sample_record(self) -> None:
+        file_name, _ = self.file_dialog_strategy(self)
+        if not file_name:
+            return
+        try:
+            xml_text = pathlib.Path(file_name).read_text(encoding="utf-8")
+            self.preview_model.set_sample_record(xml_text)
+        except (OSError, ET.ParseError) as error:
+            self.record_label.setText(
+                f"Unable to load {pathlib.Path(file_name).name}. {error}"
+            )
+            return
+        self.record_label.setText(pathlib.Path(file_name).name)
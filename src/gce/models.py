@@ -4,6 +4,9 @@ from typing import (
     Union,
     Optional,
     List,
+    Sequence,
+    Set,
+    Tuple,
     TypeVar,
     Generic,
 )
@@ -14,22 +17,67 @@ from PySide6 import QtCore
 import tomllib
 import tomli_w
 
+from gce import toml_document
+from gce.toml_document import TomlSourceDocument
+
 T = TypeVar("T")
 
 TOML_TYPE = Union[str, int, float, bool]
 TOML_SPEC = Union[TOML_TYPE, List[TOML_TYPE], Dict[str, TOML_TYPE]]
 
 
+# Leaf nodes share this instead of each carrying their own empty list. It is
+# swapped for a real list the first time a child is added.
+_NO_CHILDREN: Tuple[()] = ()
+
+_EDITABLE = 0x1
+_SELECTABLE = 0x2
+
+
 class TomlNode(Generic[T]):
+    __slots__ = ("_parent", "_key", "_value", "_row", "_flags", "_children")
+
     def __init__(
         self, key: Optional[str] = None, parent: Optional["TomlNode"] = None
     ):
         self._parent = parent
         self._key = key
         self._value: Optional[T] = None
-        self.children: List[TomlNode[T]] = []
-        self.is_editable = True
-        self.is_selectable = True
+        self._row = 0
+        self._flags = _EDITABLE | _SELECTABLE
+        self._children: Sequence[TomlNode[T]] = _NO_CHILDREN
+
+    @property
+    def children(self) -> Sequence["TomlNode[T]"]:
+        # Read only, children are added and removed through the methods
+        # below so that their rows stay right
+        return self._children
+
+    @children.setter
+    def children(self, value: List["TomlNode[T]"]) -> None:
+        self._children = value
+
+    @property
+    def is_editable(self) -> bool:
+        return bool(self._flags & _EDITABLE)
+
+    @is_editable.setter
+    def is_editable(self, value: bool) -> None:
+        self._set_flag(_EDITABLE, value)
+
+    @property
+    def is_selectable(self) -> bool:
+        return bool(self._flags & _SELECTABLE)
+
+    @is_selectable.setter
+    def is_selectable(self, value: bool) -> None:
+        self._set_flag(_SELECTABLE, value)
+
+    def _set_flag(self, flag: int, value: bool) -> None:
+        if value:
+            self._flags |= flag
+        else:
+            self._flags &= ~flag
 
     @property
     def key(self) -> Optional[str]:
@@ -52,24 +100,187 @@ class TomlNode(Generic[T]):
     def child_count(self) -> int:
         return len(self.children)
 
+    def has_children(self) -> bool:
+        return len(self.children) > 0
+
+    def row(self) -> int:
+        return self._row
+
+    def _child_list(self) -> List["TomlNode[T]"]:
+        if isinstance(self._children, list):
+            return self._children
+        children: List[TomlNode[T]] = []
+        self._children = children
+        return children
+
+    def append_child(self, child: "TomlNode") -> None:
+        children = self._child_list()
+        child._parent = self
+        child._row = len(children)
+        children.append(child)
+
+    def insert_child(self, row: int, child: "TomlNode") -> None:
+        child._parent = self
+        self._child_list().insert(row, child)
+        self._update_rows(row)
+
+    def remove_child(self, row: int) -> "TomlNode":
+        child = self._child_list().pop(row)
+        child._parent = None
+        self._update_rows(row)
+        return child
+
+    def move_child(self, source_row: int, destination_row: int) -> None:
+        children = self._child_list()
+        children.insert(destination_row, children.pop(source_row))
+        self._update_rows(min(source_row, destination_row))
+
+    def _update_rows(self, start: int = 0) -> None:
+        for row in range(start, len(self._children)):
+            self._children[row]._row = row
+
 
 class MappingNode(TomlNode):
+    __slots__ = ("_label", "_source")
+
     def __init__(
-        self, key: Optional[str] = None, parent: Optional[TomlNode] = None
+        self,
+        key: Optional[str] = None,
+        parent: Optional[TomlNode] = None,
+        source: Optional[Dict[str, TOML_TYPE]] = None,
     ) -> None:
         super().__init__(key, parent)
         self.is_editable = False
+        self._label: Optional[str] = None
+
+        # Child nodes are only created from the source data once something
+        # asks for them, such as the view expanding this mapping.
+        self._source = source
+
+    @property
+    def children(self) -> Sequence[TomlNode]:
+        if self._source is not None:
+            self._populate()
+        return self._children
+
+    @children.setter
+    def children(self, value: List[TomlNode]) -> None:
+        self._source = None
+        self._children = value
+        self.invalidate_label()
+
+    @property
+    def is_populated(self) -> bool:
+        return self._source is None
+
+    def _populate(self) -> None:
+        source = self._source
+        if source is None:
+            return
+        self._source = None
+        for k, v in source.items():
+            item = TomlNode[TOML_TYPE](k)
+            item.value = v
+            super().append_child(item)
+
+    def has_children(self) -> bool:
+        if self._source is not None:
+            return len(self._source) > 0
+        return len(self._children) > 0
+
+    def key_values(self) -> Dict[str, TOML_SPEC]:
+        if self._source is not None:
+            return dict(self._source)
+        return typing.cast(
+            Dict[str, TOML_SPEC],
+            {child.key: child.value for child in self._children},
+        )
 
     @property
     def key(self) -> str:
-        for child in self.children:
+        if self._label is None:
+            self._label = self._create_label()
+        return self._label
+
+    def _create_label(self) -> str:
+        if self._source is not None:
+            if "key" in self._source:
+                return f'mapping - "{self._source["key"]}"'
+            return "mapping"
+        for child in self._children:
             if child.key == "key":
                 return f'mapping - "{child.value}"'
         return "mapping"
 
+    def invalidate_label(self) -> None:
+        self._label = None
+
+    def append_child(self, child: TomlNode) -> None:
+        self._populate()
+        super().append_child(child)
+        self.invalidate_label()
+
+    def insert_child(self, row: int, child: TomlNode) -> None:
+        self._populate()
+        super().insert_child(row, child)
+        self.invalidate_label()
+
+    def remove_child(self, row: int) -> TomlNode:
+        self._populate()
+        child = super().remove_child(row)
+        self.invalidate_label()
+        return child
+
+    def move_child(self, source_row: int, destination_row: int) -> None:
+        self._populate()
+        super().move_child(source_row, destination_row)
+
+
+class ModificationTracker:
+    def __init__(self) -> None:
+        self._baseline: Dict[TomlNode, typing.Any] = {}
+        self._modified: Set[TomlNode] = set()
+
+    @property
+    def is_modified(self) -> bool:
+        return len(self._modified) > 0
+
+    def record_change(
+        self, node: TomlNode, old_value: typing.Any, new_value: typing.Any
+    ) -> None:
+        baseline = self._baseline.setdefault(node, old_value)
+        if new_value == baseline:
+            self._modified.discard(node)
+        else:
+            self._modified.add(node)
+
+    def is_node_modified(self, node: TomlNode) -> bool:
+        return node in self._modified
+
+    def modified_nodes(self) -> List[TomlNode]:
+        return list(self._modified)
+
+    def snapshot(self) -> Dict[TomlNode, typing.Any]:
+        return {node: node.value for node in self._modified}
+
+    def mark_saved(self, saved_values: Dict[TomlNode, typing.Any]) -> None:
+        # Only the values that were written become the new baseline. Anything
+        # edited after the snapshot was taken is still compared against it.
+        for node, value in saved_values.items():
+            self._baseline[node] = value
+            if node.value == value:
+                self._modified.discard(node)
+            else:
+                self._modified.add(node)
+
+    def reset(self) -> None:
+        self._baseline.clear()
+        self._modified.clear()
+
 
 class TomlModel(QtCore.QAbstractItemModel):
     headers = ["Property", "Value"]
+    fetch_batch_size = 256
 
     def __init__(
         self,
@@ -81,7 +292,53 @@ class TomlModel(QtCore.QAbstractItemModel):
             "Mapping values", parent=self._root
         )
         self._mappings.is_editable = False
-        self._root.children.append(self._mappings)
+        self._root.append_child(self._mappings)
+        self.modifications = ModificationTracker()
+
+        # Parsed [[mapping]] tables. Mapping rows are created from this in
+        # batches as the view asks for them with fetchMore().
+        self._mapping_source: List[Dict[str, TOML_TYPE]] = []
+
+        # Text the model was loaded from, used to save only the edited values
+        self.source_document: Optional[TomlSourceDocument] = None
+
+    @property
+    def is_modified(self) -> bool:
+        return self.modifications.is_modified
+
+    def mark_saved(self, snapshot: Optional["ModelSnapshot"] = None) -> None:
+        if snapshot is None:
+            snapshot = ModelSnapshot(
+                text=None,
+                values=self.modifications.snapshot(),
+                changes=self.modified_values(),
+            )
+        if self.source_document is not None:
+            try:
+                self.source_document.update(snapshot.changes)
+            except toml_document.UnsupportedChangeError:
+                self.source_document = None
+        if self.source_document is None and snapshot.text is not None:
+            # The text was a full dump, start tracking it from here
+            self.source_document = toml_document.create_source_document(
+                snapshot.text, tomllib.loads(snapshot.text)
+            )
+        self.modifications.mark_saved(snapshot.values)
+
+    def modified_values(
+        self, nodes: Optional[typing.Iterable[TomlNode]] = None
+    ) -> List[toml_document.Change]:
+        changes: List[toml_document.Change] = []
+        for node in (
+            self.modifications.modified_nodes() if nodes is None else nodes
+        ):
+            parent_node = typing.cast(TomlNode, node.parent())
+            changes.append((
+                None if parent_node is self._root else parent_node.row(),
+                typing.cast(str, node.key),
+                node.value,
+            ))
+        return changes
 
     def headerData(
         self,
@@ -106,7 +363,8 @@ class TomlModel(QtCore.QAbstractItemModel):
         new_node = TomlNode[TOML_SPEC](key, parent=self._root)
         if value is not None:
             new_node.value = value
-        self._root.children.insert(self._root.child_count() - 1, new_node)
+        self._root.insert_child(self._root.child_count() - 1, new_node)
+        self.source_document = None
 
     def get_item(
         self, index: Union[QtCore.QModelIndex, QtCore.QPersistentModelIndex]
@@ -150,12 +408,70 @@ class TomlModel(QtCore.QAbstractItemModel):
         return self.get_item(parent).child_count()
 
     def add_mapping(self, data: Dict[str, TOML_TYPE]) -> None:
-        new_mapping_node = MappingNode("mapping", parent=self._mappings)
-        for k, v in data.items():
-            item = TomlNode[TOML_TYPE](k, parent=new_mapping_node)
-            item.value = v
-            new_mapping_node.children.append(item)
-        self._mappings.children.append(new_mapping_node)
+        self._mapping_source.append(data)
+        self.source_document = None
+        if self._mappings.child_count() == len(self._mapping_source) - 1:
+            self._fetch_mappings(1)
+
+    def load_mappings(self, mappings: List[Dict[str, TOML_TYPE]]) -> None:
+        self.beginResetModel()
+        self._mappings.children = []
+        self._mapping_source = mappings
+        self.modifications.reset()
+        self.source_document = None
+        self.endResetModel()
+        self._fetch_mappings(self.fetch_batch_size)
+
+    def mapping_count(self) -> int:
+        # Includes [[mapping]] tables that have not been fetched into the
+        # tree yet
+        return len(self._mapping_source)
+
+    def mapping_values(self, row: int) -> Dict[str, TOML_SPEC]:
+        if row < self._mappings.child_count():
+            return typing.cast(
+                MappingNode, self._mappings.child(row)
+            ).key_values()
+        return dict(self._mapping_source[row])
+
+    def mapping_row(
+        self, index: Union[QtCore.QModelIndex, QtCore.QPersistentModelIndex]
+    ) -> Optional[int]:
+        # Row of the [[mapping]] table that index is part of, if any
+        node: Optional[TomlNode] = self.get_item(index)
+        while node is not None:
+            parent_node = node.parent()
+            if parent_node is self._mappings:
+                return node.row()
+            node = parent_node
+        return None
+
+    def canFetchMore(
+        self, parent: Union[QtCore.QModelIndex, QtCore.QPersistentModelIndex]
+    ) -> bool:
+        return self.get_item(parent) is self._mappings and (
+            self._mappings.child_count() < len(self._mapping_source)
+        )
+
+    def fetchMore(
+        self, parent: Union[QtCore.QModelIndex, QtCore.QPersistentModelIndex]
+    ) -> None:
+        if self.canFetchMore(parent):
+            self._fetch_mappings(self.fetch_batch_size)
+
+    def _fetch_mappings(self, count: int) -> None:
+        start = self._mappings.child_count()
+        end = min(start + count, len(self._mapping_source))
+        if start >= end:
+            return
+        self.beginInsertRows(
+            self.createIndex(self._mappings.row(), 0, self._mappings),
+            start,
+            end - 1,
+        )
+        for data in self._mapping_source[start:end]:
+            self._mappings.append_child(MappingNode("mapping", source=data))
+        self.endInsertRows()
 
     @typing.overload
     def parent(self) -> QtCore.QObject: ...
@@ -183,8 +499,7 @@ class TomlModel(QtCore.QAbstractItemModel):
         if parent_node == self._root:
             return QtCore.QModelIndex()
         if parent_node:
-            row = parent_node.children.index(child_node)
-            return self.createIndex(row, 0, parent_node)
+            return self.createIndex(parent_node.row(), 0, parent_node)
         return QtCore.QModelIndex()
 
     def setData(
@@ -199,8 +514,16 @@ class TomlModel(QtCore.QAbstractItemModel):
             node = index.internalPointer()
             if index.column() == 1 and node.is_editable:
                 if node.value != value:
+                    self.modifications.record_change(node, node.value, value)
                     node.value = value
                     self.dataChanged.emit(index, index)
+                    parent_node = node.parent()
+                    if node.key == "key" and isinstance(
+                        parent_node, MappingNode
+                    ):
+                        parent_node.invalidate_label()
+                        parent_index = self.parent(index)
+                        self.dataChanged.emit(parent_index, parent_index)
                     return True
                 return False
         return False
@@ -217,7 +540,7 @@ class TomlModel(QtCore.QAbstractItemModel):
             return p.key
         if index.column() == 1:
             if role == QtCore.Qt.ItemDataRole.DisplayRole:
-                if len(p.children) == 0:
+                if not p.has_children():
                     return p.value
             if role == QtCore.Qt.ItemDataRole.EditRole:
                 return p.value
@@ -233,7 +556,9 @@ class TomlModel(QtCore.QAbstractItemModel):
             parent_node = self._root
         else:
             parent_node = parent.internalPointer()
-        return parent_node.child_count() > 0
+        if parent_node is self._mappings:
+            return len(self._mapping_source) > 0
+        return parent_node.has_children()
 
     def flags(
         self, index: Union[QtCore.QModelIndex, QtCore.QPersistentModelIndex]
@@ -279,6 +604,36 @@ class TomlConfigDictionaryBuilder:
 
 def convert_item_model_to_dictionary(
     model: QtCore.QAbstractItemModel,
+) -> TomlConfigFormat:
+    if isinstance(model, TomlModel):
+        return convert_toml_model_to_dictionary(model)
+    return _convert_using_model_indexes(model)
+
+
+def convert_toml_model_to_dictionary(model: TomlModel) -> TomlConfigFormat:
+    # Walks the nodes directly instead of going through QModelIndex
+    builder = TomlConfigDictionaryBuilder()
+    for node in model._root.children:
+        if node is model._mappings:
+            for mapping_node in node.children:
+                builder.add_mapping(
+                    **typing.cast(
+                        Dict[str, TOML_TYPE],
+                        typing.cast(MappingNode, mapping_node).key_values(),
+                    )
+                )
+            # Mappings the view has not fetched yet are still unchanged
+            for data in model._mapping_source[node.child_count() :]:
+                builder.add_mapping(**data)
+        else:
+            builder[typing.cast(str, node.key)] = typing.cast(
+                TOML_TYPE, node.value if node.value is not None else ""
+            )
+    return builder.create()
+
+
+def _convert_using_model_indexes(
+    model: QtCore.QAbstractItemModel,
 ) -> TomlConfigFormat:
     builder = TomlConfigDictionaryBuilder()
     for top_level_row in range(model.rowCount()):
@@ -306,9 +661,10 @@ def convert_item_model_to_dictionary(
 
 
 def load_toml_fp(fp: io.TextIOBase) -> TomlModel:
+    text = fp.read()
     try:
         data: TomlConfigFormat = typing.cast(
-            TomlConfigFormat, tomllib.loads(fp.read())
+            TomlConfigFormat, tomllib.loads(text)
         )
     except tomllib.TOMLDecodeError as error:
         raise galatea.merge_data.BadMappingDataError(
@@ -319,20 +675,40 @@ def load_toml_fp(fp: io.TextIOBase) -> TomlModel:
         for key, value in data["mappings"].items():
             model.add_top_level_config(key, value)
 
-        for item in data["mapping"]:
-            model.add_mapping(item)
+        model.load_mappings(data["mapping"])
     except KeyError as error:
         raise galatea.merge_data.BadMappingDataError(
             details="Not a valid galatea mapping configration toml format file"
         ) from error
+    model.source_document = toml_document.create_source_document(text, data)
     return model
 
 
 def export_toml(model: TomlModel) -> str:
+    if model.source_document is not None:
+        try:
+            return model.source_document.render(model.modified_values())
+        except toml_document.UnsupportedChangeError:
+            pass
     return tomli_w.dumps(convert_item_model_to_dictionary(model))
 
 
-def data_has_changed(original_toml_text: str, model: TomlModel) -> bool:
-    return tomllib.loads(
-        original_toml_text
-    ) != convert_item_model_to_dictionary(model)
+class ModelSnapshot(typing.NamedTuple):
+    # Serialized text, or None if the caller did not produce any
+    text: Optional[str]
+
+    # Value of each modified node at the time the snapshot was taken
+    values: Dict[TomlNode, typing.Any]
+    changes: List[toml_document.Change]
+
+
+def create_snapshot(
+    model: TomlModel,
+    serialization_strategy: typing.Callable[[TomlModel], str] = export_toml,
+) -> ModelSnapshot:
+    values = model.modifications.snapshot()
+    return ModelSnapshot(
+        text=serialization_strategy(model),
+        values=values,
+        changes=model.modified_values(values),
+    )
@@ -0,0 +1,188 @@
+import collections
+import json
+import re
+import typing
+from typing import Any, Mapping, Optional, Tuple
+
+from gce.rendering import (
+    RenderStrategy,
+    XmlCache,
+    default_xml_cache,
+    render_jinja_template,
+)
+
+__all__ = [
+    "MappingPreview",
+    "MappingPreviewCache",
+    "evaluate_mapping",
+    "freeze_mapping",
+    "mapping_template",
+    "matching_fields_template",
+    "parse_field_spec",
+]
+
+# What matching_fields_template renders, followed by the tag, for a field
+# galatea does not lay out as a string, a value or a list of subfields
+_UNEXPECTED_LAYOUT = "\x00unexpected field layout:"
+
+# "240$a", "510a" or just "001"
+_FIELD_SPEC = re.compile(r"(?P<tag>[0-9A-Za-z]{3})\$?(?P<code>[0-9a-z]?)")
+
+
+class MappingPreview(typing.NamedTuple):
+    output: str
+    error: str
+
+
+def parse_field_spec(spec: str) -> Tuple[str, Optional[str]]:
+    match = _FIELD_SPEC.fullmatch(spec.strip())
+    if match is None:
+        raise ValueError(f'"{spec}" is not a MARC field')
+    return match.group("tag"), match.group("code") or None
+
+
+def matching_fields_template(
+    specs: typing.Iterable[str], delimiter: str = "||"
+) -> str:
+    # galatea only offers serialize_with_jinja_template for rendering a
+    # single record, so matching_marc_fields are looked up with a template
+    # over its fields context. Which values a field has is then up to
+    # galatea rather than a second parser here. A field that is not laid out
+    # as expected renders as _UNEXPECTED_LAYOUT and its tag, so a change in
+    # galatea shows up as an error rather than an empty preview. Raises
+    # ValueError for specs that are not MARC fields.
+    wanted = [parse_field_spec(spec) for spec in specs]
+    return (
+        "{%- set found = namespace(values=[], unexpected=none) -%}"
+        f"{{%- for tag, code in {wanted!r} if tag in fields -%}}"
+        "{%- for field in fields[tag] -%}"
+        "{%- if field is string -%}"
+        "{%- set found.values = found.values + [field] -%}"
+        "{%- elif field.value is defined -%}"
+        "{%- set found.values = found.values + [field.value] -%}"
+        "{%- elif field is iterable -%}"
+        "{%- for subfield in field -%}"
+        "{%- if subfield.code is not defined"
+        " or subfield.value is not defined -%}"
+        "{%- set found.unexpected = tag -%}"
+        "{%- elif code is none or subfield.code == code -%}"
+        "{%- set found.values = found.values + [subfield.value] -%}"
+        "{%- endif -%}"
+        "{%- endfor -%}"
+        "{%- else -%}"
+        "{%- set found.unexpected = tag -%}"
+        "{%- endif -%}"
+        "{%- endfor -%}"
+        "{%- endfor -%}"
+        "{%- if found.unexpected is none -%}"
+        f"{{{{ found.values | join({json.dumps(delimiter)}) }}}}"
+        "{%- else -%}"
+        f"{{{{ {json.dumps(_UNEXPECTED_LAYOUT)} ~ found.unexpected }}}}"
+        "{%- endif -%}"
+    )
+
+
+def mapping_template(mapping: Mapping[str, Any]) -> str:
+    # The template galatea renders for a [[mapping]] table. Raises
+    # ValueError if there is nothing in it to evaluate.
+    if "jinja_template" in mapping:
+        return str(mapping["jinja_template"])
+    fields = mapping.get("matching_marc_fields")
+    if not isinstance(fields, list):
+        raise ValueError(
+            "No matching_marc_fields or jinja_template to evaluate"
+        )
+    return matching_fields_template(
+        [str(spec) for spec in fields], str(mapping.get("delimiter", "||"))
+    )
+
+
+def evaluate_mapping(
+    mapping: Mapping[str, Any],
+    xml_text: str,
+    render_strategy: RenderStrategy = render_jinja_template,
+) -> MappingPreview:
+    try:
+        template = mapping_template(mapping)
+    except ValueError as error:
+        return MappingPreview("", str(error))
+    result = render_strategy(template, xml_text)
+    if not result.is_valid:
+        return MappingPreview("", result.text)
+    if result.text.startswith(_UNEXPECTED_LAYOUT):
+        tag = result.text[len(_UNEXPECTED_LAYOUT) :]
+        return MappingPreview(
+            "", f"Unexpected layout of field {tag} in galatea's fields"
+        )
+    return MappingPreview(result.text, "")
+
+
+class MappingPreviewCache:
+    def __init__(
+        self, xml_cache: Optional[XmlCache] = None, maxsize: int = 1024
+    ) -> None:
+        # Shares parsed records with JinjaRenderer
+        self.xml_cache = (
+            xml_cache if xml_cache is not None else default_xml_cache
+        )
+        self.maxsize = maxsize
+        self.xml_text = ""
+        self.has_record = False
+        self.hits = 0
+        self.misses = 0
+
+        # Results are kept by the content of the mapping, so they stay valid
+        # when rows are added or fetched and an edit only misses for the
+        # mapping that was edited
+        self._results: collections.OrderedDict[Any, MappingPreview] = (
+            collections.OrderedDict()
+        )
+
+    def set_record(self, xml_text: str) -> None:
+        # Raises ET.ParseError if the text is not XML
+        self.xml_cache.get(xml_text)
+        self.xml_text = xml_text
+        self.has_record = True
+        self._results.clear()
+
+    def clear_record(self) -> None:
+        self.xml_text = ""
+        self.has_record = False
+        self._results.clear()
+
+    def get(self, mapping: Mapping[str, Any]) -> Optional[MappingPreview]:
+        # None until a result for the mapping has been put here
+        if not self.has_record:
+            return MappingPreview("", "")
+        key = _freeze(mapping)
+        result = self._results.get(key)
+        if result is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._results.move_to_end(key)
+        return result
+
+    def put(self, mapping: Mapping[str, Any], result: MappingPreview) -> None:
+        self._results[_freeze(mapping)] = result
+        while len(self._results) > max(self.maxsize, 0):
+            self._results.popitem(last=False)
+
+    def __contains__(self, mapping: Mapping[str, Any]) -> bool:
+        return _freeze(mapping) in self._results
+
+    def clear(self) -> None:
+        self._results.clear()
+
+
+def freeze_mapping(mapping: Mapping[str, Any]) -> Any:
+    # A hashable copy of a mapping's values
+    return _freeze(mapping)
+
+
+def _freeze(value: Any) -> Any:
+    if isinstance(value, Mapping):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
@@ -0,0 +1,301 @@
+import codecs
+import hashlib
+import json
+import logging
+import mmap
+import os
+import re
+import sys
+import tempfile
+import typing
+from typing import Dict, List, Optional, Tuple
+
+from gce import xml_file
+
+__all__ = [
+    "RecordFile",
+    "RecordOffsets",
+    "default_cache_dir",
+    "load_sidecar",
+    "save_sidecar",
+    "scan_record_offsets",
+    "sidecar_path",
+]
+
+_PREFIX = rb"(?:[A-Za-z_][\w.-]*:)?"
+_RECORD_START = re.compile(rb"<" + _PREFIX + rb"record(?=[\s/>])")
+_RECORD_END = re.compile(rb"</" + _PREFIX + rb"record\s*>")
+_ROOT_START = re.compile(rb"<(?![?!])[^>]*>")
+_NAMESPACE = re.compile(
+    rb"""\s(xmlns(?::[\w.-]+)?)\s*=\s*(?:"[^"]*"|'[^']*')"""
+)
+_CONTROL_NUMBER = re.compile(
+    rb"<" + _PREFIX + rb"controlfield\b[^>]*\btag\s*=\s*[\"']001[\"'][^>]*>"
+    rb"\s*([^<]*?)\s*<"
+)
+
+# Bumped whenever the layout of the sidecar file changes
+INDEX_VERSION = 1
+SIDECAR_SUFFIX = ".gce-index.json"
+
+logger = logging.getLogger(__name__)
+
+Buffer = typing.Union[bytes, mmap.mmap]
+
+
+class RecordOffsets(typing.NamedTuple):
+    # Byte span of each <record> element, its 001 control number, and the
+    # namespace declarations of the root element that records cut out of
+    # the file need to stay well-formed
+    spans: List[Tuple[int, int]]
+    control_numbers: List[Optional[str]]
+    namespaces: bytes
+
+
+def _root_namespaces(data: Buffer) -> bytes:
+    root = _ROOT_START.search(data)
+    if root is None or _RECORD_START.match(data, root.start()):
+        return b""
+    return b"".join(
+        match.group() for match in _NAMESPACE.finditer(root.group())
+    )
+
+
+def scan_record_offsets(
+    data: Buffer, encoding: str = "utf-8"
+) -> RecordOffsets:
+    spans: List[Tuple[int, int]] = []
+    control_numbers: List[Optional[str]] = []
+    position = 0
+    while match := _RECORD_START.search(data, position):
+        start_tag_end = data.find(b">", match.end())
+        if start_tag_end == -1:
+            break
+        if data[start_tag_end - 1 : start_tag_end] == b"/":
+            end = start_tag_end + 1
+        else:
+            end_match = _RECORD_END.search(data, start_tag_end)
+            if end_match is None:
+                break
+            end = end_match.end()
+        spans.append((match.start(), end))
+        control_number = _CONTROL_NUMBER.search(data, match.start(), end)
+        control_numbers.append(
+            None
+            if control_number is None
+            else control_number.group(1).decode(encoding, "replace")
+        )
+        position = end
+    return RecordOffsets(spans, control_numbers, _root_namespaces(data))
+
+
+def default_cache_dir() -> str:
+    # Collections often live on shared or read-only drives, so indexes are
+    # kept with the user rather than next to the file
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser(
+            os.path.join("~", "AppData", "Local")
+        )
+    elif sys.platform == "darwin":
+        base = os.path.expanduser(os.path.join("~", "Library", "Caches"))
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser(
+            os.path.join("~", ".cache")
+        )
+    return os.path.join(base, "gce", "record-index")
+
+
+def sidecar_path(path: str, cache_dir: Optional[str] = None) -> str:
+    # Named after the full path so files with the same name do not collide
+    digest = hashlib.sha256(
+        os.path.abspath(path).encode("utf-8", "surrogateescape")
+    ).hexdigest()
+    return os.path.join(
+        cache_dir or default_cache_dir(), f"{digest}{SIDECAR_SUFFIX}"
+    )
+
+
+def _file_key(path: str) -> Dict[str, int]:
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def load_sidecar(
+    path: str, cache_dir: Optional[str] = None
+) -> Optional[RecordOffsets]:
+    # Anything unexpected means the index gets rebuilt, never an error
+    try:
+        with open(sidecar_path(path, cache_dir), "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != INDEX_VERSION:
+            return None
+        if data.get("file") != _file_key(path):
+            return None
+        return RecordOffsets(
+            [(start, end) for start, end in data["spans"]],
+            data["control_numbers"],
+            data["namespaces"].encode("utf-8"),
+        )
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def save_sidecar(
+    path: str, offsets: RecordOffsets, cache_dir: Optional[str] = None
+) -> bool:
+    # The index is only a cache, so failing to write it is not a problem
+    # beyond having to scan the file again next time
+    sidecar = sidecar_path(path, cache_dir)
+    try:
+        data = {
+            "version": INDEX_VERSION,
+            "file": _file_key(path),
+            "spans": offsets.spans,
+            "control_numbers": offsets.control_numbers,
+            "namespaces": offsets.namespaces.decode("utf-8", "replace"),
+        }
+        os.makedirs(os.path.dirname(sidecar), exist_ok=True)
+        with open(sidecar, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+    except (OSError, ValueError) as error:
+        logger.warning("Unable to save record index %s: %s", sidecar, error)
+        return False
+    return True
+
+
+def _is_wide(encoding: str) -> bool:
+    return encoding.startswith(("utf-16", "utf-32"))
+
+
+def _transcode_to_utf8(path: str, encoding: str) -> str:
+    # The scan works on bytes, so 16 and 32 bit files are read through a
+    # UTF-8 copy that is removed again when the file is closed
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    handle, copy = tempfile.mkstemp(prefix="gce-", suffix=".xml")
+    try:
+        with open(path, "rb") as source, os.fdopen(handle, "wb") as target:
+            while data := source.read(xml_file.CHUNK_SIZE):
+                target.write(
+                    decoder.decode(data).encode("utf-8", "surrogatepass")
+                )
+            target.write(
+                decoder.decode(b"", final=True).encode(
+                    "utf-8", "surrogatepass"
+                )
+            )
+    except BaseException:
+        os.remove(copy)
+        raise
+    return copy
+
+
+class RecordFile:
+    def __init__(
+        self, path: str, offsets: RecordOffsets, encoding: str = "utf-8"
+    ) -> None:
+        self.path = path
+        self.offsets = offsets
+        self.encoding = encoding
+        self._data_path = path
+        self._copy: Optional[str] = None
+        self._file: Optional[typing.BinaryIO] = None
+        self._data: Buffer = b""
+        self._positions: Optional[Dict[str, int]] = None
+
+    @classmethod
+    def open(
+        cls,
+        path: str,
+        use_sidecar: bool = True,
+        cache_dir: Optional[str] = None,
+    ) -> "RecordFile":
+        with open(path, "rb") as f:
+            encoding = xml_file.detect_encoding(f.read(xml_file.HEAD_SIZE))
+        if _is_wide(encoding):
+            # Offsets into a temporary copy are not worth keeping
+            use_sidecar = False
+        offsets = load_sidecar(path, cache_dir) if use_sidecar else None
+        record_file = cls(path, offsets or RecordOffsets([], [], b""))
+        if _is_wide(encoding):
+            record_file._copy = _transcode_to_utf8(path, encoding)
+            record_file._data_path = record_file._copy
+        else:
+            record_file.encoding = encoding
+        try:
+            record_file._map()
+            if offsets is None:
+                record_file.offsets = scan_record_offsets(
+                    record_file._data, record_file.encoding
+                )
+                if use_sidecar:
+                    save_sidecar(path, record_file.offsets, cache_dir)
+        except BaseException:
+            record_file.close()
+            raise
+        return record_file
+
+    def _map(self) -> None:
+        self._file = open(self._data_path, "rb")
+        # mmap refuses empty files
+        if os.fstat(self._file.fileno()).st_size:
+            self._data = mmap.mmap(
+                self._file.fileno(), 0, access=mmap.ACCESS_READ
+            )
+
+    def close(self) -> None:
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+        self._data = b""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self._copy is not None:
+            try:
+                os.remove(self._copy)
+            except OSError:
+                pass
+            self._copy = None
+
+    def __enter__(self) -> "RecordFile":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self.offsets.spans)
+
+    def control_number(self, position: int) -> Optional[str]:
+        return self.offsets.control_numbers[position]
+
+    def record_bytes(self, position: int) -> bytes:
+        start, end = self.offsets.spans[position]
+        record = self._data[start:end]
+        namespaces = self._missing_namespaces(record)
+        if not namespaces:
+            return record
+        name_end = _RECORD_START.match(record)
+        assert name_end is not None
+        return record[: name_end.end()] + namespaces + record[name_end.end() :]
+
+    def record_xml(self, position: int) -> str:
+        return self.record_bytes(position).decode(self.encoding, "replace")
+
+    def _missing_namespaces(self, record: bytes) -> bytes:
+        if not self.offsets.namespaces:
+            return b""
+        start_tag = record[: record.find(b">") + 1]
+        declared = {match.group(1) for match in _NAMESPACE.finditer(start_tag)}
+        return b"".join(
+            match.group()
+            for match in _NAMESPACE.finditer(self.offsets.namespaces)
+            if match.group(1) not in declared
+        )
+
+    def find(self, control_number: str) -> Optional[int]:
+        if self._positions is None:
+            self._positions = {}
+            for position, value in enumerate(self.offsets.control_numbers):
+                if value is not None:
+                    self._positions.setdefault(value, position)
+        return self._positions.get(control_number.strip())
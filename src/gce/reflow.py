@@ -0,0 +1,151 @@
+import io
+import typing
+import xml.etree.ElementTree as ET
+from typing import List, Optional
+from xml.parsers import expat
+
+__all__ = ["reflow_stream", "reflow_xml"]
+
+# Same declaration as the minidom reflow starts with
+XML_DECLARATION = '<?xml version="1.0" ?>'
+
+CHUNK_SIZE = 64 * 1024
+
+
+def _escape(data: str) -> str:
+    # Matches what minidom escapes, so both reflows produce the same text
+    return (
+        data
+        .replace("&", "&amp;")
+        .replace("<", "&lt;")
+        .replace('"', "&quot;")
+        .replace(">", "&gt;")
+    )
+
+
+class _IndentingWriter:
+    # Writes each element as soon as it is known whether it has children,
+    # so nothing but the open elements and the pending text is kept around.
+    # Blank lines are dropped as the minidom reflow does.
+
+    def __init__(self, output: typing.TextIO, indent: str) -> None:
+        self.output = output
+        self.indent = indent
+        self.depth = 0
+        self._pending_start: Optional[str] = None
+        self._text: List[str] = []
+        self._written_lines = 0
+
+    def _write_lines(self, text: str) -> None:
+        for line in text.split("\n"):
+            if not line.strip():
+                continue
+            if self._written_lines:
+                self.output.write("\n")
+            self.output.write(line)
+            self._written_lines += 1
+
+    def _flush(self) -> None:
+        # Something other than text follows, so the open element has
+        # children and any text before them goes on lines of its own
+        if self._pending_start is not None:
+            self._write_lines(
+                f"{self.indent * (self.depth - 1)}{self._pending_start}>"
+            )
+            self._pending_start = None
+        if self._text:
+            self._write_lines(
+                f"{self.indent * self.depth}{''.join(self._text)}"
+            )
+            self._text.clear()
+
+    def start_document(self) -> None:
+        self._write_lines(XML_DECLARATION)
+
+    def start_element(self, name: str, attributes: List[str]) -> None:
+        self._flush()
+        pieces = [f"<{name}"]
+        for attribute, value in zip(attributes[::2], attributes[1::2]):
+            pieces.append(f' {attribute}="{_escape(value)}"')
+        self._pending_start = "".join(pieces)
+        self.depth += 1
+
+    def end_element(self, name: str) -> None:
+        if self._pending_start is None:
+            self._flush()
+            self.depth -= 1
+            self._write_lines(f"{self.indent * self.depth}</{name}>")
+            return
+        self.depth -= 1
+        indent = self.indent * self.depth
+        if self._text:
+            self._write_lines(
+                f"{indent}{self._pending_start}>{''.join(self._text)}</{name}>"
+            )
+            self._text.clear()
+        else:
+            self._write_lines(f"{indent}{self._pending_start}/>")
+        self._pending_start = None
+
+    def characters(self, data: str) -> None:
+        self._text.append(_escape(data))
+
+    def comment(self, data: str) -> None:
+        self._flush()
+        self._write_lines(f"{self.indent * self.depth}<!--{data}-->")
+
+    def processing_instruction(self, target: str, data: str) -> None:
+        self._flush()
+        self._write_lines(f"{self.indent * self.depth}<?{target} {data}?>")
+
+    def doctype(
+        self,
+        name: str,
+        system_id: Optional[str],
+        public_id: Optional[str],
+        has_internal_subset: bool,
+    ) -> None:
+        if public_id:
+            self._write_lines(
+                f'<!DOCTYPE {name} PUBLIC "{public_id}" "{system_id}">'
+            )
+        elif system_id:
+            self._write_lines(f'<!DOCTYPE {name} SYSTEM "{system_id}">')
+        else:
+            self._write_lines(f"<!DOCTYPE {name}>")
+
+
+def _create_parser(writer: _IndentingWriter) -> typing.Any:
+    parser = expat.ParserCreate()
+    parser.ordered_attributes = True
+    parser.buffer_text = True
+    parser.StartElementHandler = writer.start_element
+    parser.EndElementHandler = writer.end_element
+    parser.CharacterDataHandler = writer.characters
+    parser.CommentHandler = writer.comment
+    parser.ProcessingInstructionHandler = writer.processing_instruction
+    parser.StartDoctypeDeclHandler = writer.doctype
+    return parser
+
+
+def reflow_stream(
+    source: typing.Union[typing.TextIO, typing.BinaryIO],
+    output: typing.TextIO,
+    indent: int = 4,
+    chunk_size: int = CHUNK_SIZE,
+) -> None:
+    writer = _IndentingWriter(output, " " * indent)
+    parser = _create_parser(writer)
+    writer.start_document()
+    try:
+        while chunk := source.read(chunk_size):
+            parser.Parse(chunk, False)
+        parser.Parse(b"", True)
+    except expat.ExpatError as error:
+        raise ET.ParseError(str(error)) from error
+
+
+def reflow_xml(xml_text: str, indent: int = 4) -> str:
+    output = io.StringIO()
+    reflow_stream(io.StringIO(xml_text), output, indent=indent)
+    return output.getvalue()
@@ -0,0 +1,115 @@
+import itertools
+import typing
+from typing import Callable, Optional
+
+from PySide6 import QtCore
+
+from gce.rendering import RenderResult, render_jinja_template
+from gce.tasks import BackgroundTask, TaskRunner
+
+__all__ = ["RenderScheduler"]
+
+
+class _RenderTask(BackgroundTask):
+    def __init__(
+        self,
+        request_id: int,
+        jinja_text: str,
+        xml_text: str,
+        render_strategy: Callable[[str, str], RenderResult],
+    ) -> None:
+        super().__init__()
+        self.request_id = request_id
+        self.jinja_text = jinja_text
+        self.xml_text = xml_text
+        self.render_strategy = render_strategy
+
+    def work(self) -> RenderResult:
+        return self.render_strategy(self.jinja_text, self.xml_text)
+
+
+class RenderScheduler(QtCore.QObject):
+    rendered = QtCore.Signal(object)
+
+    def __init__(
+        self,
+        parent: Optional[QtCore.QObject] = None,
+        delay: int = 250,
+        render_strategy: Callable[
+            [str, str], RenderResult
+        ] = render_jinja_template,
+    ) -> None:
+        super().__init__(parent)
+        self.render_strategy = render_strategy
+        self._timer = QtCore.QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(delay)
+        self._timer.timeout.connect(self._start_render)
+        self._runner = TaskRunner(self)
+        self._runner.finished.connect(self._task_finished)
+        self._runner.failed.connect(self._task_failed)
+        self._request_ids = itertools.count()
+        self._latest_request = -1
+        self._inputs: Optional[typing.Tuple[str, str]] = None
+
+        # Only one render runs at a time. Input that arrives in the meantime
+        # waits here and replaces anything already waiting.
+        self._running: Optional[_RenderTask] = None
+        self._waiting = False
+
+    @property
+    def delay(self) -> int:
+        return self._timer.interval()
+
+    @delay.setter
+    def delay(self, value: int) -> None:
+        self._timer.setInterval(value)
+
+    @property
+    def is_busy(self) -> bool:
+        return (
+            self._timer.isActive()
+            or self._running is not None
+            or self._waiting
+        )
+
+    def schedule(self, jinja_text: str, xml_text: str) -> None:
+        self._inputs = (jinja_text, xml_text)
+        self._latest_request = next(self._request_ids)
+        self._timer.start()
+
+    def flush(self) -> None:
+        if self._timer.isActive():
+            self._timer.stop()
+            self._start_render()
+
+    def wait_for_done(self, msecs: int = -1) -> bool:
+        return self._runner.wait_for_done(msecs)
+
+    def _start_render(self) -> None:
+        if self._inputs is None:
+            return
+        if self._running is not None:
+            self._waiting = True
+            return
+        jinja_text, xml_text = self._inputs
+        self._running = _RenderTask(
+            self._latest_request, jinja_text, xml_text, self.render_strategy
+        )
+        self._waiting = False
+        self._runner.start(self._running)
+
+    def _task_finished(self, task: _RenderTask, result: RenderResult) -> None:
+        self._running = None
+        if self._waiting:
+            self._start_render()
+
+        # Anything rendered from input that has since changed is out of date
+        if task.request_id == self._latest_request:
+            self.rendered.emit(result)
+
+    def _task_failed(self, task: _RenderTask, error: Exception) -> None:
+        # A render that raises is reported like one that failed to render
+        self._task_finished(
+            task, RenderResult(f"Unable to render: {error}", False)
+        )
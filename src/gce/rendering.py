@@ -0,0 +1,305 @@
+import collections
+import hashlib
+import multiprocessing
+import multiprocessing.connection
+import threading
+import typing
+import xml.etree.ElementTree as ET
+from typing import Optional
+
+import jinja2
+from galatea.merge_data import serialize_with_jinja_template, MappingConfig
+
+from gce.xml_backend import XmlBackend, get_backend
+
+try:
+    import resource
+except ImportError:  # pragma: no cover
+    # Not available on Windows. Renders there are only limited by time.
+    resource = None  # type: ignore[assignment]
+
+__all__ = [
+    "JinjaRenderer",
+    "LruCache",
+    "ProcessRenderer",
+    "RenderResult",
+    "RenderStrategy",
+    "XmlCache",
+    "render_jinja_template",
+    "xml_fingerprint",
+]
+
+
+K = typing.TypeVar("K")
+V = typing.TypeVar("V")
+
+
+class LruCache(typing.Generic[K, V]):
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._items: collections.OrderedDict[K, V] = collections.OrderedDict()
+
+        # Renders may run on worker threads. The lock is not held while a
+        # value is being created.
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def _lookup(self, key: K, create: typing.Callable[[], V]) -> V:
+        # Values are only stored if create() returns without raising
+        with self._lock:
+            try:
+                value = self._items[key]
+            except KeyError:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._items.move_to_end(key)
+                return value
+
+        value = create()
+        with self._lock:
+            self._items[key] = value
+            while len(self._items) > max(self.maxsize, 0):
+                self._items.popitem(last=False)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+class XmlCache(LruCache[bytes, typing.Any]):
+    def __init__(
+        self, maxsize: int = 8, backend: Optional[XmlBackend] = None
+    ) -> None:
+        # Parsed records are large, so only the last few are kept
+        super().__init__(maxsize)
+        self.backend = backend if backend is not None else get_backend()
+
+    def __contains__(self, xml_text: str) -> bool:
+        return xml_fingerprint(xml_text) in self._items
+
+    def get(self, xml_text: str) -> typing.Any:
+        # Raises ET.ParseError for text that is not XML. An ElementTree or
+        # lxml element, depending on the XML backend.
+        return self._lookup(
+            xml_fingerprint(xml_text),
+            lambda: self.backend.fromstring(xml_text),
+        )
+
+
+def xml_fingerprint(xml_text: str) -> bytes:
+    return hashlib.blake2b(
+        xml_text.encode("utf-8", "surrogatepass"), digest_size=16
+    ).digest()
+
+
+def create_mapping_config(template_text: str) -> MappingConfig:
+    # galatea compiles the template in the config itself on every call to
+    # serialize_with_jinja_template and offers no way to hand it a compiled
+    # one, so there is nothing worth keeping between renders
+    return MappingConfig(
+        key="",
+        matching_keys=[],
+        delimiter="||",
+        existing_data="keep",
+        serialize_method="jinja2",
+        experimental={"jinja2": {"template": template_text}},
+    )
+
+
+# Shared by every renderer that is not given its own cache
+default_xml_cache = XmlCache()
+
+
+class JinjaRenderer:
+    def __init__(self, xml_cache: Optional[XmlCache] = None):
+        super().__init__()
+        self.jinja_text = ""
+        self.xml = ""
+        self.output = ""
+        self.is_valid = True
+        self.error_message = None
+        self.xml_cache = (
+            xml_cache if xml_cache is not None else default_xml_cache
+        )
+
+    def render(self):
+        try:
+            self.error_message = None
+            record = self.xml_cache.get(self.xml)
+            res = serialize_with_jinja_template(
+                record,
+                create_mapping_config(self.jinja_text),
+                enable_experimental_features=True,
+            )
+            self.is_valid = True
+            self.output = res
+            return res
+        except jinja2.exceptions.UndefinedError as e:
+            self.error_message = f"jinja2 exception Undefined Error : {e}"
+            self.output = ""
+            self.is_valid = False
+            return self.error_message
+
+        except jinja2.exceptions.TemplateSyntaxError as e:
+            self.error_message = (
+                f"Jinja expression Template Syntax Error : {e}"
+            )
+            self.output = ""
+            self.is_valid = False
+            return self.error_message
+        except ET.ParseError as e:
+            if self.xml == "":
+                self.is_valid = True
+                return self.output
+            self.error_message = f"Unable to parse xml data: {e}"
+            self.output = ""
+            self.is_valid = False
+            return self.error_message
+
+
+class RenderResult(typing.NamedTuple):
+    text: str
+    is_valid: bool
+
+
+def render_jinja_template(jinja_text: str, xml_text: str) -> RenderResult:
+    renderer = JinjaRenderer()
+    renderer.jinja_text = jinja_text
+    renderer.xml = xml_text
+    text = renderer.render()
+    return RenderResult(text, renderer.is_valid)
+
+
+RenderStrategy = typing.Callable[[str, str], RenderResult]
+
+_WORKER_READY = "ready"
+
+
+def _limit_memory(memory_limit: int) -> None:
+    if resource is None:
+        return
+    _, hard = resource.getrlimit(resource.RLIMIT_AS)
+    if hard != resource.RLIM_INFINITY:
+        memory_limit = min(memory_limit, hard)
+    resource.setrlimit(resource.RLIMIT_AS, (memory_limit, hard))
+
+
+def _render_worker(
+    connection: multiprocessing.connection.Connection,
+    render_strategy: RenderStrategy,
+    memory_limit: Optional[int],
+) -> None:
+    if memory_limit is not None:
+        _limit_memory(memory_limit)
+    connection.send(_WORKER_READY)
+    while True:
+        try:
+            jinja_text, xml_text = connection.recv()
+        except EOFError:
+            return
+        try:
+            result = render_strategy(jinja_text, xml_text)
+        except MemoryError:
+            result = RenderResult("render ran out of memory", False)
+        except Exception as error:
+            result = RenderResult(f"Unable to render: {error}", False)
+        connection.send(result)
+
+
+class ProcessRenderer:
+    def __init__(
+        self,
+        timeout: int = 2000,
+        memory_limit: Optional[int] = 1024 * 1024 * 1024,
+        render_strategy: RenderStrategy = render_jinja_template,
+        startup_timeout: int = 30000,
+    ) -> None:
+        # timeout and startup_timeout are in milliseconds, memory_limit is
+        # in bytes.
+        self.timeout = timeout
+        self.memory_limit = memory_limit
+        self.render_strategy = render_strategy
+        self.startup_timeout = startup_timeout
+
+        # spawn, because forking a process that is running Qt is not safe
+        self._context = multiprocessing.get_context("spawn")
+        self._process: Optional[multiprocessing.process.BaseProcess] = None
+        self._connection: Optional[multiprocessing.connection.Connection] = (
+            None
+        )
+        self._lock = threading.Lock()
+
+    @property
+    def is_running(self) -> bool:
+        return self._process is not None and self._process.is_alive()
+
+    def render(self, jinja_text: str, xml_text: str) -> RenderResult:
+        with self._lock:
+            try:
+                connection = self._start()
+                connection.send((jinja_text, xml_text))
+            except (OSError, EOFError) as error:
+                self._stop()
+                return RenderResult(
+                    f"Unable to start render process: {error}", False
+                )
+
+            if not connection.poll(self.timeout / 1000):
+                # The process is killed rather than waited on. A new one is
+                # started for the next render.
+                self._stop()
+                return RenderResult(
+                    f"render timed out after {self.timeout} ms", False
+                )
+            try:
+                return connection.recv()
+            except EOFError:
+                self._stop()
+                return RenderResult("render process stopped", False)
+
+    def close(self) -> None:
+        with self._lock:
+            self._stop()
+
+    def _start(self) -> multiprocessing.connection.Connection:
+        if self._connection is not None and self.is_running:
+            return self._connection
+        self._stop()
+        parent_connection, child_connection = self._context.Pipe()
+        process = self._context.Process(
+            target=_render_worker,
+            args=(child_connection, self.render_strategy, self.memory_limit),
+            daemon=True,
+        )
+        process.start()
+        child_connection.close()
+        self._process = process
+        self._connection = parent_connection
+
+        # Wait for the imports to finish so that they are not counted
+        # against the time limit of the first render
+        if not parent_connection.poll(self.startup_timeout / 1000):
+            self._stop()
+            raise OSError("render process did not start in time")
+        if parent_connection.recv() != _WORKER_READY:
+            self._stop()
+            raise OSError("render process did not start correctly")
+        return parent_connection
+
+    def _stop(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+        if self._process is not None:
+            if self._process.is_alive():
+                self._process.kill()
+            self._process.join()
+            self._process = None
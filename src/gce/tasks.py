@@ -0,0 +1,134 @@
+import functools
+import itertools
+import threading
+import typing
+from typing import Dict, Optional
+
+from PySide6 import QtCore
+
+__all__ = ["BackgroundTask", "TaskRunner"]
+
+
+class _TaskSignals(QtCore.QObject):
+    reported = QtCore.Signal(int, object)
+    finished = QtCore.Signal(int, object)
+    failed = QtCore.Signal(int, object)
+
+
+class BackgroundTask(QtCore.QRunnable):
+    # Work for a TaskRunner. Subclasses do it in work(), which runs on a
+    # worker thread and returns the result or raises. Values passed to
+    # report() are handed over while the work is still going.
+    def __init__(self) -> None:
+        super().__init__()
+        self.task_id = -1
+        self.cancelled = threading.Event()
+        self.signals = _TaskSignals()
+
+    def work(self) -> typing.Any:
+        raise NotImplementedError
+
+    def report(self, value: typing.Any) -> None:
+        self.signals.reported.emit(self.task_id, value)
+
+    def discard_result(self, result: typing.Any) -> None:
+        # Called on the runner's thread with the result of a task that was
+        # cancelled while it ran, for results that hold on to something
+        pass
+
+    def run(self) -> None:
+        # A task cancelled before it started is skipped. It still reports
+        # back so the runner can let go of it.
+        result = None
+        if not self.cancelled.is_set():
+            try:
+                result = self.work()
+            except Exception as error:
+                self.signals.failed.emit(self.task_id, error)
+                return
+        self.signals.finished.emit(self.task_id, result)
+
+
+def _cancel_tasks(tasks: Dict[int, BackgroundTask], *_) -> None:
+    for task in tasks.values():
+        task.cancelled.set()
+
+
+class TaskRunner(QtCore.QObject):
+    # Runs BackgroundTasks and hands what they report, return or raise back
+    # on the thread the runner lives in, along with the task. Nothing comes
+    # back from a task once it is cancelled.
+    reported = QtCore.Signal(object, object)
+    finished = QtCore.Signal(object, object)
+    failed = QtCore.Signal(object, object)
+
+    def __init__(
+        self,
+        parent: Optional[QtCore.QObject] = None,
+        max_thread_count: int = 1,
+    ) -> None:
+        super().__init__(parent)
+
+        # With one thread, tasks run in the order they were started
+        self._thread_pool = QtCore.QThreadPool(self)
+        self._thread_pool.setMaxThreadCount(max_thread_count)
+        self._task_ids = itertools.count()
+
+        # Tasks are kept until they report back, including ones whose result
+        # is no longer wanted.
+        self._tasks: Dict[int, BackgroundTask] = {}
+
+        # The thread pool waits for its tasks when it is destroyed, so the
+        # ones still running or waiting are told to stop first
+        self.destroyed.connect(functools.partial(_cancel_tasks, self._tasks))
+
+    @property
+    def is_busy(self) -> bool:
+        return len(self._tasks) > 0
+
+    def start(self, task: BackgroundTask) -> None:
+        task.task_id = next(self._task_ids)
+        task.setAutoDelete(False)
+        task.signals.reported.connect(self._task_reported)
+        task.signals.finished.connect(self._task_finished)
+        task.signals.failed.connect(self._task_failed)
+        self._tasks[task.task_id] = task
+        self._thread_pool.start(task)
+
+    def cancel_all(self) -> None:
+        _cancel_tasks(self._tasks)
+
+    def wait_for_done(self, msecs: int = -1) -> bool:
+        return self._thread_pool.waitForDone(msecs)
+
+    def finish_all(self) -> None:
+        # Blocks until every task has ended, then hands back what they did
+        # right away instead of on the next event loop pass, which may never
+        # come if the application is quitting
+        self.wait_for_done()
+        QtCore.QCoreApplication.sendPostedEvents(
+            self, QtCore.QEvent.Type.MetaCall
+        )
+
+    @QtCore.Slot(int, object)
+    def _task_reported(self, task_id: int, value: typing.Any) -> None:
+        task = self._tasks.get(task_id)
+        if task is not None and not task.cancelled.is_set():
+            self.reported.emit(task, value)
+
+    @QtCore.Slot(int, object)
+    def _task_finished(self, task_id: int, result: typing.Any) -> None:
+        task = self._tasks.pop(task_id, None)
+        if task is None:
+            return
+        if task.cancelled.is_set():
+            if result is not None:
+                task.discard_result(result)
+            return
+        self.finished.emit(task, result)
+
+    @QtCore.Slot(int, object)
+    def _task_failed(self, task_id: int, error: Exception) -> None:
+        task = self._tasks.pop(task_id, None)
+        if task is not None and not task.cancelled.is_set():
+            self.failed.emit(task, error)
@@ -0,0 +1,297 @@
+import bisect
+import re
+import tomllib
+import typing
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import tomli_w
+
+__all__ = [
+    "Change",
+    "Span",
+    "TomlSourceDocument",
+    "UnsupportedChangeError",
+    "create_source_document",
+    "format_value",
+]
+
+# (index of the [[mapping]] table or None for [mappings], key, new value)
+Change = Tuple[Optional[int], str, typing.Any]
+
+_BARE_KEY = re.compile(r"[A-Za-z0-9_-]+")
+_TABLE_HEADER = re.compile(r"\[(\[)?[ \t]*([^\]\n]+?)[ \t]*\](\])?")
+_LOCAL_DATE = re.compile(r"\d{4}-\d{2}-\d{2}")
+_LOCAL_TIME = re.compile(r" \d{2}:")
+_VALUE_TERMINATORS = " \t\r\n#,]}"
+
+
+class Span(NamedTuple):
+    start: int
+    end: int
+
+
+class UnsupportedChangeError(Exception):
+    pass
+
+
+class TomlSourceDocument:
+    def __init__(
+        self,
+        text: str,
+        mappings: Dict[str, Span],
+        mapping: List[Dict[str, Span]],
+    ) -> None:
+        self.text = text
+
+        # Location of each value in the text, [mappings] keys first and then
+        # one dictionary per [[mapping]] table
+        self.mappings = mappings
+        self.mapping = mapping
+
+    @classmethod
+    def from_text(cls, text: str) -> "TomlSourceDocument":
+        mappings, mapping = _scan_document(text)
+        return cls(text, mappings, mapping)
+
+    def matches(self, data: typing.Mapping[str, typing.Any]) -> bool:
+        tables = data.get("mapping", [])
+        return (
+            set(self.mappings) == set(data.get("mappings", {}))
+            and len(self.mapping) == len(tables)
+            and all(
+                set(spans) == set(table)
+                for spans, table in zip(self.mapping, tables)
+            )
+        )
+
+    def render(self, changes: Iterable[Change]) -> str:
+        return self._apply(self._replacements(changes))
+
+    def update(self, changes: Iterable[Change]) -> str:
+        replacements = self._replacements(changes)
+        self.text = self._apply(replacements)
+        if replacements:
+            self._shift_spans(replacements)
+        return self.text
+
+    def _replacements(
+        self, changes: Iterable[Change]
+    ) -> List[Tuple[Span, str]]:
+        replacements = []
+        for table, key, value in changes:
+            try:
+                spans = self.mappings if table is None else self.mapping[table]
+                span = spans[key]
+            except (IndexError, KeyError) as error:
+                raise UnsupportedChangeError(
+                    f"No location known for {key} in table {table}"
+                ) from error
+            replacements.append((span, format_value(value)))
+        replacements.sort()
+        return replacements
+
+    def _apply(self, replacements: List[Tuple[Span, str]]) -> str:
+        pieces = []
+        last = 0
+        for span, new_text in replacements:
+            pieces.append(self.text[last : span.start])
+            pieces.append(new_text)
+            last = span.end
+        pieces.append(self.text[last:])
+        return "".join(pieces)
+
+    def _shift_spans(self, replacements: List[Tuple[Span, str]]) -> None:
+        starts = [span.start for span, _ in replacements]
+        new_text = dict(replacements)
+        offsets = [0]
+        for span, text in replacements:
+            offsets.append(offsets[-1] + len(text) - (span.end - span.start))
+
+        def shift(span: Span) -> Span:
+            offset = offsets[bisect.bisect_left(starts, span.start)]
+            start = span.start + offset
+            if span in new_text:
+                return Span(start, start + len(new_text[span]))
+            return Span(start, span.end + offset)
+
+        for spans in [self.mappings, *self.mapping]:
+            for key, span in spans.items():
+                spans[key] = shift(span)
+
+
+def create_source_document(
+    text: str, data: typing.Mapping[str, typing.Any]
+) -> Optional[TomlSourceDocument]:
+    # Returns None if the text uses TOML the scanner does not track, such as
+    # dotted keys or sub-tables, so the caller can fall back to a full dump.
+    try:
+        document = TomlSourceDocument.from_text(text)
+    except ValueError:
+        return None
+    return document if document.matches(data) else None
+
+
+def format_value(value: typing.Any) -> str:
+    if isinstance(value, list):
+        return f"[{', '.join(format_value(item) for item in value)}]"
+    if isinstance(value, dict):
+        if not value:
+            return "{}"
+        items = ", ".join(
+            f"{_format_key(k)} = {format_value(v)}" for k, v in value.items()
+        )
+        return f"{{ {items} }}"
+    return tomli_w.dumps({"v": value}).removeprefix("v = ").rstrip("\n")
+
+
+def _format_key(key: str) -> str:
+    if _BARE_KEY.fullmatch(key):
+        return key
+    return format_value(key)
+
+
+def _scan_document(
+    text: str,
+) -> Tuple[Dict[str, Span], List[Dict[str, Span]]]:
+    mappings: Dict[str, Span] = {}
+    mapping: List[Dict[str, Span]] = []
+    current: Optional[Dict[str, Span]] = None
+    pos = 0
+    while pos < len(text):
+        char = text[pos]
+        if char in " \t\r\n":
+            pos += 1
+        elif char == "#":
+            pos = _end_of_line(text, pos)
+        elif char == "[":
+            match = _TABLE_HEADER.match(text, pos)
+            if match is None:
+                raise ValueError(f"Unable to read table header at {pos}")
+            name = match.group(2).strip("\"'")
+            if match.group(1) and match.group(3) and name == "mapping":
+                current = {}
+                mapping.append(current)
+            elif not match.group(1) and name == "mappings":
+                current = mappings
+            else:
+                current = None
+            pos = match.end()
+        else:
+            keys, pos = _scan_key(text, pos)
+            if text[pos : pos + 1] != "=":
+                raise ValueError(f"Expected '=' at {pos}")
+            pos = _skip_whitespace(text, pos + 1)
+            value_end = _skip_value(text, pos)
+            if current is not None and len(keys) == 1:
+                current[keys[0]] = Span(pos, value_end)
+            pos = value_end
+    return mappings, mapping
+
+
+def _end_of_line(text: str, pos: int) -> int:
+    end = text.find("\n", pos)
+    return len(text) if end == -1 else end
+
+
+def _skip_whitespace(text: str, pos: int) -> int:
+    while pos < len(text) and text[pos] in " \t":
+        pos += 1
+    return pos
+
+
+def _scan_key(text: str, pos: int) -> Tuple[List[str], int]:
+    parts = []
+    while True:
+        pos = _skip_whitespace(text, pos)
+        if text[pos : pos + 1] in ('"', "'"):
+            end = _skip_string(text, pos)
+            parts.append(tomllib.loads(f"k = {text[pos:end]}")["k"])
+        else:
+            match = _BARE_KEY.match(text, pos)
+            if match is None:
+                raise ValueError(f"Unable to read key at {pos}")
+            end = match.end()
+            parts.append(match.group())
+        pos = _skip_whitespace(text, end)
+        if text[pos : pos + 1] != ".":
+            return parts, pos
+        pos += 1
+
+
+def _skip_value(text: str, pos: int) -> int:
+    char = text[pos : pos + 1]
+    if char in ('"', "'"):
+        return _skip_string(text, pos)
+    if char in ("[", "{"):
+        return _skip_container(text, pos)
+    end = pos
+    while end < len(text) and text[end] not in _VALUE_TERMINATORS:
+        end += 1
+    if end == pos:
+        raise ValueError(f"Expected a value at {pos}")
+    # Local date-times may use a space between the date and the time
+    is_date = _LOCAL_DATE.fullmatch(text, pos, end) is not None
+    if is_date and _LOCAL_TIME.match(text, end):
+        return _skip_value(text, end + 1)
+    return end
+
+
+def _skip_container(text: str, pos: int) -> int:
+    depth = 0
+    while pos < len(text):
+        char = text[pos]
+        if char in ('"', "'"):
+            pos = _skip_string(text, pos)
+            continue
+        if char == "#":
+            pos = _end_of_line(text, pos)
+            continue
+        if char in "[{":
+            depth += 1
+        elif char in "]}":
+            depth -= 1
+            if depth == 0:
+                return pos + 1
+        pos += 1
+    raise ValueError("Unterminated array or inline table")
+
+
+def _skip_string(text: str, pos: int) -> int:
+    quote = text[pos]
+    if text.startswith(quote * 3, pos):
+        search_from = pos + 3
+        while True:
+            end = text.find(quote * 3, search_from)
+            if end == -1:
+                raise ValueError(f"Unterminated string at {pos}")
+            if quote == '"' and _is_escaped(text, end):
+                search_from = end + 1
+                continue
+            # Up to two quotes are allowed right before the closing quotes
+            close = end + 3
+            while (
+                close < len(text)
+                and text[close] == quote
+                and close < (end + 5)
+            ):
+                close += 1
+            return close
+    index = pos + 1
+    while index < len(text):
+        char = text[index]
+        if char == "\\" and quote == '"':
+            index += 2
+            continue
+        if char == quote:
+            return index + 1
+        if char == "\n":
+            break
+        index += 1
+    raise ValueError(f"Unterminated string at {pos}")
+
+
+def _is_escaped(text: str, pos: int) -> bool:
+    backslashes = 0
+    while pos - backslashes - 1 >= 0 and text[pos - backslashes - 1] == "\\":
+        backslashes += 1
+    return backslashes % 2 == 1
@@ -0,0 +1,220 @@
+import os
+import pathlib
+import shutil
+import tempfile
+import typing
+from typing import Callable, Optional
+
+import galatea.merge_data
+from PySide6 import QtCore
+
+from gce import models
+from gce.tasks import BackgroundTask, TaskRunner
+
+__all__ = [
+    "BackgroundTomlLoader",
+    "BackgroundTomlWriter",
+    "write_text_atomically",
+]
+
+
+def _current_umask() -> int:
+    # The umask can only be read by setting it
+    mask = os.umask(0o022)
+    os.umask(mask)
+    return mask
+
+
+def write_text_atomically(file: pathlib.Path, text: str) -> None:
+    # Write next to the target and rename over it so a crash part way through
+    # never leaves a truncated file behind. A link is left in place and the
+    # file it points to is replaced.
+    file = pathlib.Path(os.path.realpath(file))
+    file_descriptor, temp_name = tempfile.mkstemp(
+        dir=file.parent, prefix=f".{file.name}.", suffix=".tmp"
+    )
+    temp_file = pathlib.Path(temp_name)
+    try:
+        with os.fdopen(file_descriptor, "w", encoding="utf-8") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        # mkstemp makes the file private to the owner, the saved file gets
+        # the permissions of the one it replaces or of a newly created one
+        if file.exists():
+            shutil.copymode(file, temp_file)
+        else:
+            os.chmod(temp_file, 0o666 & ~_current_umask())
+        os.replace(temp_file, file)
+    except BaseException:
+        temp_file.unlink(missing_ok=True)
+        raise
+
+
+class _WriteTextTask(BackgroundTask):
+    def __init__(
+        self,
+        file: pathlib.Path,
+        model: models.TomlModel,
+        snapshot: models.ModelSnapshot,
+        write_strategy: Callable[[pathlib.Path, str], None],
+    ) -> None:
+        super().__init__()
+        self.file = file
+        self.model = model
+        self.snapshot = snapshot
+        self.write_strategy = write_strategy
+
+    def work(self) -> None:
+        self.write_strategy(self.file, typing.cast(str, self.snapshot.text))
+
+
+class BackgroundTomlWriter(QtCore.QObject):
+    saved = QtCore.Signal(object, object)
+    save_failed = QtCore.Signal(object, str)
+
+    def __init__(
+        self,
+        parent: Optional[QtCore.QObject] = None,
+        write_strategy: Callable[
+            [pathlib.Path, str], None
+        ] = write_text_atomically,
+    ) -> None:
+        super().__init__(parent)
+        self.write_strategy = write_strategy
+
+        # One thread so saves are written in the order they were requested
+        self._runner = TaskRunner(self)
+        self._runner.finished.connect(self._task_finished)
+        self._runner.failed.connect(self._task_failed)
+
+    @property
+    def is_saving(self) -> bool:
+        return self._runner.is_busy
+
+    def save(self, toml_file: pathlib.Path, model: models.TomlModel) -> None:
+        # The text is serialized here on the GUI thread so that edits made
+        # while the file is being written are not part of this save.
+        snapshot = models.create_snapshot(model)
+        self._runner.start(
+            _WriteTextTask(toml_file, model, snapshot, self.write_strategy)
+        )
+
+    def wait_for_done(self, msecs: int = -1) -> bool:
+        return self._runner.wait_for_done(msecs)
+
+    def finish_pending_saves(self) -> None:
+        # Blocks until every save is written and emits its saved or
+        # save_failed signal before returning
+        self._runner.finish_all()
+
+    def _task_finished(self, task: _WriteTextTask, _) -> None:
+        task.model.mark_saved(task.snapshot)
+        self.saved.emit(task.file, task.model)
+
+    def _task_failed(self, task: _WriteTextTask, error: Exception) -> None:
+        self.save_failed.emit(task.file, str(error))
+
+
+class _LoadTomlTask(BackgroundTask):
+    def __init__(
+        self,
+        toml_file: pathlib.Path,
+        load_strategy: Callable[[pathlib.Path], models.TomlModel],
+        target_thread: QtCore.QThread,
+    ) -> None:
+        super().__init__()
+        self.toml_file = toml_file
+        self.load_strategy = load_strategy
+        self.target_thread = target_thread
+
+    def work(self) -> models.TomlModel:
+        try:
+            model = self.load_strategy(self.toml_file)
+        except (
+            galatea.merge_data.BadMappingFileError,
+            galatea.merge_data.BadMappingDataError,
+        ):
+            raise
+        except OSError as error:
+            raise galatea.merge_data.BadMappingFileError(
+                source_file=self.toml_file,
+                details=f"Unable to read {self.toml_file.name}. {error}",
+            ) from error
+        except Exception as error:
+            # Such as a file that is not UTF-8 or a value of the wrong type
+            raise galatea.merge_data.BadMappingFileError(
+                source_file=self.toml_file,
+                details=f"Error loading {self.toml_file.name}.\n{error}",
+            ) from error
+
+        # Models built on this worker thread have to be handed over to the
+        # GUI thread before the view can use them.
+        if (
+            isinstance(model, QtCore.QObject)
+            and model.thread() == QtCore.QThread.currentThread()
+        ):
+            model.moveToThread(self.target_thread)
+        return model
+
+
+class BackgroundTomlLoader(QtCore.QObject):
+    loading_started = QtCore.Signal(object)
+    loaded = QtCore.Signal(object, object)
+    failed = QtCore.Signal(object, object)
+    cancelled = QtCore.Signal(object)
+    finished = QtCore.Signal()
+
+    def __init__(self, parent: Optional[QtCore.QObject] = None) -> None:
+        super().__init__(parent)
+
+        # Parsing cannot be interrupted, a superseded load is left to finish
+        # on its own thread while the next one starts
+        self._runner = TaskRunner(
+            self, max_thread_count=QtCore.QThread.idealThreadCount()
+        )
+        self._runner.finished.connect(self._task_loaded)
+        self._runner.failed.connect(self._task_failed)
+        self._current: Optional[_LoadTomlTask] = None
+
+    @property
+    def is_loading(self) -> bool:
+        return self._current is not None
+
+    def load(
+        self,
+        toml_file: pathlib.Path,
+        load_strategy: Callable[[pathlib.Path], models.TomlModel],
+    ) -> None:
+        # Any load still running is superseded and its result dropped
+        if self._current is not None:
+            self._current.cancelled.set()
+        self._current = _LoadTomlTask(toml_file, load_strategy, self.thread())
+        self.loading_started.emit(toml_file)
+        self._runner.start(self._current)
+
+    def cancel(self) -> None:
+        # The running task is left to finish and whatever it produces is
+        # thrown away.
+        task = self._current
+        if task is None:
+            return
+        task.cancelled.set()
+        self._current = None
+        self.cancelled.emit(task.toml_file)
+        self.finished.emit()
+
+    def wait_for_done(self, msecs: int = -1) -> bool:
+        return self._runner.wait_for_done(msecs)
+
+    def _task_loaded(
+        self, task: _LoadTomlTask, model: models.TomlModel
+    ) -> None:
+        self._current = None
+        self.loaded.emit(task.toml_file, model)
+        self.finished.emit()
+
+    def _task_failed(self, task: _LoadTomlTask, error: Exception) -> None:
+        self._current = None
+        self.failed.emit(task.toml_file, error)
+        self.finished.emit()
@@ -0,0 +1,95 @@
+import threading
+import typing
+import xml.etree.ElementTree as ET
+from typing import Dict, Optional
+
+try:
+    from lxml import etree as lxml_etree
+except ImportError:  # pragma: no cover
+    lxml_etree = None
+
+__all__ = [
+    "LxmlBackend",
+    "StdlibBackend",
+    "XmlBackend",
+    "available_backends",
+    "get_backend",
+]
+
+
+class XmlBackend(typing.Protocol):
+    name: str
+
+    # Raises ET.ParseError for text that is not well-formed XML, no matter
+    # which library does the parsing
+    def fromstring(self, xml_text: str) -> typing.Any: ...
+
+
+class StdlibBackend:
+    name = "stdlib"
+
+    def fromstring(self, xml_text: str) -> ET.Element:
+        return ET.fromstring(xml_text)
+
+
+class LxmlBackend:
+    name = "lxml"
+
+    def __init__(self) -> None:
+        if lxml_etree is None:
+            raise ImportError("lxml is not installed")
+
+        # lxml parser objects must not be shared between threads
+        self._parsers = threading.local()
+
+    def _parser(self) -> typing.Any:
+        parser = getattr(self._parsers, "parser", None)
+        if parser is None:
+            # The text is always handed over as UTF-8, whatever encoding
+            # its declaration names. Comments and processing instructions
+            # are dropped as ElementTree drops them, so galatea gets the
+            # same tree from either backend.
+            parser = lxml_etree.XMLParser(
+                encoding="utf-8",
+                resolve_entities=False,
+                huge_tree=True,
+                remove_comments=True,
+                remove_pis=True,
+            )
+            self._parsers.parser = parser
+        return parser
+
+    def fromstring(self, xml_text: str) -> typing.Any:
+        # lxml refuses str input that carries an encoding declaration, so
+        # it gets bytes instead
+        try:
+            return lxml_etree.fromstring(
+                xml_text.encode("utf-8", "surrogatepass"), self._parser()
+            )
+        except lxml_etree.XMLSyntaxError as error:
+            raise ET.ParseError(str(error)) from error
+
+
+_BACKENDS: Dict[str, typing.Callable[[], XmlBackend]] = {
+    "lxml": LxmlBackend,
+    "stdlib": StdlibBackend,
+}
+_instances: Dict[str, XmlBackend] = {}
+
+
+def available_backends() -> typing.List[str]:
+    names = ["stdlib"]
+    if lxml_etree is not None:
+        names.insert(0, "lxml")
+    return names
+
+
+def get_backend(name: Optional[str] = None) -> XmlBackend:
+    # lxml is used when it is installed unless another backend is asked for
+    if name is None:
+        name = available_backends()[0]
+    if name not in _BACKENDS:
+        raise ValueError(f"Unknown XML backend {name}")
+    if name not in _instances:
+        _instances[name] = _BACKENDS[name]()
+    return _instances[name]
@@ -0,0 +1,106 @@
+import codecs
+import io
+import os
+import re
+import typing
+from typing import Callable, Iterator, Optional, Tuple, Union
+
+__all__ = ["detect_encoding", "read_text_chunks"]
+
+CHUNK_SIZE = 256 * 1024
+
+# Enough to hold any BOM and XML declaration
+HEAD_SIZE = 1024
+
+# Longest first, the UTF-32 little-endian BOM starts with the UTF-16 one
+_BOMS = [
+    (codecs.BOM_UTF32_LE, "utf-32"),
+    (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+]
+
+# "<?" in encodings without a byte order mark
+_WIDE_DECLARATIONS = [
+    (b"<\x00\x00\x00?\x00\x00\x00", "utf-32-le"),
+    (b"\x00\x00\x00<\x00\x00\x00?", "utf-32-be"),
+    (b"<\x00?\x00", "utf-16-le"),
+    (b"\x00<\x00?", "utf-16-be"),
+]
+
+_DECLARED_ENCODING = re.compile(
+    rb"""^<\?xml[^>]*?\sencoding\s*=\s*["']([A-Za-z][\w.:-]*)["']"""
+)
+
+PathLike = Union[str, os.PathLike]
+
+
+def detect_encoding(head: bytes, default: str = "utf-8") -> str:
+    # Same order of evidence as the XML spec suggests: byte order mark,
+    # then the shape of "<?xml", then the encoding it declares
+    for bom, encoding in _BOMS:
+        if head.startswith(bom):
+            return encoding
+    for declaration, encoding in _WIDE_DECLARATIONS:
+        if head.startswith(declaration):
+            return encoding
+    match = _DECLARED_ENCODING.match(head)
+    if match is None:
+        return default
+    try:
+        encoding = codecs.lookup(match.group(1).decode("ascii")).name
+    except LookupError:
+        return default
+
+    # The bytes so far are ASCII compatible, so a declared 16 or 32 bit
+    # encoding cannot be right
+    if encoding.startswith(("utf-16", "utf-32")):
+        return default
+    return encoding
+
+
+def read_text_chunks(
+    path: PathLike,
+    chunk_size: int = CHUNK_SIZE,
+    on_decode_error: Optional[Callable[[int], None]] = None,
+) -> Iterator[Tuple[str, int, int]]:
+    # Yields (text, bytes read so far, file size). Undecodable bytes are
+    # replaced so a bad byte in a huge file does not stop the load, but
+    # on_decode_error is told the file offset of the first one in each
+    # chunk. Line endings are turned into "\n" as reading in text mode
+    # would.
+    with open(path, "rb") as f:
+        total = os.fstat(f.fileno()).st_size
+        head = f.read(HEAD_SIZE)
+        encoding = detect_encoding(head)
+        byte_decoder = codecs.getincrementaldecoder(encoding)()
+        decoder = io.IncrementalNewlineDecoder(byte_decoder, translate=True)
+
+        def decode(data: bytes, offset: int, final: bool = False) -> str:
+            pending = len(byte_decoder.getstate()[0])
+            try:
+                return decoder.decode(data, final)
+            except UnicodeDecodeError as error:
+                if on_decode_error is not None:
+                    on_decode_error(offset - pending + error.start)
+
+            # The decoder keeps its state when it raises, so the same bytes
+            # can be decoded again with replacement characters
+            byte_decoder.errors = "replace"
+            try:
+                return decoder.decode(data, final)
+            finally:
+                byte_decoder.errors = "strict"
+
+        data: typing.Optional[bytes] = head
+        bytes_read = len(head)
+        while data:
+            text = decode(data, bytes_read - len(data))
+            if text:
+                yield text, bytes_read, total
+            data = f.read(chunk_size)
+            bytes_read += len(data)
+        text = decode(b"", bytes_read, final=True)
+        if text:
+            yield text, bytes_read, total
@@ -0,0 +1,203 @@
+from __future__ import annotations
+
+import logging
+import threading
+import typing
+from typing import Callable, Optional
+
+from PySide6 import QtCore
+
+from gce import record_file, xml_file
+from gce.tasks import BackgroundTask, TaskRunner
+
+if typing.TYPE_CHECKING:
+    from gce import gui
+
+__all__ = ["ReadStrategy", "XmlFileLoader"]
+
+logger = logging.getLogger(__name__)
+
+
+class ReadStrategy(typing.Protocol):
+    def __call__(
+        self,
+        file_name: str,
+        /,
+        *,
+        on_decode_error: Optional[Callable[[int], None]] = None,
+    ) -> typing.Iterable[typing.Tuple[str, int, int]]: ...
+
+
+class _LoadXmlTask(BackgroundTask):
+    # Reports (text, bytes read, total bytes) for every chunk
+    def __init__(
+        self,
+        file_name: str,
+        read_strategy: ReadStrategy,
+        max_pending_chunks: int = 4,
+    ) -> None:
+        super().__init__()
+        self.file_name = file_name
+        self.read_strategy = read_strategy
+        self.first_decode_error: Optional[int] = None
+
+        # Keeps the reader from getting far ahead of the document, which
+        # would only move the whole file into queued signals
+        self.pending_chunks = threading.Semaphore(max_pending_chunks)
+
+    def work(self) -> None:
+        for text, bytes_read, total in self.read_strategy(
+            self.file_name, on_decode_error=self._decode_failed
+        ):
+            while not self.pending_chunks.acquire(timeout=0.1):
+                if self.cancelled.is_set():
+                    return
+            if self.cancelled.is_set():
+                return
+            self.report((text, bytes_read, total))
+
+    def _decode_failed(self, offset: int) -> None:
+        # Only read once the task has finished
+        if self.first_decode_error is None:
+            self.first_decode_error = offset
+
+
+class _OpenCollectionTask(BackgroundTask):
+    def __init__(
+        self,
+        file_name: str,
+        open_strategy: Callable[[str], record_file.RecordFile],
+        fall_back_to_text: bool = False,
+    ) -> None:
+        super().__init__()
+        self.file_name = file_name
+        self.open_strategy = open_strategy
+        self.fall_back_to_text = fall_back_to_text
+
+    def work(self) -> record_file.RecordFile:
+        return self.open_strategy(self.file_name)
+
+    def discard_result(self, result: record_file.RecordFile) -> None:
+        result.close()
+
+
+_FileTask = typing.Union[_LoadXmlTask, _OpenCollectionTask]
+
+
+class XmlFileLoader(QtCore.QObject):
+    loading_started = QtCore.Signal(str)
+    progress = QtCore.Signal(object, object)
+    loaded = QtCore.Signal(str)
+    failed = QtCore.Signal(str, object)
+    cancelled = QtCore.Signal(str)
+    finished = QtCore.Signal()
+
+    # File name and offset of the first byte that had to be replaced
+    decode_failed = QtCore.Signal(str, object)
+
+    def __init__(
+        self,
+        viewer: gui.XMLViewer,
+        read_strategy: ReadStrategy = xml_file.read_text_chunks,
+        open_strategy: Callable[
+            [str], record_file.RecordFile
+        ] = record_file.RecordFile.open,
+    ) -> None:
+        super().__init__(viewer)
+        self.viewer = viewer
+        self.read_strategy = read_strategy
+        self.open_strategy = open_strategy
+        self._runner = TaskRunner(self)
+        self._runner.reported.connect(self._task_chunk_read)
+        self._runner.finished.connect(self._task_finished)
+        self._runner.failed.connect(self._task_failed)
+        self._current: Optional[_FileTask] = None
+
+    @property
+    def is_loading(self) -> bool:
+        return self._current is not None
+
+    def load(self, file_name: str) -> None:
+        self._start(_LoadXmlTask(file_name, self.read_strategy))
+
+    def open_collection(
+        self, file_name: str, fall_back_to_text: bool = False
+    ) -> None:
+        self._start(
+            _OpenCollectionTask(
+                file_name, self.open_strategy, fall_back_to_text
+            )
+        )
+
+    def cancel(self) -> None:
+        # What was loaded so far is thrown away rather than left looking
+        # like the whole file
+        task = self._current
+        if task is None:
+            return
+        self._finish(task)
+        self.viewer.setPlainText("")
+        self.cancelled.emit(task.file_name)
+        self.finished.emit()
+
+    def wait_for_done(self, msecs: int = -1) -> bool:
+        return self._runner.wait_for_done(msecs)
+
+    def _start(self, task: _FileTask) -> None:
+        self.cancel()
+        self._current = task
+        self.viewer.begin_load()
+        self.loading_started.emit(task.file_name)
+        self._runner.start(task)
+
+    def _finish(self, task: _FileTask) -> None:
+        task.cancelled.set()
+        self._current = None
+        self.viewer.end_load()
+
+    def _task_chunk_read(
+        self, task: _LoadXmlTask, chunk: typing.Tuple[str, int, int]
+    ) -> None:
+        text, bytes_read, total = chunk
+        task.pending_chunks.release()
+        self.viewer.append_loaded_text(text)
+        self.progress.emit(bytes_read, total)
+
+    def _task_finished(
+        self, task: _FileTask, records: Optional[record_file.RecordFile]
+    ) -> None:
+        self._finish(task)
+        if isinstance(task, _LoadXmlTask):
+            self._file_loaded(task)
+            return
+        assert records is not None
+
+        # A file only opened as a collection because of its size may not be
+        # one, it still gets shown as text
+        if len(records) == 0 and task.fall_back_to_text:
+            records.close()
+            self.load(task.file_name)
+            return
+        self.viewer.show_collection(records)
+        self.loaded.emit(task.file_name)
+        self.finished.emit()
+
+    def _file_loaded(self, task: _LoadXmlTask) -> None:
+        if task.first_decode_error is not None:
+            logger.warning(
+                "Replaced undecodable bytes in %s, the first at byte %d",
+                task.file_name,
+                task.first_decode_error,
+            )
+            self.decode_failed.emit(task.file_name, task.first_decode_error)
+        self.loaded.emit(task.file_name)
+        self.finished.emit()
+
+    def _task_failed(self, task: _FileTask, error: Exception) -> None:
+        # Anything, such as an unknown declared encoding, would otherwise
+        # leave the viewer loading forever
+        self._finish(task)
+        self.viewer.setPlainText("")
+        logger.error("Unable to read %s. %s", task.file_name, error)
+        self.failed.emit(task.file_name, error)
+        self.finished.emit()
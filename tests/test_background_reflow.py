@@ -0,0 +1,29 @@
+import xml.etree.ElementTree as ET
+
+from gce import background_reflow, reflow
+
+
+class TestBackgroundReflow:
+    def test_reflowed_emits_result(self, qtbot):
+        worker = background_reflow.BackgroundReflow()
+        with qtbot.waitSignal(worker.reflowed) as blocker:
+            worker.reflow("<a><b/></a>", reflow.reflow_xml)
+        assert blocker.args == ['<?xml version="1.0" ?>\n<a>\n    <b/>\n</a>']
+        assert worker.is_busy is False
+
+    def test_failed_emits_error(self, qtbot):
+        worker = background_reflow.BackgroundReflow()
+        with qtbot.waitSignal(worker.failed) as blocker:
+            worker.reflow("<a>", reflow.reflow_xml)
+        assert isinstance(blocker.args[0], ET.ParseError)
+
+    def test_superseded_result_is_dropped(self, qtbot):
+        worker = background_reflow.BackgroundReflow()
+        results = []
+        worker.reflowed.connect(results.append)
+        with qtbot.waitSignal(worker.finished):
+            worker.reflow("first", lambda text: text)
+            worker.reflow("second", lambda text: text)
+        worker.wait_for_done()
+        qtbot.wait(10)
+        assert results == ["second"]
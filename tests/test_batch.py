@@ -0,0 +1,181 @@
+import io
+import os
+import threading
+import time
+
+import pytest
+
+from gce import batch, rendering
+
+COLLECTION = """<?xml version="1.0" encoding="UTF-8"?>
+<collection xmlns="http://www.loc.gov/MARC21/slim">
+  <record>
+    <controlfield tag="001">1001</controlfield>
+  </record>
+  <record>
+    <controlfield tag="001">1002</controlfield>
+  </record>
+  <record>
+    <datafield tag="245" ind1="0" ind2="0">
+      <subfield code="a">No control number</subfield>
+    </datafield>
+  </record>
+</collection>
+"""
+
+
+def record_id_template(jinja_text, xml_text):
+    if jinja_text == "fail":
+        return rendering.RenderResult("bad template", False)
+    return rendering.RenderResult(str(xml_text.count("<record")), True)
+
+
+def misbehaving_template(jinja_text, xml_text):
+    if xml_text == "hang":
+        time.sleep(60)
+    if xml_text == "raise":
+        raise ValueError("spam")
+    if xml_text == "exit":
+        os._exit(1)
+    return rendering.RenderResult("ok", True)
+
+
+def render_all(records, **kwargs):
+    return sorted(
+        result
+        for chunk in batch.render_records(
+            "spam",
+            records,
+            max_workers=1,
+            chunk_size=1,
+            render_strategy=misbehaving_template,
+            **kwargs,
+        )
+        for result in chunk
+    )
+
+
+class TestIterMarcRecords:
+    def test_records_in_collection(self):
+        records = list(
+            batch.iter_marc_records(io.BytesIO(COLLECTION.encode()))
+        )
+        assert [record.record_id for record in records] == [
+            "1001",
+            "1002",
+            "record 3",
+        ]
+        assert [record.position for record in records] == [0, 1, 2]
+
+    def test_single_record(self, tmp_path):
+        xml_file = tmp_path / "record.xml"
+        xml_file.write_text(
+            '<record xmlns="http://www.loc.gov/MARC21/slim">'
+            '<controlfield tag="001">spam</controlfield>'
+            "</record>"
+        )
+        records = list(batch.iter_marc_records(xml_file))
+        assert [record.record_id for record in records] == ["spam"]
+
+    def test_record_xml_keeps_marc_namespace(self):
+        record = next(batch.iter_marc_records(io.BytesIO(COLLECTION.encode())))
+        assert record.xml.startswith(
+            '<record xmlns="http://www.loc.gov/MARC21/slim">'
+        )
+
+    def test_finished_records_are_removed_from_tree(self):
+        records = batch.iter_marc_records(io.BytesIO(COLLECTION.encode()))
+        next(records)
+        second = next(records)
+        assert "1001" not in second.xml
+
+
+class TestRenderRecords:
+    @pytest.fixture
+    def records(self):
+        return [
+            batch.MarcRecord(position, str(position), "<record/>")
+            for position in range(10)
+        ]
+
+    def test_every_record_is_rendered(self, records):
+        results = [
+            result
+            for chunk in batch.render_records(
+                "spam",
+                records,
+                max_workers=2,
+                chunk_size=3,
+                render_strategy=record_id_template,
+            )
+            for result in chunk
+        ]
+        assert sorted(result.position for result in results) == list(range(10))
+        assert all(result.output == "1" for result in results)
+
+    def test_ordered_results(self, records):
+        results = [
+            result.position
+            for chunk in batch.render_records(
+                "spam",
+                records,
+                max_workers=2,
+                chunk_size=3,
+                ordered=True,
+                render_strategy=record_id_template,
+            )
+            for result in chunk
+        ]
+        assert results == list(range(10))
+
+    def test_errors_are_reported_separately(self, records):
+        chunk = next(
+            batch.render_records(
+                "fail", records[:1], render_strategy=record_id_template
+            )
+        )
+        assert chunk == [batch.BatchResult(0, "0", "", "bad template")]
+
+    def test_cancelled(self, records):
+        cancelled = threading.Event()
+        cancelled.set()
+        assert (
+            list(
+                batch.render_records(
+                    "spam",
+                    records,
+                    cancelled=cancelled,
+                    render_strategy=record_id_template,
+                )
+            )
+            == []
+        )
+
+    def test_hung_record_times_out(self):
+        records = [
+            batch.MarcRecord(0, "0", "hang"),
+            batch.MarcRecord(1, "1", "<record/>"),
+        ]
+        assert render_all(records, timeout=500) == [
+            batch.BatchResult(0, "0", "", "render timed out after 500 ms"),
+            batch.BatchResult(1, "1", "ok", ""),
+        ]
+
+    def test_exception_fails_only_its_record(self):
+        records = [
+            batch.MarcRecord(0, "0", "raise"),
+            batch.MarcRecord(1, "1", "<record/>"),
+        ]
+        assert render_all(records, timeout=None) == [
+            batch.BatchResult(0, "0", "", "Unable to render: spam"),
+            batch.BatchResult(1, "1", "ok", ""),
+        ]
+
+    def test_broken_pool_fails_remaining_records(self):
+        records = [
+            batch.MarcRecord(position, str(position), xml)
+            for position, xml in enumerate(["exit", "<record/>", "<record/>"])
+        ]
+        results = render_all(records, timeout=None)
+        assert [result.position for result in results] == [0, 1, 2]
+        assert results[0].error.startswith("Unable to render: ")
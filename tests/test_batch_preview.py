@@ -0,0 +1,53 @@
+import pytest
+from PySide6 import QtCore
+
+import gce.batch
+from gce import batch_preview, rendering
+
+
+class TestBatchPreview:
+    @pytest.fixture
+    def collection_file(self, tmp_path):
+        collection_file = tmp_path / "collection.xml"
+        collection_file.write_text(
+            '<collection xmlns="http://www.loc.gov/MARC21/slim">'
+            + "".join(
+                f'<record><controlfield tag="001">{i}</controlfield></record>'
+                for i in range(5)
+            )
+            + "</collection>"
+        )
+        return collection_file
+
+    def test_model_adds_rows(self, qtbot):
+        model = batch_preview.BatchPreviewModel()
+        with qtbot.waitSignal(model.rowsInserted):
+            model.add_results([
+                gce.batch.BatchResult(3, "spam", "output", ""),
+            ])
+        assert model.rowCount() == 1
+        assert model.data(model.index(0, 1)) == "output"
+        assert model.headerData(0, QtCore.Qt.Orientation.Vertical) == "4"
+
+    def test_runner_renders_collection(self, qtbot, collection_file):
+        runner = batch_preview.BatchPreviewRunner(
+            render_strategy=echo_template
+        )
+        results = []
+        runner.results_ready.connect(results.extend)
+        with qtbot.waitSignal(runner.finished, timeout=30000):
+            runner.start("spam", collection_file)
+        assert sorted(result.record_id for result in results) == [
+            str(i) for i in range(5)
+        ]
+
+    def test_runner_reports_unreadable_file(self, qtbot, tmp_path):
+        runner = batch_preview.BatchPreviewRunner(
+            render_strategy=echo_template
+        )
+        with qtbot.waitSignal(runner.failed, timeout=30000):
+            runner.start("spam", tmp_path / "missing.xml")
+
+
+def echo_template(jinja_text, xml_text):
+    return rendering.RenderResult(jinja_text, True)
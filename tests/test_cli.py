@@ -0,0 +1,124 @@
+import io
+import json
+
+import pytest
+
+from gce import batch, cli, rendering
+
+CONFIG = """
+[mappings]
+identifier_key = "Bibliographic Identifier"
+
+[[mapping]]
+key = "Uniform Title"
+matching_marc_fields = ["240$a"]
+delimiter = "||"
+existing_data = "keep"
+
+[[mapping]]
+key = "Associated Entities"
+serialize_method = "jinja2template"
+delimiter = "||"
+existing_data = "replace"
+jinja_template = "{{ fields['700'] }}"
+"""
+
+
+def echo_template(jinja_text, xml_text):
+    return rendering.RenderResult(jinja_text, True)
+
+
+@pytest.fixture
+def config_file(tmp_path):
+    config_file = tmp_path / "config.toml"
+    config_file.write_text(CONFIG)
+    return config_file
+
+
+@pytest.fixture
+def collection_file(tmp_path):
+    collection_file = tmp_path / "collection.xml"
+    collection_file.write_text(
+        '<collection xmlns="http://www.loc.gov/MARC21/slim">'
+        '<record><controlfield tag="001">1</controlfield></record>'
+        '<record><controlfield tag="001">2</controlfield></record>'
+        "</collection>"
+    )
+    return collection_file
+
+
+class TestReadMappingTemplate:
+    def test_template_of_mapping(self, config_file):
+        assert (
+            cli.read_mapping_template(config_file, "Associated Entities")
+            == "{{ fields['700'] }}"
+        )
+
+    def test_mapping_without_template(self, config_file):
+        with pytest.raises(cli.MappingNotFoundError):
+            cli.read_mapping_template(config_file, "Uniform Title")
+
+
+class TestWriters:
+    def test_json_lines(self):
+        stream = io.StringIO()
+        writer = cli.JsonLinesWriter(stream)
+        writer.write("a.xml", batch.BatchResult(0, "1", "spam", ""))
+        assert json.loads(stream.getvalue()) == {
+            "file": "a.xml",
+            "position": 0,
+            "record_id": "1",
+            "output": "spam",
+            "error": "",
+        }
+
+    def test_csv(self):
+        stream = io.StringIO()
+        writer = cli.CsvWriter(stream)
+        writer.write("a.xml", batch.BatchResult(0, "1", "spam", ""))
+        assert stream.getvalue().splitlines() == [
+            "file,position,record_id,output,error",
+            "a.xml,0,1,spam,",
+        ]
+
+
+def test_render_files_in_order(collection_file):
+    stream = io.StringIO()
+    errors = cli.render_files(
+        "spam",
+        [collection_file, collection_file],
+        cli.JsonLinesWriter(stream),
+        jobs=2,
+        chunk_size=1,
+        render_strategy=echo_template,
+    )
+    rows = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert [row["record_id"] for row in rows] == ["1", "2", "1", "2"]
+    assert errors == 0
+
+
+def test_config_requires_mapping(config_file, collection_file):
+    with pytest.raises(SystemExit):
+        cli.main(["--config", str(config_file), str(collection_file)])
+
+
+def test_unknown_mapping_is_an_error(config_file, collection_file, capsys):
+    exit_code = cli.main([
+        "--config",
+        str(config_file),
+        "--mapping",
+        "spam",
+        str(collection_file),
+    ])
+    assert exit_code == 2
+    assert 'No mapping with key "spam"' in capsys.readouterr().err
+
+
+@pytest.mark.parametrize(
+    "kwargs, usage",
+    [({}, "usage: gce-cli"), ({"prog": "gce render"}, "usage: gce render")],
+)
+def test_usage_names_the_command(kwargs, usage, capsys):
+    with pytest.raises(SystemExit):
+        cli.main(["--help"], **kwargs)
+    assert capsys.readouterr().out.startswith(usage)
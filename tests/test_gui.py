@@ -2,18 +2,27 @@ import io
 import logging
 import os
 import pathlib
+import threading
+import time
 import xml
-from unittest.mock import Mock, ANY, MagicMock, patch, mock_open
+from unittest.mock import Mock, ANY, call, patch, mock_open
 
 import galatea.merge_data
 import pygments.lexer
 import pygments.style
+import pygments.styles
 import pytest
 from PySide6 import QtWidgets, QtCore, QtTest, QtGui
 
 import gce.gui
 import gce.models
 import gce.actions
+import gce.lexing
+import gce.batch
+import gce.preview
+import gce.record_file
+import gce.reflow
+import gce.rendering
 from gce import gui
 
 
@@ -24,6 +33,18 @@ class TestJinjaEditorDialog:
         with qtbot.waitSignal(dialog.rejected):
             dialog.button_box.button(QtWidgets.QDialogButtonBox.Close).click()
 
+    def test_opens_batch_preview(self, qtbot):
+        dialog = gui.JinjaEditorDialog()
+        qtbot.addWidget(dialog)
+        dialog.jina_text = "{{ spam }}"
+        preview = dialog.show_batch_preview()
+        assert preview.jinja_text == "{{ spam }}"
+        preview.close()
+
+
+def echo_template(jinja_text, xml_text):
+    return gce.rendering.RenderResult(jinja_text, True)
+
 
 class TestJinjaEditor:
     def test_xml_text_changed_signal_emitted(self, qtbot):
@@ -67,6 +88,152 @@ class TestJinjaEditor:
         editor.jina_text = "{{ fields['001'] }}"
         editor.update_output.assert_called()
 
+    def test_output_shows_latest_render(self, qtbot):
+        editor = gui.JinjaEditor()
+        qtbot.addWidget(editor)
+        editor.render_scheduler.delay = 0
+        editor.render_scheduler.render_strategy = echo_template
+        editor.jina_text = "first"
+        editor.jina_text = "second"
+        qtbot.waitUntil(lambda: editor.output_text == "second")
+
+    def test_bad_bytes_are_shown_in_status_bar(self, qtbot, tmp_path):
+        editor = gui.JinjaEditor()
+        qtbot.addWidget(editor)
+        xml_file = tmp_path / "record.xml"
+        xml_file.write_bytes(b"<a>\xff</a>")
+        viewer = editor._widgets.xml_text_edit_widget
+        with qtbot.waitSignal(viewer.file_loader.finished):
+            viewer.load_file(str(xml_file))
+        message = editor._widgets.status_bar.currentMessage()
+        assert "record.xml" in message
+        assert "byte 3" in message
+
+    def test_failed_load_is_shown_in_status_bar(self, qtbot, tmp_path):
+        editor = gui.JinjaEditor()
+        qtbot.addWidget(editor)
+        viewer = editor._widgets.xml_text_edit_widget
+        with qtbot.waitSignal(viewer.file_loader.finished):
+            viewer.load_file(str(tmp_path / "missing.xml"))
+        assert editor._widgets.status_bar.currentMessage().startswith(
+            "Unable to read missing.xml."
+        )
+
+
+class TestLargeDocumentMode:
+    @pytest.fixture
+    def editor(self, qtbot):
+        editor = gui.JinjaEditor()
+        qtbot.addWidget(editor)
+        thresholds = gui.LargeDocumentThresholds(characters=1000, lines=10)
+        editor._widgets.xml_text_edit_widget.large_document_thresholds = (
+            thresholds
+        )
+        editor._widgets.jinja_expression.large_document_thresholds = thresholds
+        editor.render_scheduler.delay = 0
+        editor.render_scheduler.render_strategy = Mock(
+            return_value=gui.RenderResult("rendered", True)
+        )
+        return editor
+
+    def test_large_document_pauses_live_rendering(self, qtbot, editor):
+        editor.xml_text = "<a/>\n" * 20
+        editor.jina_text = "{{ 1 }}"
+        qtbot.wait(50)
+        render_calls = editor.render_scheduler.render_strategy.call_args_list
+        assert call("{{ 1 }}", "<a/>\n" * 20) not in render_calls
+        assert editor.live_rendering_paused is True
+        message = editor._widgets.status_bar.currentMessage()
+        assert "live rendering" in message
+        assert "undo" in message
+
+    def test_render_button_renders_on_demand(self, qtbot, editor):
+        editor.xml_text = "<a/>\n" * 20
+        assert editor._widgets.render_button.isHidden() is False
+        with qtbot.waitSignal(editor.render_scheduler.rendered):
+            qtbot.mouseClick(
+                editor._widgets.render_button,
+                QtCore.Qt.MouseButton.LeftButton,
+            )
+        assert editor.output_text == "rendered"
+
+    def test_small_document_resumes_live_rendering(self, qtbot, editor):
+        editor.xml_text = "<a/>\n" * 20
+        with qtbot.waitSignal(editor.render_scheduler.rendered):
+            editor.xml_text = "<a/>"
+        assert editor._widgets.status_bar.currentMessage() == ""
+        assert editor._widgets.render_button.isHidden() is True
+
+    def test_large_expression_pauses_live_rendering(self, editor):
+        editor.jina_text = "{{ 1 }}" * 200
+        assert editor._widgets.jinja_expression.large_document_mode is True
+        assert "expression highlighting" in (
+            editor._widgets.status_bar.currentMessage()
+        )
+
+
+class TestXMLViewerLargeDocumentMode:
+    @pytest.fixture
+    def viewer(self, qtbot):
+        viewer = gui.XMLViewer()
+        qtbot.addWidget(viewer)
+        viewer.pygments_style = "default"
+        viewer.large_document_thresholds = gui.LargeDocumentThresholds(
+            characters=100_000, lines=100
+        )
+        return viewer
+
+    def test_features_suspended(self, qtbot, viewer):
+        with qtbot.waitSignal(viewer.large_document_mode_changed) as blocker:
+            viewer.setPlainText("<a/>\n" * 200)
+        assert blocker.args == [True]
+        assert viewer.isReadOnly() is True
+        assert viewer.document().isUndoRedoEnabled() is False
+        assert viewer._highlighter.document() is None
+
+    def test_features_restored(self, viewer):
+        viewer.setPlainText("<a/>\n" * 200)
+        viewer.setPlainText("<a/>")
+        assert viewer.large_document_mode is False
+        assert viewer.isReadOnly() is False
+        assert viewer.document().isUndoRedoEnabled() is True
+        assert viewer._highlighter.document() is viewer.document()
+
+    def test_character_threshold(self, viewer):
+        viewer.setPlainText("x" * 100_001)
+        assert viewer.large_document_mode is True
+
+    def test_only_visible_blocks_highlighted(self, qtbot, viewer):
+        viewer.resize(400, 300)
+        viewer.show()
+        viewer.setPlainText("<a/>\n" * 200)
+        qtbot.waitUntil(
+            lambda: bool(viewer.firstVisibleBlock().layout().formats())
+        )
+        last_block = viewer.document().lastBlock().previous()
+        assert last_block.layout().formats() == []
+
+    def test_visible_blocks_carry_lexer_state(self, qtbot, viewer):
+        viewer.resize(400, 300)
+        viewer.show()
+        viewer.setPlainText("<!-- a\nb -->\n" + "<a/>\n" * 200)
+        second_block = viewer.document().findBlockByNumber(1)
+        qtbot.waitUntil(lambda: bool(second_block.layout().formats()))
+        first_format = viewer.document().firstBlock().layout().formats()[0]
+        assert second_block.layout().formats()[0].format == (
+            first_format.format
+        )
+
+    def test_stays_restricted_after_large_load(self, qtbot, viewer):
+        viewer.file_loader.read_strategy = lambda _, **__: iter([
+            ("<a/>\n" * 200, 1, 1)
+        ])
+        with qtbot.waitSignal(viewer.file_loader.loaded):
+            viewer.load_file("large.xml")
+        assert viewer.large_document_mode is True
+        assert viewer.isReadOnly() is True
+        assert viewer._highlighter.document() is None
+
 
 class TestLineEditSyntaxHighlighting:
     def test_size_hint(self, qtbot):
@@ -134,6 +301,58 @@ class TestPygmentsHighlighter:
             )
         assert spy.count() == 1
 
+    @pytest.fixture
+    def xml_editor(self, qtbot):
+        # Highlighting needs the layout a text edit gives its document
+        editor = QtWidgets.QPlainTextEdit()
+        qtbot.addWidget(editor)
+        editor.highlighter = gui.PygmentsHighlighter(editor.document())
+        editor.highlighter.style = pygments.styles.get_style_by_name("default")
+        editor.highlighter.lexer = gce.lexing.get_lexer_by_name("xml")
+        return editor
+
+    def test_multi_line_comment_highlighted(self, xml_editor):
+        xml_editor.setPlainText("<!-- one -->\n<!-- two\nthree -->\n<a/>")
+        document = xml_editor.document()
+        first_formats = document.firstBlock().layout().formats()
+        third_formats = document.findBlockByNumber(2).layout().formats()
+        assert [
+            (format_range.length, format_range.format)
+            for format_range in third_formats
+        ] == [(len("three -->"), first_formats[0].format)]
+
+    def test_edit_relexes_only_while_state_changes(self, xml_editor):
+        xml_editor.setPlainText("<a/>\n" * 20)
+        cache = xml_editor.highlighter.token_cache
+
+        def lines_lexed():
+            info = cache.cache_info()
+            return info.hits + info.misses
+
+        before = lines_lexed()
+        cursor = QtGui.QTextCursor(xml_editor.document())
+        cursor.insertText("<b/>")
+        assert lines_lexed() - before == 1
+
+        before = lines_lexed()
+        cursor.insertText("<!--")
+        assert lines_lexed() - before == xml_editor.blockCount()
+
+    def test_style_change_reuses_tokens(self, xml_editor):
+        xml_editor.setPlainText("<a>text</a>\n" * 20)
+        cache = xml_editor.highlighter.token_cache
+        before = cache.cache_info()
+        first_block = xml_editor.document().firstBlock()
+        default_formats = first_block.layout().formats()
+
+        xml_editor.highlighter.style = pygments.styles.get_style_by_name(
+            "monokai"
+        )
+        after = cache.cache_info()
+        assert after.misses == before.misses
+        assert after.hits - before.hits == xml_editor.blockCount()
+        assert first_block.layout().formats() != default_formats
+
 
 class TestJinjaRenderer:
     @pytest.fixture
@@ -234,14 +453,66 @@ class TestMainWindow:
         starting_model = gce.models.TomlModel()
         starting_model.add_top_level_config("bacon", "eggs")
         mw.load_toml_strategy = lambda _: starting_model
-        mw.toml_file = "dummy.toml"
+        with qtbot.waitSignal(mw.toml_loader.finished):
+            mw.toml_file = "dummy.toml"
+        model = mw.toml_view.model()
+        model.setData(model.index(0, 1), "spam")
+        assert model.is_modified is True
         with qtbot.waitSignal(mw.save_file_requested):
-            mw.is_model_data_different_than_file = lambda *_: True
-            mw.toml_view.model().setData(
-                mw.toml_view.model().index(0, 1), "spam"
-            )
             mw.save_action.trigger()
 
+    @pytest.fixture
+    def window_loading_second_file(self, qtbot):
+        mw = gui.MainWindow()
+        qtbot.addWidget(mw)
+        first_model = gce.models.TomlModel()
+        first_model.add_top_level_config("bacon", "eggs")
+        mw.load_toml_strategy = lambda _: first_model
+        with qtbot.waitSignal(mw.toml_loader.finished):
+            mw.toml_file = "a.toml"
+        first_model.setData(first_model.index(0, 1), "spam")
+
+        release = threading.Event()
+        second_model = gce.models.TomlModel()
+
+        def slow_load(_):
+            release.wait(5)
+            return second_model
+
+        mw.load_toml_strategy = slow_load
+        mw.toml_file = "b.toml"
+        yield mw, release
+        release.set()
+        mw.toml_loader.wait_for_done()
+
+    def test_save_during_load_writes_shown_file(
+        self, qtbot, window_loading_second_file
+    ):
+        mw, _ = window_loading_second_file
+        assert mw.toml_file == "a.toml"
+        assert mw.windowTitle() == "TOML Editor: a.toml (Unsaved)"
+        with qtbot.waitSignal(mw.save_file_requested) as blocker:
+            mw.save_action.trigger()
+        assert blocker.args[0].toLocalFile() == "a.toml"
+
+    def test_file_changes_once_loaded(self, qtbot, window_loading_second_file):
+        mw, release = window_loading_second_file
+        with qtbot.waitSignal(mw.toml_loader.loaded):
+            release.set()
+        assert mw.toml_file == "b.toml"
+        assert mw.windowTitle() == "TOML Editor: b.toml"
+
+    def test_cancelled_load_updates_window(
+        self, qtbot, window_loading_second_file
+    ):
+        mw, _ = window_loading_second_file
+        mw.setWindowTitle("TOML Editor")
+        with qtbot.waitSignal(mw.toml_loader.cancelled):
+            mw.toml_loader.cancel()
+        assert mw.toml_file == "a.toml"
+        assert mw.windowTitle() == "TOML Editor: a.toml (Unsaved)"
+        assert mw.save_action.isEnabled() is True
+
     def test_state_no_file_means_save_is_disabled(self, qtbot):
         mw = gui.MainWindow()
         qtbot.addWidget(mw)
@@ -252,7 +523,8 @@ class TestMainWindow:
         qtbot.addWidget(mw)
 
         mw.load_toml_strategy = Mock(return_value=gui.models.TomlModel())
-        mw.toml_file = "goodfile.toml"
+        with qtbot.waitSignal(mw.toml_loader.finished):
+            mw.toml_file = "goodfile.toml"
         assert not isinstance(mw.state, gui.NoDocumentLoadedState)
 
         mw.load_toml_strategy = Mock(
@@ -260,7 +532,8 @@ class TestMainWindow:
                 source_file="badfile.toml"
             )
         )
-        mw.toml_file = "badfile.toml"
+        with qtbot.waitSignal(mw.toml_loader.finished):
+            mw.toml_file = "badfile.toml"
         assert isinstance(mw.state, gui.NoDocumentLoadedState)
 
     def test_set_toml_file_with_error_writes_to_error(self, qtbot):
@@ -281,22 +554,24 @@ class TestMainWindow:
         qtbot.addWidget(mw)
         assert mw.save_action.isEnabled() is False
         mw.load_toml_strategy = lambda _: gce.models.TomlModel()
-        mw.toml_file = "dummy.toml"
+        with qtbot.waitSignal(mw.toml_loader.finished):
+            mw.toml_file = "dummy.toml"
         assert mw.save_action.isEnabled() is False
 
     def test_loading_toml_file_editing_has_enables_save(self, qtbot):
         mw = gui.MainWindow()
         qtbot.addWidget(mw)
-        mw.is_model_data_different_than_file = lambda *_: False
         assert mw.save_action.isEnabled() is False
         dummy = gce.models.TomlModel()
         dummy.add_top_level_config("spam", "bacon")
         mw.load_toml_strategy = lambda _: dummy
-        mw.toml_file = "dummy.toml"
+        with qtbot.waitSignal(mw.toml_loader.finished):
+            mw.toml_file = "dummy.toml"
         model = mw.toml_view.model()
-        mw.is_model_data_different_than_file = lambda *_: True
+        assert model.is_modified is False
         with qtbot.waitSignal(model.dataChanged):
             assert model.setData(model.index(0, 1), "eggs")
+        assert model.is_modified is True
         assert mw.save_action.isEnabled() is True
 
     def test_loading_bad_file_while_have_working_one(self, qtbot):
@@ -306,29 +581,18 @@ class TestMainWindow:
         load_good_data = gce.models.TomlModel()
         load_good_data.add_top_level_config("spam", "bacon")
         mw.load_toml_strategy = lambda _: load_good_data
-        mw.toml_file = "spam.toml"
+        with qtbot.waitSignal(mw.toml_loader.finished):
+            mw.toml_file = "spam.toml"
         assert mw.toml_view.model().rowCount() == 2
 
         def load_bad_data(toml_file: pathlib.Path):
             raise galatea.merge_data.BadMappingFileError(source_file=toml_file)
 
         mw.load_toml_strategy = load_bad_data
-        mw.toml_file = "bad_data.toml"
+        with qtbot.waitSignal(mw.toml_loader.finished):
+            mw.toml_file = "bad_data.toml"
         assert mw.toml_view.model() is None
 
-    @patch(
-        "pathlib.Path.open", new_callable=mock_open, read_data="mocked content"
-    )
-    def test_is_model_data_different_than_file(self, mock_file_open, qtbot):
-        mw = gui.MainWindow()
-        qtbot.addWidget(mw)
-        model = Mock()
-        comparison_strategy = Mock()
-        mw.is_model_data_different_than_file(
-            pathlib.Path("something.toml"), model, comparison_strategy
-        )
-        comparison_strategy.assert_called_once_with("mocked content", model)
-
     def test_write_to_file_calls_state_method(self, qtbot):
         mw = gui.MainWindow()
         qtbot.addWidget(mw)
@@ -457,22 +721,30 @@ class TestFileLoadedModifiedState:
 
 
 class TestStateUtility:
-    def test_set_toml_file_success_changes_state_to_unmodified(self):
+    def test_set_toml_file_starts_loading_in_background(self):
         main_window = Mock()
         toml_file = pathlib.Path("somefile")
         gce.gui.StateUtility.set_toml_file(main_window, toml_file)
+        main_window.toml_loader.load.assert_called_once_with(
+            toml_file, main_window.load_toml_strategy
+        )
+
+    def test_toml_file_loaded_changes_state_to_unmodified(self):
+        main_window = Mock()
+        toml_file = pathlib.Path("somefile")
+        gce.gui.StateUtility.toml_file_loaded(main_window, toml_file, Mock())
         assert isinstance(main_window.state, gce.gui.FileLoadedUnmodifiedState)
 
-    def test_set_toml_file_unsuccess_changes_state_to_no_document_loaded(self):
-        main_window = Mock(
-            load_toml_strategy=Mock(
-                side_effect=galatea.merge_data.BadMappingDataError(
-                    details="something went wrong"
-                )
-            )
-        )
+    def test_toml_file_load_failed_changes_state_to_no_document_loaded(self):
+        main_window = Mock()
         toml_file = pathlib.Path("somefile")
-        gce.gui.StateUtility.set_toml_file(main_window, toml_file)
+        gce.gui.StateUtility.toml_file_load_failed(
+            main_window,
+            toml_file,
+            galatea.merge_data.BadMappingDataError(
+                details="something went wrong"
+            ),
+        )
         assert isinstance(main_window.state, gce.gui.NoDocumentLoadedState)
 
     def test_update_window_with_no_model_sets_window_title_to_default(self):
@@ -487,21 +759,71 @@ class TestStateUtility:
         assert isinstance(main_window.state, gce.gui.FileLoadedUnmodifiedState)
 
     def test_update_window_changes_set_to_modified_state(self):
-        main_window = Mock(toml_file="dummy.toml")
-        main_window.is_model_data_different_than_file = lambda *_: True
-        toml_model = Mock()
+        main_window = Mock(toml_file="dummy.toml", unsaved_changes=True)
+        toml_model = Mock(is_modified=True)
         gce.gui.StateUtility.update_window(main_window, toml_model)
         assert isinstance(main_window.state, gce.gui.FileLoadedModifiedState)
 
 
-def test_write_toml():
-    file_path = Mock(open=MagicMock(), spec_set=pathlib.Path)
+def test_write_toml(tmp_path):
+    file_path = tmp_path / "config.toml"
     model = Mock()
-    serialization_strategy = Mock()
+    serialization_strategy = Mock(return_value="[mappings]\n")
     gce.gui.write_toml(
         file_path, model, serialization_strategy=serialization_strategy
     )
     serialization_strategy.assert_called_once_with(model)
+    assert file_path.read_text() == "[mappings]\n"
+
+
+class TestMainWindowClose:
+    @pytest.fixture
+    def main_window(self, qtbot, tmp_path):
+        main_window = gui.MainWindow()
+        qtbot.addWidget(main_window)
+        model = gce.models.TomlModel()
+        model.add_top_level_config("spam", "bacon")
+        main_window.load_toml_strategy = lambda _: model
+        with qtbot.waitSignal(main_window.toml_loader.finished):
+            main_window.toml_file = str(tmp_path / "config.toml")
+        model.setData(model.index(0, 1), "eggs")
+        main_window.show()
+        return main_window
+
+    def test_close_waits_for_pending_save(self, main_window, tmp_path):
+        written = []
+
+        def slow_write(file, text):
+            time.sleep(0.2)
+            written.append(file)
+
+        main_window.toml_writer.write_strategy = slow_write
+        main_window.write_to_file(
+            tmp_path / "config.toml", main_window.toml_view.model()
+        )
+        assert main_window.toml_writer.is_saving is True
+        assert main_window.close() is True
+        assert written == [tmp_path / "config.toml"]
+        assert main_window.toml_writer.is_saving is False
+        assert main_window.toml_view.model().is_modified is False
+
+    def test_failed_save_asks_before_closing(self, main_window, tmp_path):
+        main_window.toml_writer.write_strategy = Mock(
+            side_effect=OSError("disk full")
+        )
+        main_window.confirm_strategy = Mock(return_value=False)
+        main_window.write_to_file(
+            tmp_path / "config.toml", main_window.toml_view.model()
+        )
+        assert main_window.close() is False
+        assert main_window.isVisible() is True
+        message = main_window.confirm_strategy.call_args.args[1]
+        assert "disk full" in message
+
+    def test_close_without_pending_save_does_not_wait(self, main_window):
+        main_window.toml_writer.finish_pending_saves = Mock()
+        assert main_window.close() is True
+        main_window.toml_writer.finish_pending_saves.assert_not_called()
 
 
 @patch("pathlib.Path.open", new_callable=mock_open, read_data="mocked content")
@@ -525,6 +847,14 @@ def test_load_toml_bad_mapping_data_passes_to_bad_mapping_file(mock_file_open):
     assert error.value.source == pathlib.Path("somefile")
 
 
+def test_xml_viewer_keeps_markup_as_plain_text(qtbot):
+    viewer = gce.gui.XMLViewer()
+    qtbot.addWidget(viewer)
+    viewer.setText("<html><b>not bold</b></html>")
+    assert viewer.toPlainText() == "<html><b>not bold</b></html>"
+    assert viewer.document().blockCount() == 1
+
+
 @pytest.mark.parametrize("text,expected", [("", False), ("something", True)])
 def test_xml_text_box_context_menu_flow_enable_only_when_xml_data(
     qtbot, text, expected
@@ -554,20 +884,155 @@ def test_xml_text_box_context_menu_flow_enable_only_when_xml_data(
 
 
 @pytest.mark.parametrize(
-    "dialog_return_data, set_text_called",
+    "dialog_return_data, load_file_called",
     [
         ("somefileName", True),
         (None, False),
     ],
 )
-def test_load_xml_view_file_data_sets_text(
-    dialog_return_data, set_text_called
+def test_load_xml_view_file_data_loads_file(
+    dialog_return_data, load_file_called
 ):
     viewer = Mock(spec_set=gui.XMLViewer)
     file_dialog_strategy = Mock(return_value=(dialog_return_data, ""))
-    with patch("builtins.open"):
-        gui.load_xml_view_file_data(viewer, file_dialog_strategy)
-    assert viewer.setText.called is set_text_called
+    gui.load_xml_view_file_data(viewer, file_dialog_strategy)
+    assert viewer.load_file.called is load_file_called
+
+
+@pytest.fixture
+def record_cache_dir(tmp_path, monkeypatch):
+    path = str(tmp_path / "cache")
+    monkeypatch.setattr(gce.record_file, "default_cache_dir", lambda: path)
+    return path
+
+
+@pytest.mark.usefixtures("record_cache_dir")
+class TestOpenCollection:
+    @pytest.fixture
+    def viewer(self, qtbot, monkeypatch):
+        monkeypatch.setattr(gui, "COLLECTION_MODE_FILE_SIZE", 1)
+        viewer = gui.XMLViewer()
+        qtbot.addWidget(viewer)
+        return viewer
+
+    def test_large_files_open_as_collection(self, qtbot, tmp_path, viewer):
+        collection = tmp_path / "collection.xml"
+        collection.write_text(
+            "<collection><record><leader/></record></collection>"
+        )
+        with qtbot.waitSignal(viewer.file_loader.finished):
+            gui.load_xml_view_file_data(
+                viewer, Mock(return_value=(str(collection), ""))
+            )
+        assert viewer.in_collection_mode is True
+        assert viewer.toPlainText() == "<record><leader/></record>"
+
+    def test_large_file_without_records_is_shown_as_text(
+        self, qtbot, tmp_path, viewer
+    ):
+        data = tmp_path / "data.xml"
+        data.write_text("<catalog><item/></catalog>")
+        with qtbot.waitSignal(viewer.file_loader.finished):
+            gui.load_xml_view_file_data(
+                viewer, Mock(return_value=(str(data), ""))
+            )
+        assert viewer.in_collection_mode is False
+        assert viewer.toPlainText() == "<catalog><item/></catalog>"
+
+    def test_collection_without_records_stays_a_collection(
+        self, qtbot, tmp_path, viewer
+    ):
+        data = tmp_path / "data.xml"
+        data.write_text("<catalog><item/></catalog>")
+        with qtbot.waitSignal(viewer.file_loader.finished):
+            gui.open_collection(viewer, str(data))
+        assert viewer.in_collection_mode is True
+        assert viewer.toPlainText() == ""
+
+    def test_scan_runs_in_background(self, qtbot, tmp_path, viewer):
+        collection = tmp_path / "collection.xml"
+        collection.write_text("<collection><record/></collection>")
+        threads = []
+
+        def open_records(file_name):
+            threads.append(threading.current_thread())
+            return gce.record_file.RecordFile.open(file_name)
+
+        viewer.file_loader.open_strategy = open_records
+        with qtbot.waitSignal(viewer.file_loader.loaded):
+            viewer.open_collection(str(collection))
+        assert threads and threads[0] is not threading.main_thread()
+
+    def test_missing_collection_fails(self, qtbot, tmp_path, viewer):
+        with qtbot.waitSignal(viewer.file_loader.failed) as blocker:
+            viewer.open_collection(str(tmp_path / "missing.xml"))
+        assert isinstance(blocker.args[1], OSError)
+        assert viewer.in_collection_mode is False
+
+
+@pytest.mark.usefixtures("record_cache_dir")
+class TestRecordNavigator:
+    @pytest.fixture
+    def collection(self, tmp_path):
+        path = tmp_path / "collection.xml"
+        path.write_text(
+            "<collection>"
+            + "".join(
+                f'<record><controlfield tag="001">{number}</controlfield>'
+                "</record>"
+                for number in ["a1", "b2", "c3"]
+            )
+            + "</collection>"
+        )
+        return str(path)
+
+    @pytest.fixture
+    def editor(self, qtbot, collection):
+        editor = gui._JinjaEditor()
+        qtbot.addWidget(editor)
+        viewer = editor.xml_text_edit_widget
+        with qtbot.waitSignal(viewer.file_loader.finished):
+            viewer.open_collection(collection)
+        return editor
+
+    def test_shows_first_record(self, editor):
+        assert "a1" in editor.xml_text_edit_widget.toPlainText()
+        assert (
+            editor.record_navigator.position_label.text()
+            == "Record 1 of 3 (a1)"
+        )
+
+    def test_next_and_previous(self, qtbot, editor):
+        navigator = editor.record_navigator
+        assert navigator.previous_button.isEnabled() is False
+        qtbot.mouseClick(
+            navigator.next_button, QtCore.Qt.MouseButton.LeftButton
+        )
+        qtbot.mouseClick(
+            navigator.next_button, QtCore.Qt.MouseButton.LeftButton
+        )
+        assert "c3" in editor.xml_text_edit_widget.toPlainText()
+        assert navigator.next_button.isEnabled() is False
+        qtbot.mouseClick(
+            navigator.previous_button, QtCore.Qt.MouseButton.LeftButton
+        )
+        assert "b2" in editor.xml_text_edit_widget.toPlainText()
+
+    def test_jump_to_control_number(self, editor):
+        editor.record_navigator.control_number.setText("c3")
+        editor.record_navigator.jump()
+        assert editor.xml_text_edit_widget.record_position == 2
+
+    def test_jump_to_missing_control_number(self, editor):
+        editor.record_navigator.control_number.setText("zz")
+        editor.record_navigator.jump()
+        assert editor.xml_text_edit_widget.record_position == 0
+        assert "zz" in editor.record_navigator.position_label.text()
+
+    def test_close_collection(self, editor):
+        editor.xml_text_edit_widget.close_collection()
+        assert editor.xml_text_edit_widget.in_collection_mode is False
+        assert editor.record_navigator.isHidden() is True
 
 
 @pytest.mark.parametrize(
@@ -600,6 +1065,52 @@ def test_reflow_xml_logs_expat_error(qtbot, caplog):
     assert caplog.records[0].levelname == "ERROR"
 
 
+class TestXMLViewerReflow:
+    def test_reflow_in_background_sets_text(self, qtbot):
+        viewer = gce.gui.XMLViewer()
+        qtbot.addWidget(viewer)
+        viewer.setPlainText("<a><b/></a>")
+        with qtbot.waitSignal(viewer.reflow_worker.finished):
+            viewer.reflow_data_strategy(viewer)
+        assert viewer.toPlainText().splitlines()[1:] == [
+            "<a>",
+            "    <b/>",
+            "</a>",
+        ]
+
+    def test_edits_during_reflow_are_kept(self, qtbot):
+        viewer = gce.gui.XMLViewer()
+        qtbot.addWidget(viewer)
+        viewer.setPlainText("<a/>")
+        with qtbot.waitSignal(viewer.reflow_worker.finished):
+            gce.gui.reflow_xml_data_in_background(
+                viewer, reflow_strategy=lambda text: "reflowed"
+            )
+            viewer.setPlainText("<edited/>")
+        assert viewer.toPlainText() == "<edited/>"
+
+    def test_reflow_error_is_logged(self, qtbot, caplog):
+        caplog.set_level(logging.ERROR)
+        viewer = gce.gui.XMLViewer()
+        qtbot.addWidget(viewer)
+        viewer.setPlainText("not xml")
+        with qtbot.waitSignal(viewer.reflow_worker.finished):
+            viewer.reflow_data_strategy(viewer)
+        assert viewer.toPlainText() == "not xml"
+        assert caplog.records[0].levelname == "ERROR"
+
+    def test_unexpected_error_ends_reflow(self, qtbot):
+        viewer = gce.gui.XMLViewer()
+        qtbot.addWidget(viewer)
+        viewer.setPlainText("<a/>")
+        with qtbot.waitSignal(viewer.reflow_worker.failed) as blocker:
+            gce.gui.reflow_xml_data_in_background(
+                viewer, reflow_strategy=Mock(side_effect=UnicodeError("x"))
+            )
+        assert isinstance(blocker.args[0], UnicodeError)
+        assert viewer.reflow_worker.is_busy is False
+
+
 def test_reflow_xml_using_minidom():
     assert (
         gce.gui.reflow_xml_using_minidom("<xml> </xml>")
@@ -0,0 +1,220 @@
+import pygments.lexers
+import pytest
+from pygments.token import Comment, _TokenType
+
+from gce import lexing
+
+DOCUMENTS = [
+    (
+        "xml",
+        '<?xml version="1.0"\n?>\n'
+        '<a x="1"\n  y="2\n 3"><!-- c\n-still -->\n'
+        "<![CDATA[ a\n] b ]]>\n<b>t</b></a>",
+    ),
+    (
+        "jinja",
+        "{% for x in\n  fields %}\n{{ x\n }} {# c\n d #}\n"
+        "{% raw %}{{\n}}{% endraw %}{% comment %}x\n{y{% endcomment %}\n"
+        "{% endfor %}",
+    ),
+]
+
+
+def token_per_character(tokens):
+    # Lines split tokens up differently, what matters is that every
+    # character ends up with the same token type
+    return [
+        (token_type, character)
+        for _, token_type, value in tokens
+        for character in value
+        if character != "\n"
+    ]
+
+
+@pytest.mark.parametrize("name, document", DOCUMENTS)
+def test_lines_match_whole_document(name, document):
+    lexer = lexing.get_lexer_by_name(name)
+    whole = lexer.get_tokens_unprocessed(f"{document}\n")
+    lines = []
+    stack = lexing.ROOT_STACK
+    for line in document.split("\n"):
+        tokens, stack = lexing.lex_line(lexer, line, stack)
+        lines += tokens
+    assert token_per_character(lines) == token_per_character(whole)
+    assert stack == lexing.ROOT_STACK
+
+
+def test_comment_carries_over_to_next_line():
+    lexer = lexing.get_lexer_by_name("xml")
+    _, stack = lexing.lex_line(lexer, "<a/><!-- open")
+    assert stack == ("root", "comment")
+
+    tokens, stack = lexing.lex_line(lexer, "still -->", stack)
+    assert {token_type for _, token_type, _ in tokens} == {Comment.Multiline}
+    assert stack == lexing.ROOT_STACK
+
+
+def test_tokens_stop_at_end_of_line():
+    lexer = lexing.get_lexer_by_name("xml")
+    tokens, _ = lexing.lex_line(lexer, "<a>text ")
+    assert "".join(value for _, _, value in tokens) == "<a>text "
+
+
+def test_unknown_state_starts_over():
+    lexer = lexing.get_lexer_by_name("xml")
+    tokens, stack = lexing.lex_line(lexer, "<a/>", ("root", "spam"))
+    assert tokens == lexing.lex_line(lexer, "<a/>")[0]
+    assert stack == lexing.ROOT_STACK
+
+
+def test_lexer_without_states():
+    lexer = pygments.lexers.get_lexer_by_name("html+jinja")
+    tokens, stack = lexing.lex_line(lexer, "<p>{{ x }}</p>", ("root", "x"))
+    assert "".join(value for _, _, value in tokens) == "<p>{{ x }}</p>"
+    assert stack == lexing.ROOT_STACK
+
+
+@pytest.mark.parametrize("lexer_class", [lexing.XmlLexer, lexing.JinjaLexer])
+def test_pygments_token_table_layout(lexer_class):
+    # lex_line reads RegexLexer._tokens, which is private to Pygments. A
+    # version that changes it would quietly lose the state carried from
+    # line to line, this catches it.
+    lexer = lexer_class()
+    assert isinstance(lexer._tokens, dict)
+    for rules in lexer._tokens.values():
+        for rexmatch, action, new_state in rules:
+            assert callable(rexmatch)
+            assert (
+                action is None
+                or isinstance(action, _TokenType)
+                or callable(action)
+            )
+            assert (
+                new_state is None
+                or isinstance(new_state, (tuple, int))
+                or new_state == "#push"
+            )
+    assert lexing._token_table(lexer_class) is lexer._tokens
+
+
+@pytest.mark.parametrize("name, document", DOCUMENTS)
+def test_same_tokens_as_pygments(name, document):
+    lexer = lexing.get_lexer_by_name(name)
+    tokendefs = lexing._token_table(type(lexer))
+    stack = lexing.ROOT_STACK
+    for line in document.split("\n"):
+        tokens, end_stack = lexing._regex_tokens(
+            lexer, f"{line}\n", stack, tokendefs
+        )
+        assert tokens == list(
+            lexer.get_tokens_unprocessed(f"{line}\n", stack=stack)
+        )
+        stack = end_stack
+
+
+def test_unexpected_token_table_uses_public_api(monkeypatch):
+    monkeypatch.setattr(lexing, "_token_table", lambda _: None)
+    lexer = lexing.get_lexer_by_name("xml")
+    tokens, stack = lexing.lex_line(lexer, "<!-- c", ("root", "comment"))
+    assert tokens == list(lexer.get_tokens_unprocessed("<!-- c"))
+    assert stack == lexing.ROOT_STACK
+
+
+@pytest.mark.parametrize(
+    "name, lexer_class",
+    [
+        ("xml", lexing.XmlLexer),
+        ("jinja", lexing.JinjaLexer),
+        ("XML", lexing.XmlLexer),
+    ],
+)
+def test_get_lexer_by_name(name, lexer_class):
+    assert isinstance(lexing.get_lexer_by_name(name), lexer_class)
+
+
+def test_get_lexer_by_name_falls_back_to_pygments():
+    lexer = lexing.get_lexer_by_name("python")
+    assert isinstance(lexer, pygments.lexers.PythonLexer)
+
+
+class TestLexerStates:
+    def test_root_is_zero(self):
+        assert lexing.LexerStates().number(lexing.ROOT_STACK) == 0
+
+    def test_round_trip(self):
+        states = lexing.LexerStates()
+        number = states.number(["root", "comment"])
+        assert states.number(("root", "comment")) == number
+        assert states.stack(number) == ("root", "comment")
+        assert len(states) == 2
+
+    @pytest.mark.parametrize("number", [-1, 5])
+    def test_unknown_number_is_root(self, number):
+        assert lexing.LexerStates().stack(number) == lexing.ROOT_STACK
+
+
+class TestTokenCache:
+    @pytest.fixture
+    def lexer(self):
+        return lexing.get_lexer_by_name("xml")
+
+    def test_same_tokens_as_lex_line(self, lexer):
+        cache = lexing.TokenCache()
+        assert cache.lex_line(lexer, "<a>x</a>") == lexing.lex_line(
+            lexer, "<a>x</a>"
+        )
+
+    def test_repeated_line_is_a_hit(self, lexer):
+        cache = lexing.TokenCache()
+        cache.lex_line(lexer, "<a/>")
+        cache.lex_line(lexer, "<a/>")
+        assert cache.cache_info() == lexing.CacheInfo(
+            hits=1, misses=1, maxsize=lexing.TOKEN_CACHE_SIZE, currsize=1
+        )
+        assert cache.cache_info().hit_rate == 0.5
+
+    def test_state_is_part_of_the_key(self, lexer):
+        cache = lexing.TokenCache()
+        cache.lex_line(lexer, "<a/>")
+        tokens, _ = cache.lex_line(lexer, "<a/>", ("root", "comment"))
+        assert {token_type for _, token_type, _ in tokens} == {
+            Comment.Multiline
+        }
+        assert cache.cache_info().misses == 2
+
+    def test_lexer_is_part_of_the_key(self, lexer):
+        cache = lexing.TokenCache()
+        cache.lex_line(lexer, "<a/>")
+        cache.lex_line(lexing.get_lexer_by_name("xml"), "<a/>")
+        assert cache.cache_info().misses == 2
+
+    def test_least_recently_used_line_evicted(self, lexer):
+        cache = lexing.TokenCache(maxsize=2)
+        cache.lex_line(lexer, "<a/>")
+        cache.lex_line(lexer, "<b/>")
+        cache.lex_line(lexer, "<a/>")
+        cache.lex_line(lexer, "<c/>")
+        assert len(cache) == 2
+
+        cache.lex_line(lexer, "<a/>")
+        assert cache.cache_info().hits == 2
+        cache.lex_line(lexer, "<b/>")
+        assert cache.cache_info().misses == 4
+
+    def test_zero_size_keeps_nothing(self, lexer):
+        cache = lexing.TokenCache(maxsize=0)
+        cache.lex_line(lexer, "<a/>")
+        cache.lex_line(lexer, "<a/>")
+        assert len(cache) == 0
+        assert cache.cache_info().hits == 0
+
+    def test_clear(self, lexer):
+        cache = lexing.TokenCache()
+        cache.lex_line(lexer, "<a/>")
+        cache.clear()
+        assert cache.cache_info() == lexing.CacheInfo(
+            0, 0, lexing.TOKEN_CACHE_SIZE, 0
+        )
+
+    def test_hit_rate_without_lookups(self):
+        assert lexing.TokenCache().cache_info().hit_rate == 0.0
@@ -0,0 +1,115 @@
+import threading
+from unittest.mock import Mock, ANY
+
+import pytest
+
+import gce.models
+import gce.preview
+from gce import mapping_preview, rendering
+
+
+class TestMappingPreviewModel:
+    @pytest.fixture
+    def toml_model(self):
+        toml_model = gce.models.TomlModel()
+        toml_model.add_top_level_config("identifier_key", "id")
+        toml_model.load_mappings([
+            {"key": "Title", "matching_marc_fields": ["245$a"]},
+            {"key": "Notes", "jinja_template": "{{ notes }}"},
+        ])
+        return toml_model
+
+    @pytest.fixture
+    def render_strategy(self):
+        return Mock(side_effect=echo_template)
+
+    @pytest.fixture
+    def preview_model(self, qtbot, toml_model, render_strategy):
+        preview_model = mapping_preview.MappingPreviewModel(
+            render_strategy=render_strategy
+        )
+        preview_model.set_source_model(toml_model)
+        preview_model.set_sample_record(
+            '<record><datafield tag="245">'
+            '<subfield code="a">A title</subfield>'
+            "</datafield></record>"
+        )
+        yield preview_model
+        preview_model.evaluator.wait_for_done()
+
+    def show_all(self, qtbot, preview_model):
+        # Asks for every row, as a view would, then waits for the results
+        for row in range(preview_model.rowCount()):
+            preview_model.data(preview_model.index(row, 1))
+        qtbot.waitUntil(lambda: not preview_model.evaluator.is_busy)
+        return [
+            preview_model.data(preview_model.index(row, 1))
+            for row in range(preview_model.rowCount())
+        ]
+
+    def test_every_mapping_is_evaluated(self, qtbot, preview_model):
+        assert self.show_all(qtbot, preview_model) == [
+            gce.preview.matching_fields_template(["245$a"]),
+            "{{ notes }}",
+        ]
+
+    def test_evaluated_off_the_gui_thread(
+        self, qtbot, preview_model, render_strategy
+    ):
+        threads = []
+        render_strategy.side_effect = lambda *args: (
+            threads.append(threading.current_thread()) or echo_template(*args)
+        )
+        self.show_all(qtbot, preview_model)
+        assert threads
+        assert threading.main_thread() not in threads
+
+    def test_row_updated_when_result_arrives(self, qtbot, preview_model):
+        assert preview_model.data(preview_model.index(1, 1)) == ""
+        with qtbot.waitSignal(preview_model.dataChanged) as blocker:
+            pass
+        assert blocker.args[0].row() == 1
+
+    def test_edit_only_evaluates_changed_mapping(
+        self, qtbot, toml_model, preview_model, render_strategy
+    ):
+        self.show_all(qtbot, preview_model)
+        mapping_index = toml_model.index(1, 0, toml_model.index(1, 0))
+        template_index = toml_model.index(1, 1, mapping_index)
+        with qtbot.waitSignal(preview_model.dataChanged) as blocker:
+            toml_model.setData(template_index, "{{ other }}")
+        assert blocker.args[0].row() == 1
+        render_strategy.reset_mock()
+        assert self.show_all(qtbot, preview_model)[1] == "{{ other }}"
+        render_strategy.assert_called_once_with("{{ other }}", ANY)
+
+    def test_added_mapping_inserts_row(self, qtbot, toml_model, preview_model):
+        with (
+            qtbot.assertNotEmitted(preview_model.modelReset),
+            qtbot.waitSignal(preview_model.rowsInserted) as blocker,
+        ):
+            toml_model.add_mapping({"key": "Extra", "jinja_template": "x"})
+        assert blocker.args[1:] == [2, 2]
+        assert preview_model.rowCount() == 3
+
+    def test_fetching_mappings_keeps_rows(self, qtbot):
+        toml_model = gce.models.TomlModel()
+        toml_model.fetch_batch_size = 1
+        toml_model.load_mappings([
+            {"key": str(row), "jinja_template": "x"} for row in range(3)
+        ])
+        preview_model = mapping_preview.MappingPreviewModel(
+            render_strategy=echo_template
+        )
+        preview_model.set_source_model(toml_model)
+        with (
+            qtbot.assertNotEmitted(preview_model.modelReset),
+            qtbot.assertNotEmitted(preview_model.rowsInserted),
+        ):
+            toml_model.fetchMore(toml_model.index(0, 0))
+        assert toml_model.rowCount(toml_model.index(0, 0)) == 2
+        assert preview_model.rowCount() == 3
+
+
+def echo_template(jinja_text, xml_text):
+    return rendering.RenderResult(jinja_text, True)
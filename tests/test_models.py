@@ -258,16 +258,6 @@ jinja_template = "{% for field in fields['700'] %}{{ field['a'] }}{% if field['q
         )
 
 
-def test_data_has_changed(example_toml_data_fp):
-    model = models.load_toml_fp(example_toml_data_fp)
-    example_toml_data_fp.seek(0)
-    starting_data = example_toml_data_fp.read()
-    assert models.data_has_changed(starting_data, model) is False
-    index = model.index(0, 1)
-    model.setData(index, "somthingelse")
-    assert models.data_has_changed(starting_data, model)
-
-
 @pytest.fixture
 def example_toml_data_fp():
     with io.StringIO() as stream:
@@ -338,3 +328,329 @@ class TestMappingNode:
         model = models.MappingNode()
         model.children = children
         assert model.key == expected
+
+
+class TestTomlNode:
+    @pytest.fixture
+    def parent_node(self):
+        node = models.TomlNode[str]("parent")
+        for key in ["a", "b", "c"]:
+            node.append_child(models.TomlNode[str](key))
+        return node
+
+    def test_append_child_sets_row_and_parent(self, parent_node):
+        assert [child.row() for child in parent_node.children] == [0, 1, 2]
+        assert all(
+            child.parent() is parent_node for child in parent_node.children
+        )
+
+    def test_insert_child_updates_rows(self, parent_node):
+        parent_node.insert_child(1, models.TomlNode[str]("new"))
+        assert [child.key for child in parent_node.children] == [
+            "a",
+            "new",
+            "b",
+            "c",
+        ]
+        assert [child.row() for child in parent_node.children] == [
+            0,
+            1,
+            2,
+            3,
+        ]
+
+    def test_remove_child_updates_rows(self, parent_node):
+        removed = parent_node.remove_child(0)
+        assert removed.key == "a"
+        assert removed.parent() is None
+        assert [
+            (child.key, child.row()) for child in parent_node.children
+        ] == [("b", 0), ("c", 1)]
+
+    @pytest.mark.parametrize(
+        "source, destination, expected",
+        [
+            (0, 2, ["b", "c", "a"]),
+            (2, 0, ["c", "a", "b"]),
+            (1, 1, ["a", "b", "c"]),
+        ],
+    )
+    def test_move_child_updates_rows(
+        self, parent_node, source, destination, expected
+    ):
+        parent_node.move_child(source, destination)
+        assert [child.key for child in parent_node.children] == expected
+        assert all(
+            child.row() == row
+            for row, child in enumerate(parent_node.children)
+        )
+
+
+def test_parent_index_uses_row_of_parent_node(example_toml_data_fp):
+    model = models.load_toml_fp(example_toml_data_fp)
+    mapping_values_index = model.index(1, 0)
+    second_mapping_index = model.index(1, 0, parent=mapping_values_index)
+    data_index = model.index(3, 1, parent=second_mapping_index)
+    parent_index = model.parent(data_index)
+    assert parent_index.row() == 1
+    assert parent_index.internalPointer() is (
+        second_mapping_index.internalPointer()
+    )
+    assert model.parent(second_mapping_index).row() == 1
+
+
+class TestModificationTracking:
+    def test_freshly_loaded_model_is_not_modified(self, example_toml_data_fp):
+        model = models.load_toml_fp(example_toml_data_fp)
+        assert model.is_modified is False
+
+    def test_editing_value_marks_model_modified(self, example_toml_data_fp):
+        model = models.load_toml_fp(example_toml_data_fp)
+        model.setData(model.index(0, 1), "somthingelse")
+        assert model.is_modified is True
+
+    def test_restoring_original_value_clears_modified(
+        self, example_toml_data_fp
+    ):
+        model = models.load_toml_fp(example_toml_data_fp)
+        index = model.index(0, 1)
+        model.setData(index, "somthingelse")
+        model.setData(index, "Bibliographic Identifier")
+        assert model.is_modified is False
+
+    def test_mark_saved_uses_current_values_as_baseline(
+        self, example_toml_data_fp
+    ):
+        model = models.load_toml_fp(example_toml_data_fp)
+        index = model.index(0, 1)
+        model.setData(index, "somthingelse")
+        model.mark_saved()
+        assert model.is_modified is False
+        model.setData(index, "Bibliographic Identifier")
+        assert model.is_modified is True
+
+
+class TestTomlNodeLayout:
+    def test_nodes_do_not_carry_instance_dict(self):
+        assert not hasattr(models.TomlNode(), "__dict__")
+        assert not hasattr(models.MappingNode(), "__dict__")
+
+    def test_leaf_nodes_share_empty_children(self):
+        assert models.TomlNode().children is models.TomlNode().children
+
+    @pytest.mark.parametrize(
+        "change",
+        [
+            lambda node: node.insert_child(0, models.TomlNode("child")),
+            lambda node: node.append_child(models.TomlNode("child")),
+        ],
+    )
+    def test_leaf_gets_its_own_children(self, change):
+        leaf = models.TomlNode()
+        change(leaf)
+        assert isinstance(leaf.children, list)
+        assert [child.key for child in leaf.children] == ["child"]
+        assert models.TomlNode().children == ()
+
+    def test_removing_from_leaf_raises_index_error(self):
+        with pytest.raises(IndexError):
+            models.TomlNode().remove_child(0)
+
+    def test_adding_child_does_not_change_other_leaves(self):
+        leaf = models.TomlNode()
+        parent = models.TomlNode()
+        parent.append_child(models.TomlNode("child"))
+        assert leaf.child_count() == 0
+        assert parent.child_count() == 1
+
+    @pytest.mark.parametrize("is_editable", [True, False])
+    @pytest.mark.parametrize("is_selectable", [True, False])
+    def test_flags_are_independent(self, is_editable, is_selectable):
+        node = models.TomlNode()
+        node.is_editable = is_editable
+        node.is_selectable = is_selectable
+        assert node.is_editable is is_editable
+        assert node.is_selectable is is_selectable
+
+
+class TestMappingNodeLabel:
+    @pytest.fixture
+    def mapping_node(self):
+        node = models.MappingNode()
+        key_node = models.TomlNode[str]("key")
+        key_node.value = "Uniform Title"
+        node.append_child(key_node)
+        return node
+
+    def test_label_is_cached(self, mapping_node):
+        assert mapping_node.key == 'mapping - "Uniform Title"'
+        mapping_node.children[0].value = "Dummy"
+        assert mapping_node.key == 'mapping - "Uniform Title"'
+
+    def test_invalidate_label_recomputes(self, mapping_node):
+        assert mapping_node.key == 'mapping - "Uniform Title"'
+        mapping_node.children[0].value = "Dummy"
+        mapping_node.invalidate_label()
+        assert mapping_node.key == 'mapping - "Dummy"'
+
+
+def test_set_data_on_key_updates_mapping_label(example_toml_data_fp):
+    model = models.load_toml_fp(example_toml_data_fp)
+    mapping_index = model.index(0, 0, parent=model.index(1, 0))
+    assert model.data(mapping_index) == 'mapping - "Uniform Title"'
+    model.setData(model.index(0, 1, parent=mapping_index), "New Title")
+    assert model.data(mapping_index) == 'mapping - "New Title"'
+
+
+def test_set_data_on_key_emits_change_for_mapping_row(
+    qtbot, example_toml_data_fp
+):
+    model = models.load_toml_fp(example_toml_data_fp)
+    mapping_index = model.index(0, 0, parent=model.index(1, 0))
+    with qtbot.waitSignal(
+        model.dataChanged,
+        check_params_cb=lambda top_left, *_: top_left == mapping_index,
+    ):
+        model.setData(model.index(0, 1, parent=mapping_index), "New Title")
+
+
+def test_convert_toml_model_matches_generic_model_path(example_toml_data_fp):
+    model = models.load_toml_fp(example_toml_data_fp)
+    model.setData(model.index(0, 1), "somthingelse")
+    proxy = QtCore.QIdentityProxyModel()
+    proxy.setSourceModel(model)
+    assert models.convert_toml_model_to_dictionary(
+        model
+    ) == models.convert_item_model_to_dictionary(proxy)
+
+
+def test_convert_item_model_to_dictionary_uses_nodes_for_toml_model(
+    example_toml_data_fp, monkeypatch
+):
+    model = models.load_toml_fp(example_toml_data_fp)
+    monkeypatch.setattr(model, "index", Mock(side_effect=AssertionError))
+    assert len(models.convert_item_model_to_dictionary(model)["mapping"]) == 2
+
+
+class TestLazyMappings:
+    @pytest.fixture
+    def large_toml_data_fp(self):
+        with io.StringIO() as stream:
+            stream.write("[mappings]\nidentifier_key = 'id'\n")
+            for i in range(300):
+                stream.write(
+                    f'[[mapping]]\nkey = "Mapping {i}"\ndelimiter = "||"\n'
+                )
+            stream.seek(0)
+            yield stream
+
+    @pytest.fixture
+    def model(self, large_toml_data_fp):
+        return models.load_toml_fp(large_toml_data_fp)
+
+    def test_only_first_batch_of_mappings_is_loaded(self, model):
+        mapping_values_index = model.index(1, 0)
+        assert (
+            model.rowCount(mapping_values_index)
+            == models.TomlModel.fetch_batch_size
+        )
+        assert model.canFetchMore(mapping_values_index) is True
+
+    def test_fetch_more_loads_remaining_mappings(self, model):
+        mapping_values_index = model.index(1, 0)
+        model.fetchMore(mapping_values_index)
+        assert model.rowCount(mapping_values_index) == 300
+        assert model.canFetchMore(mapping_values_index) is False
+
+    def test_fetch_more_emits_rows_inserted(self, qtbot, model):
+        mapping_values_index = model.index(1, 0)
+        with qtbot.waitSignal(model.rowsInserted) as blocker:
+            model.fetchMore(mapping_values_index)
+        assert blocker.args[1:] == [
+            models.TomlModel.fetch_batch_size,
+            299,
+        ]
+
+    def test_mapping_children_created_when_requested(self, model):
+        mapping_values_index = model.index(1, 0)
+        mapping_index = model.index(0, 0, parent=mapping_values_index)
+        node = mapping_index.internalPointer()
+        assert model.hasChildren(mapping_index) is True
+        assert model.data(mapping_index) == 'mapping - "Mapping 0"'
+        assert node.is_populated is False
+        assert model.rowCount(mapping_index) == 2
+        assert node.is_populated is True
+
+    def test_unfetched_mappings_are_exported(self, model):
+        data = models.convert_item_model_to_dictionary(model)
+        assert len(data["mapping"]) == 300
+        assert data["mapping"][-1]["key"] == "Mapping 299"
+
+
+class TestFormatPreservingExport:
+    @pytest.fixture
+    def toml_text(self):
+        return """\
+# Config comment
+[mappings]
+identifier_key = "Bibliographic Identifier"
+
+[[mapping]]
+key = "Uniform Title"  # title comment
+matching_marc_fields = ["240$a"]
+delimiter = "||"
+"""
+
+    @pytest.fixture
+    def model(self, toml_text):
+        return models.load_toml_fp(io.StringIO(toml_text))
+
+    def test_unchanged_model_exports_original_text(self, model, toml_text):
+        assert models.export_toml(model) == toml_text
+
+    def test_edit_only_changes_edited_value(self, model, toml_text):
+        mapping_index = model.index(0, 0, parent=model.index(1, 0))
+        model.setData(model.index(2, 1, parent=mapping_index), ";")
+        assert models.export_toml(model) == toml_text.replace(
+            'delimiter = "||"', 'delimiter = ";"'
+        )
+
+    def test_saved_edits_are_kept_in_later_exports(self, model, toml_text):
+        model.setData(model.index(0, 1), "id")
+        model.mark_saved()
+        mapping_index = model.index(0, 0, parent=model.index(1, 0))
+        model.setData(model.index(0, 1, parent=mapping_index), "Title")
+        exported = models.export_toml(model)
+        assert 'identifier_key = "id"' in exported
+        assert 'key = "Title"  # title comment' in exported
+
+    def test_adding_config_falls_back_to_full_export(self, model):
+        model.add_top_level_config("new_key", "value")
+        exported = tomllib.loads(models.export_toml(model))
+        assert exported["mappings"]["new_key"] == "value"
+
+
+class TestMappingAccess:
+    @pytest.fixture
+    def model(self):
+        model = models.TomlModel()
+        model.fetch_batch_size = 1
+        model.load_mappings([{"key": "first"}, {"key": "second"}])
+        return model
+
+    def test_mapping_count_includes_unfetched(self, model):
+        assert model.mapping_count() == 2
+
+    def test_mapping_values_of_unfetched_mapping(self, model):
+        assert model.mapping_values(1) == {"key": "second"}
+
+    def test_mapping_values_include_edits(self, model):
+        mapping_index = model.index(0, 0, parent=model.index(0, 0))
+        model.setData(model.index(0, 1, parent=mapping_index), "edited")
+        assert model.mapping_values(0) == {"key": "edited"}
+
+    def test_mapping_row(self, model):
+        mapping_index = model.index(0, 0, parent=model.index(0, 0))
+        assert model.mapping_row(model.index(0, 1, mapping_index)) == 0
+        assert model.mapping_row(model.index(0, 0)) is None
+        assert model.mapping_row(mapping_index) == 0
@@ -0,0 +1,250 @@
+import os
+import types
+import xml.etree.ElementTree as ET
+from unittest.mock import Mock
+
+import jinja2
+import pytest
+
+from gce import preview, rendering
+
+RECORD = """<record xmlns="http://www.loc.gov/MARC21/slim">
+    <controlfield tag="001">9910012205899</controlfield>
+    <datafield ind1="1" ind2="0" tag="240">
+        <subfield code="a">Uniform title</subfield>
+    </datafield>
+    <datafield ind1=" " ind2=" " tag="510">
+        <subfield code="a">Citation one</subfield>
+        <subfield code="c">p. 1</subfield>
+    </datafield>
+    <datafield ind1=" " ind2=" " tag="510">
+        <subfield code="a">Citation two</subfield>
+    </datafield>
+</record>
+"""
+
+
+def echo_template(jinja_text, xml_text):
+    if jinja_text == "bad":
+        return rendering.RenderResult("syntax error", False)
+    return rendering.RenderResult(jinja_text, True)
+
+
+@pytest.mark.parametrize(
+    "spec, expected",
+    [
+        ("240$a", ("240", "a")),
+        ("510c", ("510", "c")),
+        ("001", ("001", None)),
+    ],
+)
+def test_parse_field_spec(spec, expected):
+    assert preview.parse_field_spec(spec) == expected
+
+
+def test_parse_field_spec_rejects_bad_spec():
+    with pytest.raises(ValueError):
+        preview.parse_field_spec("not a field")
+
+
+def fields_context(xml_text):
+    # Shaped like the fields galatea hands its templates: a list of
+    # subfields with code and value for each datafield
+    fields = {}
+    for field in ET.fromstring(xml_text):
+        if field.tag.endswith("controlfield"):
+            value = types.SimpleNamespace(value=field.text)
+        else:
+            value = [
+                types.SimpleNamespace(code=sub.get("code"), value=sub.text)
+                for sub in field
+            ]
+        fields.setdefault(field.get("tag"), []).append(value)
+    return fields
+
+
+def fields_template(jinja_text, xml_text):
+    template = jinja2.Environment().from_string(jinja_text)
+    return rendering.RenderResult(
+        template.render(fields=fields_context(xml_text)), True
+    )
+
+
+class TestMatchingFieldsTemplate:
+    @pytest.mark.parametrize(
+        "specs, expected",
+        [
+            (["240$a"], "Uniform title"),
+            (["510a"], "Citation one||Citation two"),
+            (["510a", "510c"], "Citation one||Citation two||p. 1"),
+            (["510"], "Citation one||p. 1||Citation two"),
+            (["001"], "9910012205899"),
+            (["650$a"], ""),
+        ],
+    )
+    def test_values(self, specs, expected):
+        template = preview.matching_fields_template(specs)
+        assert fields_template(template, RECORD).text == expected
+
+    def test_delimiter(self):
+        template = preview.matching_fields_template(["510a"], delimiter='"; ')
+        assert fields_template(template, RECORD).text == (
+            'Citation one"; Citation two'
+        )
+
+    def test_controlfield_as_text(self):
+        template = preview.matching_fields_template(["001"])
+        assert (
+            jinja2
+            .Environment()
+            .from_string(template)
+            .render(fields={"001": ["99"]})
+        ) == "99"
+
+    def test_bad_spec(self):
+        with pytest.raises(ValueError):
+            preview.matching_fields_template(["not a field"])
+
+    @pytest.mark.parametrize(
+        "field",
+        [
+            [types.SimpleNamespace(text="Citation one")],
+            {"a": "Citation one"},
+            42,
+        ],
+    )
+    def test_unexpected_layout_is_an_error(self, field):
+        def render(jinja_text, xml_text):
+            template = jinja2.Environment().from_string(jinja_text)
+            return rendering.RenderResult(
+                template.render(fields={"510": [field]}), True
+            )
+
+        mapping = {"key": "Citations", "matching_marc_fields": ["510a"]}
+        assert preview.evaluate_mapping(
+            mapping, RECORD, render_strategy=render
+        ) == preview.MappingPreview(
+            "", "Unexpected layout of field 510 in galatea's fields"
+        )
+
+
+class TestMatchingFieldsWithGalatea:
+    # Rendered by galatea itself, so a change to the fields it hands its
+    # templates shows up here
+    @pytest.fixture
+    def sample_xml(self):
+        with open(os.path.join(os.path.dirname(__file__), "example.xml")) as f:
+            return f.read()
+
+    @pytest.mark.parametrize(
+        "specs, expected",
+        [
+            (["040a", "040b"], "PUL||eng"),
+            (["040$d"], "TJC"),
+            (["040"], "PUL||eng||PUL||TJC"),
+            (
+                ["035a"],
+                "(OCoLC)04262822||(OCoLC)ocm04262822"
+                "||(EXLNZ-01CARLI_NETWORK)991062232649705816",
+            ),
+            (["650a"], ""),
+        ],
+    )
+    def test_values(self, sample_xml, specs, expected):
+        mapping = {"key": "spam", "matching_marc_fields": specs}
+        assert preview.evaluate_mapping(
+            mapping, sample_xml
+        ) == preview.MappingPreview(expected, "")
+
+
+class TestEvaluateMapping:
+    def test_matching_marc_fields(self):
+        mapping = {
+            "key": "Citations",
+            "matching_marc_fields": ["510a", "510c"],
+            "delimiter": "||",
+        }
+        assert preview.evaluate_mapping(
+            mapping, RECORD, render_strategy=fields_template
+        ) == preview.MappingPreview("Citation one||Citation two||p. 1", "")
+
+    def test_matching_marc_fields_rendered_by_galatea(self):
+        mapping = {"key": "Title", "matching_marc_fields": ["240$a"]}
+        render_strategy = Mock(return_value=rendering.RenderResult("", True))
+        preview.evaluate_mapping(mapping, RECORD, render_strategy)
+        render_strategy.assert_called_once_with(
+            preview.matching_fields_template(["240$a"]), RECORD
+        )
+
+    def test_bad_field_spec(self):
+        mapping = {"key": "Title", "matching_marc_fields": ["title"]}
+        assert preview.evaluate_mapping(
+            mapping, RECORD, render_strategy=echo_template
+        ) == preview.MappingPreview("", '"title" is not a MARC field')
+
+    def test_nothing_to_evaluate(self):
+        assert preview.evaluate_mapping(
+            {"key": "spam"}, RECORD, render_strategy=echo_template
+        ).error.startswith("No matching_marc_fields or jinja_template")
+
+    def test_jinja_template(self):
+        mapping = {"key": "spam", "jinja_template": "{{ spam }}"}
+        assert preview.evaluate_mapping(
+            mapping, RECORD, render_strategy=echo_template
+        ) == preview.MappingPreview("{{ spam }}", "")
+
+    def test_jinja_template_error(self):
+        mapping = {"key": "spam", "jinja_template": "bad"}
+        assert preview.evaluate_mapping(
+            mapping, RECORD, render_strategy=echo_template
+        ) == preview.MappingPreview("", "syntax error")
+
+
+class TestMappingPreviewCache:
+    @pytest.fixture
+    def cache(self):
+        cache = preview.MappingPreviewCache(xml_cache=rendering.XmlCache())
+        cache.set_record(RECORD)
+        return cache
+
+    def test_no_record_means_no_preview(self):
+        cache = preview.MappingPreviewCache()
+        assert cache.get({"jinja_template": "x"}) == preview.MappingPreview(
+            "", ""
+        )
+
+    def test_missing_until_put(self, cache):
+        assert cache.get({"jinja_template": "spam"}) is None
+        cache.put({"jinja_template": "spam"}, preview.MappingPreview("x", ""))
+        assert cache.get({"jinja_template": "spam"}) == (
+            preview.MappingPreview("x", "")
+        )
+        assert (cache.hits, cache.misses) == (1, 1)
+
+    def test_looked_up_by_content(self, cache):
+        cache.put(
+            {"key": "a", "matching_marc_fields": ["240$a"]},
+            preview.MappingPreview("x", ""),
+        )
+        assert {"matching_marc_fields": ["240$a"], "key": "a"} in cache
+        assert {"key": "a", "matching_marc_fields": ["245$a"]} not in cache
+
+    def test_new_record_clears_results(self, cache):
+        cache.put({"jinja_template": "spam"}, preview.MappingPreview("x", ""))
+        cache.set_record(RECORD)
+        assert {"jinja_template": "spam"} not in cache
+
+    def test_bad_record(self, cache):
+        with pytest.raises(ET.ParseError):
+            cache.set_record("This is not an XML")
+        assert cache.xml_text == RECORD
+
+    def test_least_recently_used_result_evicted(self):
+        cache = preview.MappingPreviewCache(maxsize=2)
+        cache.set_record(RECORD)
+        for template in ["spam", "bacon", "eggs"]:
+            cache.put(
+                {"jinja_template": template}, preview.MappingPreview("", "")
+            )
+        assert {"jinja_template": "spam"} not in cache
+        assert {"jinja_template": "eggs"} in cache
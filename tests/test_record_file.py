@@ -0,0 +1,189 @@
+import json
+import os
+import xml.etree.ElementTree as ET
+
+import pytest
+
+from gce import record_file
+
+COLLECTION = """<?xml version="1.0" encoding="UTF-8"?>
+<marc:collection xmlns:marc="http://www.loc.gov/MARC21/slim">
+  <marc:record>
+    <marc:controlfield tag="001">111</marc:controlfield>
+    <marc:datafield tag="245" ind1="0" ind2="0">
+      <marc:subfield code="a">First</marc:subfield>
+    </marc:datafield>
+  </marc:record>
+  <marc:record>
+    <marc:leader/>
+    <marc:controlfield tag="001"> 222 </marc:controlfield>
+  </marc:record>
+  <marc:record>
+    <marc:datafield tag="245" ind1="0" ind2="0">
+      <marc:subfield code="a">Café</marc:subfield>
+    </marc:datafield>
+  </marc:record>
+</marc:collection>
+"""
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    path = str(tmp_path / "cache")
+    monkeypatch.setattr(record_file, "default_cache_dir", lambda: path)
+    return path
+
+
+@pytest.fixture
+def collection_file(tmp_path):
+    path = tmp_path / "collection.xml"
+    path.write_text(COLLECTION, encoding="utf-8")
+    return str(path)
+
+
+def test_scan_finds_every_record():
+    offsets = record_file.scan_record_offsets(COLLECTION.encode("utf-8"))
+    assert len(offsets.spans) == 3
+    assert offsets.control_numbers == ["111", "222", None]
+
+
+def test_scan_ignores_similar_element_names():
+    data = b"<records><recordset/><record><a/></record></records>"
+    offsets = record_file.scan_record_offsets(data)
+    assert [data[start:end] for start, end in offsets.spans] == [
+        b"<record><a/></record>"
+    ]
+
+
+def test_scan_single_record_file():
+    data = (
+        b'<record xmlns="x"><controlfield tag="001">1</controlfield></record>'
+    )
+    offsets = record_file.scan_record_offsets(data)
+    assert offsets.spans == [(0, len(data))]
+    assert offsets.namespaces == b""
+
+
+def test_record_xml_keeps_root_namespaces(collection_file):
+    with record_file.RecordFile.open(collection_file) as records:
+        element = ET.fromstring(records.record_xml(2))
+    assert element.tag == "{http://www.loc.gov/MARC21/slim}record"
+    assert element.find(".//{*}subfield").text == "Café"
+
+
+def test_record_xml_does_not_repeat_declarations(tmp_path):
+    path = tmp_path / "collection.xml"
+    path.write_text('<c xmlns="a"><record xmlns="b"/></c>', encoding="utf-8")
+    with record_file.RecordFile.open(str(path)) as records:
+        assert ET.fromstring(records.record_xml(0)).tag == "{b}record"
+
+
+def test_find_by_control_number(collection_file):
+    with record_file.RecordFile.open(collection_file) as records:
+        assert records.find("222") == 1
+        assert records.find("999") is None
+
+
+def test_open_writes_sidecar(collection_file):
+    record_file.RecordFile.open(collection_file).close()
+    with open(record_file.sidecar_path(collection_file)) as f:
+        data = json.load(f)
+    assert data["control_numbers"] == ["111", "222", None]
+
+
+def test_open_uses_sidecar(collection_file, monkeypatch):
+    record_file.RecordFile.open(collection_file).close()
+
+    def fail(_):
+        raise AssertionError("rescanned")
+
+    monkeypatch.setattr(record_file, "scan_record_offsets", fail)
+    with record_file.RecordFile.open(collection_file) as records:
+        assert len(records) == 3
+
+
+def test_sidecar_ignored_after_file_changes(collection_file):
+    record_file.RecordFile.open(collection_file).close()
+    with open(collection_file, "a", encoding="utf-8") as f:
+        f.write("\n")
+    assert record_file.load_sidecar(collection_file) is None
+
+
+def test_unreadable_sidecar_is_rebuilt(collection_file, cache_dir):
+    os.makedirs(cache_dir)
+    with open(record_file.sidecar_path(collection_file), "w") as f:
+        f.write("not json")
+    with record_file.RecordFile.open(collection_file) as records:
+        assert len(records) == 3
+
+
+def test_sidecar_is_kept_in_cache_dir(collection_file, cache_dir):
+    record_file.RecordFile.open(collection_file).close()
+    assert os.listdir(cache_dir) == [
+        os.path.basename(record_file.sidecar_path(collection_file))
+    ]
+    assert not os.path.exists(collection_file + record_file.SIDECAR_SUFFIX)
+
+
+def test_save_sidecar_failure_is_not_an_error(collection_file, tmp_path):
+    # A file where the cache directory should be
+    blocked = tmp_path / "blocked"
+    blocked.write_text("")
+    offsets = record_file.RecordOffsets([], [], b"")
+    assert (
+        record_file.save_sidecar(collection_file, offsets, str(blocked))
+        is False
+    )
+
+
+def test_open_with_unwritable_cache_dir(collection_file, tmp_path):
+    blocked = tmp_path / "blocked"
+    blocked.write_text("")
+    with record_file.RecordFile.open(
+        collection_file, cache_dir=str(blocked)
+    ) as records:
+        assert len(records) == 3
+
+
+@pytest.mark.parametrize("encoding", ["utf-16", "utf-16-le", "utf-32"])
+def test_open_wide_encoding(tmp_path, encoding):
+    path = tmp_path / "collection.xml"
+    text = COLLECTION.replace("UTF-8", encoding.upper())
+    if encoding == "utf-16-le":
+        # Without a byte order mark the layout of "<?" gives it away
+        path.write_bytes(text.encode(encoding))
+    else:
+        path.write_text(text, encoding=encoding)
+    with record_file.RecordFile.open(str(path)) as records:
+        assert len(records) == 3
+        assert records.find("222") == 1
+        element = ET.fromstring(records.record_xml(2))
+    assert element.find(".//{*}subfield").text == "Café"
+
+
+def test_wide_encoding_copy_is_removed(tmp_path, monkeypatch):
+    temp = tmp_path / "temp"
+    temp.mkdir()
+    monkeypatch.setattr(record_file.tempfile, "tempdir", str(temp))
+    path = tmp_path / "collection.xml"
+    path.write_text(COLLECTION, encoding="utf-16")
+    with record_file.RecordFile.open(str(path)):
+        assert len(os.listdir(temp)) == 1
+    assert os.listdir(temp) == []
+
+
+def test_open_declared_single_byte_encoding(tmp_path):
+    path = tmp_path / "collection.xml"
+    path.write_bytes(
+        COLLECTION.replace("UTF-8", "ISO-8859-1").encode("iso-8859-1")
+    )
+    with record_file.RecordFile.open(str(path)) as records:
+        element = ET.fromstring(records.record_xml(2))
+    assert element.find(".//{*}subfield").text == "Café"
+
+
+def test_open_empty_file(tmp_path):
+    path = tmp_path / "empty.xml"
+    path.write_bytes(b"")
+    with record_file.RecordFile.open(str(path)) as records:
+        assert len(records) == 0
@@ -0,0 +1,64 @@
+import io
+import os
+import xml.etree.ElementTree as ET
+
+import pytest
+
+from gce import gui, reflow
+
+DOCUMENTS = [
+    "<xml> </xml>",
+    '<a x="q&quot;&gt;">t"&gt;<b/>tail<!-- c --><?pi d?></a>',
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    "<!-- top -->"
+    '<r xmlns="u" xmlns:m="v">'
+    '<m:x a="1" b="2">line1\n\n  line2</m:x>\n  <y>\n</y>'
+    "</r>",
+]
+
+
+@pytest.fixture(scope="module")
+def example_xml():
+    path = os.path.join(os.path.dirname(__file__), "example.xml")
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+
+@pytest.mark.parametrize("document", DOCUMENTS)
+def test_matches_minidom_reflow(document):
+    assert reflow.reflow_xml(document) == gui.reflow_xml_using_minidom(
+        document
+    )
+
+
+def test_matches_minidom_reflow_of_marc_record(example_xml):
+    assert reflow.reflow_xml(example_xml) == gui.reflow_xml_using_minidom(
+        example_xml
+    )
+
+
+def test_small_chunks_give_same_output(example_xml):
+    output = io.StringIO()
+    reflow.reflow_stream(io.StringIO(example_xml), output, chunk_size=7)
+    assert output.getvalue() == reflow.reflow_xml(example_xml)
+
+
+def test_reflow_from_bytes(example_xml):
+    output = io.StringIO()
+    reflow.reflow_stream(io.BytesIO(example_xml.encode("utf-8")), output)
+    assert output.getvalue() == reflow.reflow_xml(example_xml)
+
+
+def test_indent():
+    assert reflow.reflow_xml("<a><b/></a>", indent=2).splitlines() == [
+        '<?xml version="1.0" ?>',
+        "<a>",
+        "  <b/>",
+        "</a>",
+    ]
+
+
+@pytest.mark.parametrize("xml_text", ["<record>", "not xml", ""])
+def test_error_is_parse_error(xml_text):
+    with pytest.raises(ET.ParseError):
+        reflow.reflow_xml(xml_text)
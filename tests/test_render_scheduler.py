@@ -0,0 +1,60 @@
+from unittest.mock import Mock
+
+from PySide6 import QtCore
+
+from gce import render_scheduler, rendering
+
+
+class TestRenderScheduler:
+    def test_rapid_input_is_rendered_once(self, qtbot):
+        render_strategy = Mock(
+            return_value=rendering.RenderResult("spam", True)
+        )
+        scheduler = render_scheduler.RenderScheduler(
+            render_strategy=render_strategy
+        )
+        with qtbot.waitSignal(scheduler.rendered) as blocker:
+            scheduler.schedule("a", "<xml/>")
+            scheduler.schedule("ab", "<xml/>")
+            scheduler.schedule("abc", "<xml/>")
+        render_strategy.assert_called_once_with("abc", "<xml/>")
+        assert blocker.args == [rendering.RenderResult("spam", True)]
+
+    def test_stale_results_are_dropped(self, qtbot):
+        rendered = Mock()
+
+        def render_strategy(jinja_text, xml_text):
+            if jinja_text == "slow":
+                # Newer input arrives while this render is still running
+                QtCore.QThread.msleep(100)
+            return rendering.RenderResult(jinja_text, True)
+
+        scheduler = render_scheduler.RenderScheduler(
+            delay=0, render_strategy=render_strategy
+        )
+        scheduler.rendered.connect(rendered)
+        scheduler.schedule("slow", "")
+        scheduler.flush()
+        scheduler.schedule("fast", "")
+        scheduler.flush()
+        qtbot.waitUntil(lambda: not scheduler.is_busy)
+        rendered.assert_called_once_with(rendering.RenderResult("fast", True))
+
+    def test_failed_render_is_reported(self, qtbot):
+        render_strategy = Mock(side_effect=RuntimeError("spam"))
+        scheduler = render_scheduler.RenderScheduler(
+            delay=0, render_strategy=render_strategy
+        )
+        with qtbot.waitSignal(scheduler.rendered) as blocker:
+            scheduler.schedule("a", "<xml/>")
+        assert blocker.args == [
+            rendering.RenderResult("Unable to render: spam", False)
+        ]
+        assert scheduler.is_busy is False
+
+        # Later input is still rendered
+        render_strategy.side_effect = None
+        render_strategy.return_value = rendering.RenderResult("eggs", True)
+        with qtbot.waitSignal(scheduler.rendered) as blocker:
+            scheduler.schedule("b", "<xml/>")
+        assert blocker.args == [rendering.RenderResult("eggs", True)]
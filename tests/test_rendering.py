@@ -0,0 +1,98 @@
+import os
+import time
+import xml.etree.ElementTree as ET
+
+import pytest
+
+from gce import rendering
+
+
+class TestXmlCache:
+    def test_same_xml_is_parsed_once(self):
+        cache = rendering.XmlCache()
+        first = cache.get("<record><leader/></record>")
+        second = cache.get("<record><leader/></record>")
+        assert first is second
+        assert (cache.hits, cache.misses) == (1, 1)
+
+    def test_changed_xml_is_parsed_again(self):
+        cache = rendering.XmlCache()
+        cache.get("<record><leader/></record>")
+        element = cache.get("<record><controlfield/></record>")
+        assert element[0].tag == "controlfield"
+        assert cache.misses == 2
+
+    def test_invalid_xml_is_not_cached(self):
+        cache = rendering.XmlCache()
+        with pytest.raises(ET.ParseError):
+            cache.get("This is not an XML")
+        assert len(cache) == 0
+
+
+class TestJinjaRenderer:
+    @pytest.fixture
+    def sample_xml(self):
+        with open(os.path.join(os.path.dirname(__file__), "example.xml")) as f:
+            return f.read()
+
+    def test_template_edits_reuse_parsed_xml(self, sample_xml):
+        xml_cache = rendering.XmlCache()
+        for jinja_text, expected in [
+            ("{{ fields['040'][0][0].value }}", "PUL"),
+            ("{{ fields['040'][0][1].value }}", "eng"),
+        ]:
+            renderer = rendering.JinjaRenderer(xml_cache=xml_cache)
+            renderer.jinja_text = jinja_text
+            renderer.xml = sample_xml
+            assert renderer.render() == expected
+        assert (xml_cache.hits, xml_cache.misses) == (1, 1)
+
+
+def echo_template(jinja_text, xml_text):
+    if jinja_text == "hang":
+        time.sleep(60)
+    if jinja_text == "allocate":
+        bytearray(8 * 1024 * 1024 * 1024)
+    return rendering.RenderResult(jinja_text, True)
+
+
+class TestProcessRenderer:
+    @pytest.fixture
+    def renderer(self):
+        renderer = rendering.ProcessRenderer(
+            timeout=500, render_strategy=echo_template
+        )
+        yield renderer
+        renderer.close()
+
+    def test_render(self, renderer):
+        assert renderer.render("spam", "") == rendering.RenderResult(
+            "spam", True
+        )
+
+    def test_process_is_reused(self, renderer):
+        renderer.render("spam", "")
+        process = renderer._process
+        renderer.render("bacon", "")
+        assert renderer._process is process
+
+    def test_runaway_render_times_out(self, renderer):
+        assert renderer.render("hang", "") == rendering.RenderResult(
+            "render timed out after 500 ms", False
+        )
+        assert renderer.is_running is False
+
+    def test_render_after_timeout_restarts_process(self, renderer):
+        renderer.render("hang", "")
+        assert renderer.render("eggs", "") == rendering.RenderResult(
+            "eggs", True
+        )
+
+    @pytest.mark.skipif(
+        rendering.resource is None, reason="memory limits need resource"
+    )
+    def test_memory_limit(self, renderer):
+        result = renderer.render("allocate", "")
+        assert result == rendering.RenderResult(
+            "render ran out of memory", False
+        )
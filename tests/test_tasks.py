@@ -0,0 +1,99 @@
+import threading
+from unittest.mock import Mock
+
+import pytest
+
+from gce import tasks
+
+
+class CallTask(tasks.BackgroundTask):
+    def __init__(self, function):
+        super().__init__()
+        self.function = function
+
+    def work(self):
+        return self.function(self)
+
+
+class TestTaskRunner:
+    @pytest.fixture
+    def runner(self):
+        runner = tasks.TaskRunner()
+        yield runner
+        runner.cancel_all()
+        runner.wait_for_done()
+
+    def test_result_comes_back_with_its_task(self, qtbot, runner):
+        task = CallTask(lambda _: threading.current_thread())
+        with qtbot.waitSignal(runner.finished) as blocker:
+            runner.start(task)
+        assert blocker.args[0] is task
+        assert blocker.args[1] is not threading.main_thread()
+        assert runner.is_busy is False
+
+    def test_error_comes_back(self, qtbot, runner):
+        error = ValueError("spam")
+
+        def fail(_):
+            raise error
+
+        with qtbot.waitSignal(runner.failed) as blocker:
+            runner.start(CallTask(fail))
+        assert blocker.args[1] is error
+        assert runner.is_busy is False
+
+    def test_reported_values_come_before_the_result(self, qtbot, runner):
+        received = []
+        runner.reported.connect(lambda _, value: received.append(value))
+        runner.finished.connect(lambda _, result: received.append(result))
+
+        def count(task):
+            for number in range(3):
+                task.report(number)
+            return "done"
+
+        with qtbot.waitSignal(runner.finished):
+            runner.start(CallTask(count))
+        assert received == [0, 1, 2, "done"]
+
+    def test_cancelled_task_is_dropped(self, qtbot, runner):
+        started = threading.Event()
+        release = threading.Event()
+
+        def wait(_):
+            started.set()
+            release.wait(5)
+            return "spam"
+
+        task = CallTask(wait)
+        task.discard_result = Mock()
+        finished = Mock()
+        runner.finished.connect(finished)
+        runner.start(task)
+        assert started.wait(5)
+        task.cancelled.set()
+        release.set()
+        qtbot.waitUntil(lambda: not runner.is_busy)
+        finished.assert_not_called()
+        task.discard_result.assert_called_once_with("spam")
+
+    def test_cancelled_task_that_has_not_started_is_skipped(
+        self, qtbot, runner
+    ):
+        release = threading.Event()
+        first = CallTask(lambda _: release.wait(5))
+        second_work = Mock()
+        second = CallTask(second_work)
+        runner.start(first)
+        runner.start(second)
+        second.cancelled.set()
+        release.set()
+        qtbot.waitUntil(lambda: not runner.is_busy)
+        second_work.assert_not_called()
+
+    def test_finish_all_hands_back_results_right_away(self, runner):
+        finished = Mock()
+        runner.finished.connect(finished)
+        runner.start(CallTask(lambda _: "spam"))
+        runner.finish_all()
+        finished.assert_called_once()
@@ -0,0 +1,109 @@
+import tomllib
+
+import pytest
+
+from gce import toml_document
+
+TOML_TEXT = """\
+# Mapping config for the catalog export
+[mappings]
+identifier_key = "Bibliographic Identifier"  # used to match rows
+
+[[mapping]]
+key = "Uniform Title"
+matching_marc_fields = [
+    "240$a",  # uniform title
+    "130$a",
+]
+delimiter = "||"
+existing_data = "keep"
+
+# Names
+[[mapping]]
+'key' = 'Associated Entities'
+serialize_method = "jinja2template"
+jinja_template = \"\"\"{% for field in fields['700'] %}{{ field['a'] }}\
+{% endfor %}\"\"\"
+existing_data = "replace"
+"""
+
+
+@pytest.fixture
+def document():
+    return toml_document.TomlSourceDocument.from_text(TOML_TEXT)
+
+
+def test_scan_finds_every_value(document):
+    assert document.matches(tomllib.loads(TOML_TEXT)) is True
+
+
+@pytest.mark.parametrize(
+    "table, key, expected",
+    [
+        (None, "identifier_key", '"Bibliographic Identifier"'),
+        (0, "delimiter", '"||"'),
+        (1, "key", "'Associated Entities'"),
+        (1, "existing_data", '"replace"'),
+    ],
+)
+def test_value_spans(document, table, key, expected):
+    spans = document.mappings if table is None else document.mapping[table]
+    span = spans[key]
+    assert TOML_TEXT[span.start : span.end] == expected
+
+
+def test_render_only_changes_edited_values(document):
+    new_text = document.render([(0, "delimiter", ";")])
+    assert new_text == TOML_TEXT.replace('delimiter = "||"', 'delimiter = ";"')
+
+
+def test_render_keeps_comments(document):
+    new_text = document.render([(None, "identifier_key", "id")])
+    assert 'identifier_key = "id"  # used to match rows' in new_text
+    assert "# Mapping config for the catalog export" in new_text
+
+
+def test_render_does_not_change_document(document):
+    document.render([(0, "delimiter", ";")])
+    assert document.text == TOML_TEXT
+
+
+def test_update_keeps_later_spans_valid(document):
+    document.update([(0, "matching_marc_fields", ["240$a"])])
+    new_text = document.update([(1, "existing_data", "keep")])
+    data = tomllib.loads(new_text)
+    assert data["mapping"][0]["matching_marc_fields"] == ["240$a"]
+    assert data["mapping"][1]["existing_data"] == "keep"
+    assert document.matches(data) is True
+
+
+def test_unknown_key_raises(document):
+    with pytest.raises(toml_document.UnsupportedChangeError):
+        document.render([(0, "not_a_key", "value")])
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "[mappings]\na.b = 1\nmapping = []\n",
+        "[mappings]\nid = 1\n[[mapping]]\nkey = 'a'\n[mapping.sub]\nx = 1\n",
+    ],
+)
+def test_unsupported_documents_are_not_tracked(text):
+    assert (
+        toml_document.create_source_document(text, tomllib.loads(text)) is None
+    )
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        ("text", '"text"'),
+        (1, "1"),
+        (True, "true"),
+        (["240$a", "510a"], '["240$a", "510a"]'),
+        ({"a": 1, "b c": "d"}, '{ a = 1, "b c" = "d" }'),
+    ],
+)
+def test_format_value(value, expected):
+    assert toml_document.format_value(value) == expected
@@ -0,0 +1,176 @@
+import os
+import pathlib
+from unittest.mock import Mock, ANY
+
+import galatea.merge_data
+import pytest
+
+import gce.models
+from gce import gui, toml_files
+
+
+class TestWriteTextAtomically:
+    def test_replaces_existing_file(self, tmp_path):
+        file_path = tmp_path / "config.toml"
+        file_path.write_text("old")
+        toml_files.write_text_atomically(file_path, "new")
+        assert file_path.read_text() == "new"
+        assert list(tmp_path.iterdir()) == [file_path]
+
+    def test_failed_write_keeps_original(self, tmp_path):
+        file_path = tmp_path / "config.toml"
+        file_path.write_text("old")
+        with pytest.raises(TypeError):
+            toml_files.write_text_atomically(file_path, Mock(name="not text"))
+        assert file_path.read_text() == "old"
+        assert list(tmp_path.iterdir()) == [file_path]
+
+    @pytest.mark.skipif(os.name != "posix", reason="POSIX permissions")
+    def test_keeps_permissions(self, tmp_path):
+        file_path = tmp_path / "config.toml"
+        file_path.write_text("old")
+        file_path.chmod(0o664)
+        toml_files.write_text_atomically(file_path, "new")
+        assert file_path.stat().st_mode & 0o777 == 0o664
+
+    @pytest.mark.skipif(os.name != "posix", reason="POSIX permissions")
+    def test_new_file_follows_umask(self, tmp_path):
+        file_path = tmp_path / "config.toml"
+        mask = os.umask(0o027)
+        try:
+            toml_files.write_text_atomically(file_path, "new")
+        finally:
+            os.umask(mask)
+        assert file_path.stat().st_mode & 0o777 == 0o640
+
+    @pytest.mark.skipif(os.name != "posix", reason="symbolic links")
+    def test_keeps_symbolic_link(self, tmp_path):
+        target = tmp_path / "shared" / "config.toml"
+        target.parent.mkdir()
+        target.write_text("old")
+        link = tmp_path / "config.toml"
+        link.symlink_to(target)
+        toml_files.write_text_atomically(link, "new")
+        assert link.is_symlink()
+        assert target.read_text() == "new"
+        assert list(target.parent.iterdir()) == [target]
+
+
+class TestBackgroundTomlWriter:
+    @pytest.fixture
+    def toml_file(self, tmp_path):
+        toml_file = tmp_path / "config.toml"
+        toml_file.write_text(
+            '[mappings]\nidentifier_key = "id"\n[[mapping]]\nkey = "Title"\n'
+        )
+        return toml_file
+
+    @pytest.fixture
+    def model(self, toml_file):
+        with toml_file.open() as fp:
+            return gce.models.load_toml_fp(fp)
+
+    def test_save_writes_file(self, qtbot, toml_file, model):
+        writer = toml_files.BackgroundTomlWriter()
+        model.setData(model.index(0, 1), "new id")
+        with qtbot.waitSignal(writer.saved) as blocker:
+            writer.save(toml_file, model)
+        assert blocker.args == [toml_file, model]
+        assert 'identifier_key = "new id"' in toml_file.read_text()
+        assert model.is_modified is False
+
+    def test_edit_during_save_stays_unsaved(self, qtbot, toml_file, model):
+        writer = toml_files.BackgroundTomlWriter()
+        model.setData(model.index(0, 1), "new id")
+        with qtbot.waitSignal(writer.saved):
+            writer.save(toml_file, model)
+            model.setData(model.index(0, 1), "newer id")
+        assert "new id" in toml_file.read_text()
+        assert model.is_modified is True
+
+    def test_failed_write_emits_save_failed(self, qtbot, toml_file, model):
+        writer = toml_files.BackgroundTomlWriter(
+            write_strategy=Mock(side_effect=OSError("disk full"))
+        )
+        with qtbot.waitSignal(writer.save_failed) as blocker:
+            writer.save(toml_file, model)
+        assert blocker.args == [toml_file, "disk full"]
+
+
+class TestBackgroundTomlLoader:
+    def test_loaded_emits_model(self, qtbot):
+        loader = toml_files.BackgroundTomlLoader()
+        model = gce.models.TomlModel()
+        with qtbot.waitSignal(loader.loaded) as blocker:
+            loader.load(pathlib.Path("dummy.toml"), lambda _: model)
+        assert blocker.args == [pathlib.Path("dummy.toml"), model]
+        assert loader.is_loading is False
+
+    def test_model_is_moved_to_gui_thread(self, qtbot):
+        loader = toml_files.BackgroundTomlLoader()
+        with qtbot.waitSignal(loader.loaded) as blocker:
+            loader.load(
+                pathlib.Path("dummy.toml"),
+                lambda _: gce.models.TomlModel(),
+            )
+        assert blocker.args[1].thread() == loader.thread()
+
+    def test_os_error_is_reported_as_bad_mapping_file(self, qtbot):
+        loader = toml_files.BackgroundTomlLoader()
+
+        def load_strategy(toml_file):
+            raise FileNotFoundError(toml_file)
+
+        with qtbot.waitSignal(loader.failed) as blocker:
+            loader.load(pathlib.Path("missing.toml"), load_strategy)
+        assert isinstance(
+            blocker.args[1], galatea.merge_data.BadMappingFileError
+        )
+
+    @pytest.mark.parametrize(
+        "data",
+        [
+            pytest.param(
+                "[mappings]\nidentifier_key = 'caf\xe9'\n".encode("latin-1"),
+                id="not utf-8",
+            ),
+            pytest.param(b'mappings = "oops"\n', id="mappings not a table"),
+        ],
+    )
+    def test_unexpected_error_is_reported_as_bad_mapping_file(
+        self, qtbot, tmp_path, data
+    ):
+        toml_file = tmp_path / "config.toml"
+        toml_file.write_bytes(data)
+        loader = toml_files.BackgroundTomlLoader()
+        with qtbot.waitSignal(loader.failed) as blocker:
+            loader.load(toml_file, gui.load_toml)
+        assert isinstance(
+            blocker.args[1], galatea.merge_data.BadMappingFileError
+        )
+        assert loader.is_loading is False
+
+    def test_cancelled_result_is_discarded(self, qtbot):
+        loader = toml_files.BackgroundTomlLoader()
+        loaded = Mock()
+        loader.loaded.connect(loaded)
+        with qtbot.waitSignal(loader.cancelled):
+            loader.load(
+                pathlib.Path("dummy.toml"),
+                lambda _: gce.models.TomlModel(),
+            )
+            loader.cancel()
+        loader.wait_for_done()
+        qtbot.wait(10)
+        loaded.assert_not_called()
+
+    def test_newer_load_supersedes_older_one(self, qtbot):
+        loader = toml_files.BackgroundTomlLoader()
+        loaded = Mock()
+        loader.loaded.connect(loaded)
+        with qtbot.waitSignal(loader.finished):
+            loader.load(pathlib.Path("first.toml"), Mock())
+            loader.load(pathlib.Path("second.toml"), Mock())
+        loader.wait_for_done()
+        qtbot.wait(10)
+        loaded.assert_called_once_with(pathlib.Path("second.toml"), ANY)
@@ -0,0 +1,85 @@
+import xml.etree.ElementTree as ET
+
+import pytest
+
+from gce import xml_backend
+
+RECORD = (
+    '<?xml version="1.0" encoding="UTF-8"?>'
+    '<record xmlns="http://www.loc.gov/MARC21/slim">'
+    '<controlfield tag="001">1</controlfield>'
+    '<datafield tag="245" ind1="0" ind2="0">'
+    '<subfield code="a">Café</subfield>'
+    "</datafield>"
+    "</record>"
+)
+
+
+@pytest.fixture(params=xml_backend.available_backends())
+def backend(request):
+    return xml_backend.get_backend(request.param)
+
+
+def test_fromstring(backend):
+    record = backend.fromstring(RECORD)
+    assert (
+        record.findtext(
+            "{http://www.loc.gov/MARC21/slim}datafield/"
+            "{http://www.loc.gov/MARC21/slim}subfield"
+        )
+        == "Café"
+    )
+
+
+@pytest.mark.parametrize("encoding", ["ISO-8859-1", "latin-1", "UTF-16"])
+def test_declared_encoding_is_ignored_for_text(backend, encoding):
+    # The text is already decoded, whatever it says it was encoded in
+    xml_text = RECORD.replace("UTF-8", encoding)
+    record = backend.fromstring(xml_text)
+    assert "".join(record.itertext()) == "1Café"
+
+
+def test_comments_and_processing_instructions_are_dropped(backend):
+    record = backend.fromstring(
+        "<record><!-- note --><?pi data?><leader/>text<!-- more -->"
+        "<?pi?> tail</record>"
+    )
+    assert [child.tag for child in record] == ["leader"]
+    assert "".join(record.itertext()) == "text tail"
+
+
+def test_backends_produce_same_tree():
+    if "lxml" not in xml_backend.available_backends():
+        pytest.skip("lxml is not installed")
+    xml_text = (
+        '<?xml version="1.0"?><!-- top --><record>'
+        "<!-- a --><leader/><?pi?><controlfield>1</controlfield> </record>"
+    )
+    shapes = [
+        [
+            (element.tag, element.text, element.tail)
+            for element in xml_backend
+            .get_backend(name)
+            .fromstring(xml_text)
+            .iter()
+        ]
+        for name in ["lxml", "stdlib"]
+    ]
+    assert shapes[0] == shapes[1]
+
+
+@pytest.mark.parametrize("xml_text", ["This is not an XML", ""])
+def test_fromstring_error_is_parse_error(backend, xml_text):
+    with pytest.raises(ET.ParseError):
+        backend.fromstring(xml_text)
+
+
+def test_stdlib_is_used_without_lxml(monkeypatch):
+    monkeypatch.setattr(xml_backend, "lxml_etree", None)
+    monkeypatch.setattr(xml_backend, "_instances", {})
+    assert xml_backend.get_backend().name == "stdlib"
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        xml_backend.get_backend("spam")
@@ -0,0 +1,95 @@
+import codecs
+
+import pytest
+
+from gce import xml_file
+
+
+@pytest.mark.parametrize(
+    "head, expected",
+    [
+        (codecs.BOM_UTF8 + b"<a/>", "utf-8-sig"),
+        (codecs.BOM_UTF16_LE + "<a/>".encode("utf-16-le"), "utf-16"),
+        (codecs.BOM_UTF16_BE + "<a/>".encode("utf-16-be"), "utf-16"),
+        (codecs.BOM_UTF32_LE + "<a/>".encode("utf-32-le"), "utf-32"),
+        ('<?xml version="1.0"?>'.encode("utf-16-le"), "utf-16-le"),
+        ('<?xml version="1.0"?>'.encode("utf-16-be"), "utf-16-be"),
+        (b'<?xml version="1.0" encoding="ISO-8859-1"?>', "iso8859-1"),
+        (b"<?xml version='1.0' encoding='windows-1252'?>", "cp1252"),
+        (b'<?xml version="1.0"?><a/>', "utf-8"),
+        (b"<a/>", "utf-8"),
+        (b'<?xml version="1.0" encoding="no-such-codec"?>', "utf-8"),
+        (b'<?xml version="1.0" encoding="UTF-16"?>', "utf-8"),
+    ],
+)
+def test_detect_encoding(head, expected):
+    assert xml_file.detect_encoding(head) == expected
+
+
+def read_all(path, chunk_size):
+    return "".join(
+        text for text, _, _ in xml_file.read_text_chunks(path, chunk_size)
+    )
+
+
+@pytest.mark.parametrize("encoding", ["utf-8-sig", "utf-16", "utf-32"])
+def test_read_text_chunks_decodes(tmp_path, encoding):
+    path = tmp_path / "record.xml"
+    path.write_bytes("<a>Café ☕</a>".encode(encoding))
+    assert read_all(path, chunk_size=3) == "<a>Café ☕</a>"
+
+
+def test_read_text_chunks_translates_line_endings(tmp_path):
+    path = tmp_path / "record.xml"
+    path.write_bytes(b"<a>\r\n<b/>\r</a>\r\n")
+    # A "\r\n" split over two chunks still becomes one line ending
+    assert read_all(path, chunk_size=4) == "<a>\n<b/>\n</a>\n"
+
+
+def test_read_text_chunks_reports_progress(tmp_path):
+    path = tmp_path / "record.xml"
+    path.write_bytes(b"x" * 5000)
+    progress = [
+        (done, total)
+        for _, done, total in xml_file.read_text_chunks(path, 2000)
+    ]
+    assert progress[-1] == (5000, 5000)
+    assert [done for done, _ in progress] == sorted(
+        done for done, _ in progress
+    )
+
+
+def test_read_text_chunks_replaces_bad_bytes(tmp_path):
+    path = tmp_path / "record.xml"
+    path.write_bytes(b"<a>\xff</a>")
+    assert read_all(path, chunk_size=2) == "<a>�</a>"
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 1024])
+def test_read_text_chunks_reports_bad_bytes(tmp_path, chunk_size):
+    path = tmp_path / "record.xml"
+    path.write_bytes(b"<a>caf\xc3\xa9</a><b>\xff</b><c>\xfe</c>")
+    offsets = []
+    text = "".join(
+        text
+        for text, _, _ in xml_file.read_text_chunks(
+            path, chunk_size, on_decode_error=offsets.append
+        )
+    )
+    assert text == "<a>café</a><b>�</b><c>�</c>"
+    assert offsets[0] == 15
+    assert set(offsets) <= {15, 23}
+
+
+def test_read_text_chunks_reports_truncated_character(tmp_path):
+    path = tmp_path / "record.xml"
+    path.write_bytes(b"<a>caf\xc3")
+    offsets = []
+    text = "".join(
+        text
+        for text, _, _ in xml_file.read_text_chunks(
+            path, on_decode_error=offsets.append
+        )
+    )
+    assert text == "<a>caf�"
+    assert offsets == [6]
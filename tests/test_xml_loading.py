@@ -0,0 +1,112 @@
+import pytest
+
+from gce import gui
+
+
+class TestXmlFileLoader:
+    @pytest.fixture
+    def viewer(self, qtbot):
+        viewer = gui.XMLViewer()
+        qtbot.addWidget(viewer)
+        return viewer
+
+    def test_loads_file_text(self, qtbot, viewer, tmp_path):
+        xml_file = tmp_path / "record.xml"
+        text = '<?xml version="1.0" encoding="ISO-8859-1"?>\r\n<a>Café</a>'
+        xml_file.write_bytes(text.encode("latin-1"))
+        with qtbot.waitSignal(viewer.file_loader.loaded):
+            viewer.load_file(str(xml_file))
+        assert viewer.toPlainText().splitlines()[1] == "<a>Café</a>"
+
+    def test_loads_in_chunks_with_progress(self, qtbot, viewer):
+        chunks = [("<a>", 3, 9), ("<b/>", 7, 9), ("</a>", 9, 9)]
+        viewer.file_loader.read_strategy = lambda _, **__: iter(chunks)
+        progress = []
+        viewer.file_loader.progress.connect(
+            lambda done, total: progress.append((done, total))
+        )
+        with qtbot.waitSignal(viewer.file_loader.loaded):
+            viewer.load_file("record.xml")
+        assert viewer.toPlainText() == "<a><b/></a>"
+        assert progress == [(3, 9), (7, 9), (9, 9)]
+
+    def test_undo_and_highlighting_off_while_loading(self, qtbot, viewer):
+        states = []
+
+        def read(_, **__):
+            yield "<a/>", 4, 4
+
+        def record_state(*_):
+            states.append((
+                viewer.document().isUndoRedoEnabled(),
+                viewer._highlighter.document() is None,
+                viewer.isReadOnly(),
+            ))
+
+        viewer.file_loader.read_strategy = read
+        viewer.file_loader.progress.connect(record_state)
+        with qtbot.waitSignal(viewer.file_loader.loaded):
+            viewer.load_file("record.xml")
+        record_state()
+        assert states == [(False, True, True), (True, False, False)]
+        assert viewer.document().isUndoAvailable() is False
+
+    def test_cancel_clears_partial_text(self, qtbot, viewer):
+        def read(_, **__):
+            position = 0
+            while True:
+                position += 1
+                yield "<a/>\n", position, 0
+
+        viewer.file_loader.read_strategy = read
+        viewer.load_file("endless.xml")
+        qtbot.waitSignal(viewer.file_loader.progress).wait()
+        with qtbot.waitSignal(viewer.file_loader.cancelled):
+            viewer.file_loader.cancel()
+        assert viewer.file_loader.wait_for_done(5000) is True
+        qtbot.wait(10)
+        assert viewer.toPlainText() == ""
+        assert viewer.isReadOnly() is False
+
+    def test_missing_file_fails(self, qtbot, viewer, tmp_path):
+        with qtbot.waitSignal(viewer.file_loader.failed) as blocker:
+            viewer.load_file(str(tmp_path / "missing.xml"))
+        assert isinstance(blocker.args[1], OSError)
+        assert viewer.file_loader.is_loading is False
+
+    def test_unknown_encoding_fails(self, qtbot, viewer):
+        def read(_, **__):
+            raise LookupError("unknown encoding: bogus")
+            yield
+
+        viewer.file_loader.read_strategy = read
+        with qtbot.waitSignal(viewer.file_loader.failed) as blocker:
+            viewer.load_file("bogus.xml")
+        assert isinstance(blocker.args[1], LookupError)
+        assert viewer.file_loader.is_loading is False
+
+    def test_bad_bytes_are_reported(self, qtbot, viewer, tmp_path):
+        xml_file = tmp_path / "record.xml"
+        xml_file.write_bytes(b"<a>\xff</a>\n<b>\xfe</b>")
+        with qtbot.waitSignal(viewer.file_loader.decode_failed) as blocker:
+            viewer.load_file(str(xml_file))
+        assert blocker.args == [str(xml_file), 3]
+        assert viewer.toPlainText() == "<a>\ufffd</a>\n<b>\ufffd</b>"
+
+    def test_clean_file_is_not_reported(self, qtbot, viewer, tmp_path):
+        xml_file = tmp_path / "record.xml"
+        xml_file.write_text("<a/>")
+        with qtbot.assertNotEmitted(viewer.file_loader.decode_failed):
+            with qtbot.waitSignal(viewer.file_loader.loaded):
+                viewer.load_file(str(xml_file))
+
+    def test_new_load_replaces_running_one(self, qtbot, viewer, tmp_path):
+        first = tmp_path / "first.xml"
+        first.write_text("<first/>")
+        second = tmp_path / "second.xml"
+        second.write_text("<second/>")
+        with qtbot.waitSignal(viewer.file_loader.loaded) as blocker:
+            viewer.load_file(str(first))
+            viewer.load_file(str(second))
+        assert blocker.args == [str(second)]
+        assert viewer.toPlainText() == "<second/>"